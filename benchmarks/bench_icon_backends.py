@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+Compare the time needed to read the command icons by parsing the user's
+menus with PyXDG (the "menu" backend) with the time needed by scanning the
+application directories directly (the "desktop-files" backend).
+
+Usage: bench_icon_backends.py [NUM_ENTRIES [REPEAT]]
+
+If NUM_ENTRIES is given, then a temporary menu tree with that number of
+desktop entries is generated and used instead of the user's real menus.
+Each backend is run REPEAT times (default: 5) and the best time is shown.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+# Also makes the package importable when running from the repository
+from bench_suite import MENU_TEMPLATE
+
+DESKTOP_TEMPLATE = """\
+[Desktop Entry]
+Type=Application
+Name=Application {0}
+Comment=Generated for benchmarking
+Exec=/usr/bin/app-{0} --some-option %U
+Icon=app-icon-{0}
+Categories=Utility;
+"""
+
+def make_fixture(root, num_entries):
+    """
+    Create a menu file and `num_entries` desktop files below `root`. Return
+    the path of the directory containing the menu file.
+    """
+    menu_dir = os.path.join(root, 'menus')
+    app_dir = os.path.join(root, 'share', 'applications')
+    os.makedirs(menu_dir)
+    os.makedirs(app_dir)
+    with open(os.path.join(menu_dir, 'applications.menu'), 'w') as menu:
+        menu.write(MENU_TEMPLATE)
+    for number in range(num_entries):
+        filename = 'app-{0}.desktop'.format(number)
+        with open(os.path.join(app_dir, filename), 'w') as desktop_file:
+            desktop_file.write(DESKTOP_TEMPLATE.format(number))
+    return menu_dir
+
+def run(repeat):
+    """
+    Time both backends and print the results.
+    """
+    from launchit import icongetter
+    for backend in ('menu', 'desktop-files'):
+        def read_icons():
+            return list(icongetter.iter_desktop_file_icons(backend))
+        count = len(read_icons())
+        best = min(timeit.repeat(read_icons, number=1, repeat=repeat))
+        print('{0:>14}: {1:4d} entries in {2:8.2f} ms'.format(
+            backend, count, best * 1000))
+
+def main(args):
+    repeat = int(args[1]) if len(args) > 1 else 5
+    if not args:
+        run(repeat)
+        return
+    root = tempfile.mkdtemp()
+    try:
+        menu_dir = make_fixture(root, int(args[0]))
+        # Must be set before PyXDG is imported
+        os.environ['XDG_DATA_HOME'] = os.path.join(root, 'share')
+        os.environ['XDG_DATA_DIRS'] = os.path.join(root, 'share')
+        os.environ['XDG_CONFIG_DIRS'] = root
+        from launchit import settings
+        settings.config['menu-dir'] = menu_dir
+        run(repeat)
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
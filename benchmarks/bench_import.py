@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+Measure the time needed to import `launchit.core` inside a fresh interpreter
+and check that this does not import PySide or the heavy PyXDG modules.
+
+Usage: bench_import.py [BUDGET_MS [REPEAT]]
+
+The import is done REPEAT times (default: 5), each time inside a new
+process. The best time is compared with BUDGET_MS (default: 100). The exit
+code is 1 if the budget was exceeded or if an unwanted module was imported.
+"""
+import os
+import subprocess
+import sys
+
+# Make the package importable when running from the repository
+parent = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+# Modules, which must not be imported by `import launchit.core`
+UNWANTED_MODULES = ('PySide', 'xdg.IconTheme', 'xdg.Menu', 'xdg.Mime')
+
+MEASURE_CODE = """\
+import sys, time
+sys.path.insert(0, {0!r})
+start = time.time()
+import launchit.core
+duration = time.time() - start
+unwanted = [name for name in sys.modules
+            if name.split('.')[0] == 'PySide' or name in {1!r}]
+print(duration)
+print(','.join(unwanted))
+"""
+
+def measure():
+    """
+    Import `launchit.core` inside a new interpreter. Return the duration in
+    seconds and a list of the unwanted modules, which were imported.
+    """
+    code = MEASURE_CODE.format(parent, UNWANTED_MODULES)
+    output = subprocess.check_output([sys.executable, '-c', code])
+    lines = output.decode('ascii').splitlines()
+    unwanted = lines[1].split(',') if len(lines) > 1 and lines[1] else []
+    return (float(lines[0]), unwanted)
+
+def main(args):
+    budget = float(args[0]) if args else 100
+    repeat = int(args[1]) if len(args) > 1 else 5
+    results = [measure() for _ in range(repeat)]
+    best = min(duration for duration, unwanted in results) * 1000
+    unwanted = sorted(set(name for _, names in results for name in names))
+    print('import launchit.core: {0:.2f} ms (budget: {1:.2f} ms)'.format(
+        best, budget))
+    failed = False
+    if best > budget:
+        print('FAILED: Import time exceeds the budget')
+        failed = True
+    if unwanted:
+        print('FAILED: Unwanted modules were imported: {0}'.format(
+            ', '.join(unwanted)))
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
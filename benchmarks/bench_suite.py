@@ -0,0 +1,464 @@
+#!/usr/bin/env python
+"""
+Measure the hot paths of launchit on a synthetic, reproducible environment.
+
+Usage: bench_suite.py [options]
+
+A temporary directory is filled with PATH directories containing empty
+executables, a menu with desktop entries for some of them, an icon theme
+and a deep directory tree. The XDG variables and PATH are pointed to that
+directory before launchit (and thus PyXDG) is imported. Then the following
+is measured:
+
+- completions per keystroke while typing command names and paths
+- command resolution, icon name guessing and menu parsing (cold and warm)
+- dispatching launches of commands and files (with a stub supervisor, so
+  that no process is started)
+- markup generation for the completion popup (only if PySide is available)
+- startup of a fresh interpreter with an empty and with a filled cache
+
+For each benchmark the percentiles of the measured times are printed and
+optionally written to a JSON file (`--output`). Passing a file written that
+way as `--baseline` compares the results with it. The exit code is 1 if a
+median got slower than the baseline by more than the tolerance.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import timeit
+
+# Make the package importable when running from the repository
+parent = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if os.path.isdir(os.path.join(parent, 'launchit')):
+    sys.path.insert(0, parent)
+
+# Increase this when the structure of the result file changes
+RESULT_VERSION = 1
+
+PERCENTILES = (50, 90, 99)
+
+MENU_TEMPLATE = """\
+<!DOCTYPE Menu PUBLIC "-//freedesktop//DTD Menu 1.0//EN"
+ "http://www.freedesktop.org/standards/menu-spec/1.0/menu.dtd">
+<Menu>
+  <Name>Applications</Name>
+  <DefaultAppDirs/>
+  <Include><All/></Include>
+</Menu>
+"""
+
+DESKTOP_TEMPLATE = """\
+[Desktop Entry]
+Type=Application
+Name={0}
+Exec={0} --some-option %U
+Icon={0}-icon
+Categories=Utility;
+"""
+
+THEME_TEMPLATE = """\
+[Icon Theme]
+Name={0}
+Inherits={1}
+Directories={2}
+"""
+
+THEME_DIR_TEMPLATE = """\
+[{0}]
+Size={1}
+Type=Fixed
+"""
+
+ICON_SIZES = (16, 24, 32, 48, 256)
+
+class Fixture(object):
+    """
+    A synthetic environment below a temporary directory.
+    """
+    def __init__(self, root, path_dirs, executables, entries, depth, seed):
+        self.root = root
+        self.random = random.Random(seed)
+        self.params = {'path_dirs': path_dirs, 'executables': executables,
+                       'entries': entries, 'depth': depth, 'seed': seed}
+        self.path_dirs = [os.path.join(root, 'bin{0}'.format(number))
+                          for number in range(path_dirs)]
+        self.share_dir = os.path.join(root, 'share')
+        self.menu_dir = os.path.join(root, 'menus')
+        self.deep_dir = os.path.join(root, 'deep')
+        self.commands = []
+        self.menu_commands = []
+
+    def create(self):
+        """
+        Create all files and directories of the fixture.
+        """
+        self._make_executables()
+        self._make_menu()
+        self._make_icon_theme()
+        self._make_deep_dirs()
+        for name in ('cache', 'config'):
+            os.makedirs(os.path.join(self.root, name))
+        # The system's MIME database is needed to guess icons for files
+        system_mime = '/usr/share/mime'
+        if os.path.isdir(system_mime):
+            os.symlink(system_mime, os.path.join(self.share_dir, 'mime'))
+
+    def get_environ(self):
+        """
+        Return a copy of `os.environ`, which points to the fixture.
+        """
+        environ = dict(os.environ)
+        environ.update({
+            'PATH': os.pathsep.join(self.path_dirs),
+            'XDG_DATA_HOME': self.share_dir,
+            'XDG_DATA_DIRS': self.share_dir,
+            'XDG_CONFIG_HOME': os.path.join(self.root, 'config'),
+            'XDG_CONFIG_DIRS': self.root,
+            'XDG_CACHE_HOME': os.path.join(self.root, 'cache'),
+        })
+        return environ
+
+    def _make_executables(self):
+        for path_dir in self.path_dirs:
+            os.makedirs(path_dir)
+            for number in range(self.params['executables']):
+                name = self._make_name(number)
+                path = os.path.join(path_dir, name)
+                with open(path, 'w'):
+                    pass
+                os.chmod(path, 0o755)
+                self.commands.append(name)
+
+    def _make_name(self, number):
+        """
+        Return a command-like name, so that prefixes are shared like they
+        are in real PATH directories (e.g. "git", "git-lfs", ...).
+        """
+        syllables = ('ba', 'ko', 'git', 'py', 'x', 'lib', 'gnome', 'kde',
+                     'run', 'set', 'on', 'mi', 'ter', 'ed', 'ch')
+        parts = [self.random.choice(syllables)
+                 for _ in range(self.random.randint(2, 4))]
+        return '{0}-{1}'.format(''.join(parts), number)
+
+    def _make_menu(self):
+        app_dir = os.path.join(self.share_dir, 'applications')
+        os.makedirs(self.menu_dir)
+        os.makedirs(app_dir)
+        with open(os.path.join(self.menu_dir, 'applications.menu'),
+                  'w') as menu:
+            menu.write(MENU_TEMPLATE)
+        count = min(self.params['entries'], len(self.commands))
+        self.menu_commands = self.random.sample(self.commands, count)
+        for name in self.menu_commands:
+            path = os.path.join(app_dir, name + '.desktop')
+            with open(path, 'w') as desktop_file:
+                desktop_file.write(DESKTOP_TEMPLATE.format(name))
+
+    def _make_icon_theme(self):
+        icons_dir = os.path.join(self.share_dir, 'icons')
+        subdirs = ['{0}x{0}/apps'.format(size) for size in ICON_SIZES]
+        for theme, inherits in (('hicolor', ''), ('Bench', 'hicolor')):
+            theme_dir = os.path.join(icons_dir, theme)
+            os.makedirs(theme_dir)
+            with open(os.path.join(theme_dir, 'index.theme'), 'w') as index:
+                index.write(THEME_TEMPLATE.format(theme, inherits,
+                                                  ','.join(subdirs)))
+                for subdir, size in zip(subdirs, ICON_SIZES):
+                    index.write(THEME_DIR_TEMPLATE.format(subdir, size))
+            for subdir in subdirs:
+                os.makedirs(os.path.join(theme_dir, subdir))
+        # Put half of the icons into the inherited theme
+        for number, name in enumerate(self.menu_commands):
+            theme = 'Bench' if number % 2 else 'hicolor'
+            for subdir in subdirs:
+                path = os.path.join(icons_dir, theme, subdir,
+                                    name + '-icon.png')
+                with open(path, 'w'):
+                    pass
+
+    def _make_deep_dirs(self):
+        dirname = self.deep_dir
+        for level in range(self.params['depth']):
+            dirname = os.path.join(dirname, 'level{0}'.format(level))
+            os.makedirs(dirname)
+            for number in range(50):
+                filename = 'file{0}-{1}.txt'.format(level, number)
+                with open(os.path.join(dirname, filename), 'w'):
+                    pass
+
+def get_stats(durations):
+    """
+    Return a dictionary with statistics for the given `durations` (seconds)
+    in milliseconds.
+    """
+    values = sorted(duration * 1000 for duration in durations)
+    stats = {'count': len(values), 'min': values[0], 'max': values[-1],
+             'mean': sum(values) / len(values)}
+    for percentile in PERCENTILES:
+        # Nearest-rank method
+        rank = int(math.ceil(len(values) * percentile / 100.0))
+        index = max(0, rank - 1)
+        stats['p{0}'.format(percentile)] = values[index]
+    return stats
+
+def measure(func, args_list, repeat=1):
+    """
+    Call `func` with each item of `args_list` as its arguments `repeat`
+    times and return a list of the durations of all calls.
+    """
+    timer = timeit.default_timer
+    durations = []
+    for _ in range(repeat):
+        for args in args_list:
+            start = timer()
+            func(*args)
+            durations.append(timer() - start)
+    return durations
+
+def iter_keystrokes(words):
+    """
+    Yield the fragments, which appear while each of `words` is typed.
+    """
+    for word in words:
+        for end in range(1, len(word) + 1):
+            yield word[:end]
+
+def run_core_benchmarks(fixture, repeat):
+    """
+    Run the benchmarks, which do not need the GUI, and return a dictionary
+    mapping each benchmark's name to the list of its durations.
+    """
+    from launchit import core, icongetter, icontheme, settings
+    settings.config['menu-dir'] = fixture.menu_dir
+    settings.config['icon-theme'] = 'Bench'
+    # Commands with and without a desktop entry
+    words = (fixture.random.sample(fixture.menu_commands, 10) +
+             fixture.random.sample(fixture.commands, 10))
+    fragments = [(fragment,) for fragment in iter_keystrokes(words)]
+    paths = [(fragment,) for fragment in iter_keystrokes(
+        [os.path.join(fixture.deep_dir, *['level{0}'.format(level)
+         for level in range(fixture.params['depth'])]) + '/file']
+    )]
+    results = {}
+    core.command_index.clear()
+    results['completion.cold'] = measure(core.get_name_completions,
+                                         fragments[:1])
+    results['completion.keystroke'] = measure(
+        core.get_name_completions, fragments, repeat)
+
+    def type_with_session(fragment):
+        session.get_best_completions(fragment, 64)
+    session = core.CompletionSession()
+    results['completion.session_keystroke'] = measure(
+        type_with_session, fragments, repeat)
+    results['completion.path_keystroke'] = measure(
+        core.get_name_completions, paths, repeat)
+
+    names = [(name,) for name in words]
+    core.command_resolver.invalidate()
+    results['command_path.cold'] = measure(core.get_command_path, names)
+    results['command_path.warm'] = measure(core.get_command_path, names,
+                                           repeat)
+
+    results['command_icons.parse'] = measure(
+        lambda: list(icongetter.iter_command_icons()), [()], repeat)
+    icontheme.invalidate()
+    icongetter.init_icon_cache(use_disk_cache=False)
+    results['icon_name.cold'] = measure(icongetter.guess_icon_name, names)
+    results['icon_name.warm'] = measure(icongetter.guess_icon_name, names,
+                                        repeat)
+    found = [name for name, in names if icongetter.guess_icon_name(name)
+             != icongetter.ICON_RUN]
+    print('Icons found for {0} of {1} commands'.format(len(found),
+                                                       len(names)))
+    return results
+
+class StubSupervisor(object):
+    """
+    A replacement for `core.ProcessSupervisor`, which just remembers the
+    arguments of the last process instead of starting it.
+    """
+    def __init__(self):
+        self.args = None
+        self.spawned = threading.Event()
+
+    def spawn(self, args, on_exit=None, silent=False):
+        self.args = args
+        self.spawned.set()
+
+def run_launch_benchmarks(fixture, repeat):
+    """
+    Measure the time from calling `core.launch_async()` until the process
+    would have been started. Each kind of invocation is measured: Commands
+    inside PATH, files opened via the starter and files opened by looking up
+    their default application (the "builtin" open-method).
+    """
+    from launchit import core, settings
+    supervisor = StubSupervisor()
+
+    def launch(cmdline):
+        supervisor.spawned.clear()
+        core.launch_async(cmdline, supervisor=supervisor)
+        if not supervisor.spawned.wait(5):
+            raise RuntimeError('Nothing was launched for ' + cmdline)
+    commands = [(name + ' --some-option',) for name
+                in fixture.random.sample(fixture.commands, 20)]
+    first_dir = os.path.join(fixture.deep_dir, 'level0')
+    files = [(os.path.join(first_dir, filename),)
+             for filename in sorted(os.listdir(first_dir))[:20]]
+    words = fixture.random.sample(fixture.commands, 200)
+    results = {}
+    results['launch.command'] = measure(launch, commands, repeat)
+    settings.config['open-method'] = 'starter'
+    results['launch.file_starter'] = measure(launch, files, repeat)
+    settings.config['open-method'] = 'builtin'
+    results['launch.file_builtin'] = measure(launch, files, repeat)
+    results['resolve_commands.batch'] = measure(core.resolve_commands,
+                                                [(words,)], repeat)
+    return results
+
+def run_gui_benchmarks(fixture, repeat):
+    """
+    Run the benchmarks, which need PySide. Return an empty dictionary if
+    PySide is not available.
+    """
+    try:
+        from PySide import QtGui
+    except ImportError:
+        print('PySide is not available: Skipping GUI benchmarks')
+        return {}
+    from launchit import gui
+    app = QtGui.QApplication.instance() or QtGui.QApplication([])
+    renderer = gui.MarkedCompletionRenderer('ko')
+    items = [(name * 3, 200) for name in fixture.commands[:200]]
+
+    def make_markup(text, width):
+        renderer.cache.clear()
+        renderer.makeCompletionMarkup(text, width)
+    results = {'markup.elided': measure(make_markup, items, repeat)}
+    # Fill the cache before measuring
+    measure(renderer.makeCompletionMarkup, items)
+    results['markup.cached'] = measure(renderer.makeCompletionMarkup, items,
+                                       repeat)
+    app.processEvents()
+    return results
+
+STARTUP_CODE = """\
+import timeit
+start = timeit.default_timer()
+from launchit import core, icongetter
+core.get_name_completions('ko')
+icongetter.guess_icon_name({0!r})
+print(timeit.default_timer() - start)
+"""
+
+def run_startup_benchmarks(fixture, repeat):
+    """
+    Measure the startup of a fresh interpreter with an empty and with a
+    filled cache directory.
+    """
+    environ = fixture.get_environ()
+    environ['PYTHONPATH'] = os.pathsep.join(
+        [parent] + sys.path[1:])
+    code = STARTUP_CODE.format(fixture.commands[0])
+    cache_dir = environ['XDG_CACHE_HOME']
+    results = {'startup.cold': [], 'startup.warm': []}
+    for _ in range(repeat):
+        shutil.rmtree(cache_dir)
+        os.makedirs(cache_dir)
+        for name in ('startup.cold', 'startup.warm'):
+            output = subprocess.check_output([sys.executable, '-c', code],
+                                             env=environ)
+            results[name].append(float(output.decode('ascii').strip()))
+    return results
+
+def compare(results, baseline, tolerance):
+    """
+    Print the change of each median compared to `baseline` and return a
+    list of the names of the benchmarks, which became slower by more than
+    `tolerance` percent.
+    """
+    regressions = []
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        old, new = baseline[name]['p50'], results[name]['p50']
+        change = (new - old) / old * 100 if old else 0
+        marker = ''
+        if change > tolerance:
+            regressions.append(name)
+            marker = '  <-- REGRESSION'
+        print('{0:<32} {1:10.3f} -> {2:10.3f} ms ({3:+6.1f}%){4}'.format(
+            name, old, new, change, marker))
+    return regressions
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        description='Benchmark launchit on a synthetic environment.')
+    parser.add_argument('--path-dirs', type=int, default=5)
+    parser.add_argument('--executables', type=int, default=500,
+                        help='number of executables per PATH directory')
+    parser.add_argument('--entries', type=int, default=300,
+                        help='number of desktop entries')
+    parser.add_argument('--depth', type=int, default=10,
+                        help='depth of the directory tree')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the results as JSON')
+    parser.add_argument('--baseline', help='compare with stored results')
+    parser.add_argument('--tolerance', type=float, default=20.0,
+                        help='allowed slowdown of medians in percent')
+    parser.add_argument('--skip-startup', action='store_true')
+    return parser.parse_args(args)
+
+def main(args):
+    options = parse_args(args)
+    root = tempfile.mkdtemp(prefix='launchit-bench-')
+    try:
+        fixture = Fixture(root, options.path_dirs, options.executables,
+                          options.entries, options.depth, options.seed)
+        fixture.create()
+        # Must be done before PyXDG is imported
+        os.environ.update(fixture.get_environ())
+        durations = run_core_benchmarks(fixture, options.repeat)
+        durations.update(run_launch_benchmarks(fixture, options.repeat))
+        durations.update(run_gui_benchmarks(fixture, options.repeat))
+        if not options.skip_startup:
+            durations.update(run_startup_benchmarks(fixture, options.repeat))
+    finally:
+        shutil.rmtree(root)
+    results = dict((name, get_stats(values))
+                   for name, values in durations.items())
+    print('{0:<32} {1:>10} {2:>10} {3:>10} {4:>6}'.format(
+        'benchmark', 'p50 (ms)', 'p90 (ms)', 'p99 (ms)', 'count'))
+    for name in sorted(results):
+        stats = results[name]
+        print('{0:<32} {1:10.3f} {2:10.3f} {3:10.3f} {4:6d}'.format(
+            name, stats['p50'], stats['p90'], stats['p99'], stats['count']))
+    if options.output:
+        data = {'version': RESULT_VERSION, 'fixture': fixture.params,
+                'python': platform.python_version(), 'results': results}
+        with open(options.output, 'w') as output:
+            json.dump(data, output, indent=2, sort_keys=True)
+    if options.baseline:
+        with open(options.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get('fixture') != fixture.params:
+            print('Warning: The baseline used another fixture')
+        print('')
+        regressions = compare(results, baseline['results'],
+                              options.tolerance)
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -8,9 +8,36 @@ Some features:
 - Guess suitable icon when dealing with a command or file
 - Launch files with their associated application (images, scripts, ...)
 - A GUI to conveniently benefit of those features
+- A headless command-line interface for scripts
 """
 __author__ = 'Sebastian Linke'
 __license__ = 'MIT'
 __version__ = '0.1-dev'
 
-from . import core, gui, icongetter, logger, settings
+import importlib
+import sys
+import types
+
+__all__ = ['cli', 'core', 'gui', 'icongetter', 'icontheme', 'logger', 
+           'mimeapps', 'mimecache', 'settings', 'stringtable', 'watcher']
+
+class _LazyPackage(types.ModuleType):
+    """
+    Import the submodules listed in `__all__` on first access. Thus, importing
+    the package (or e.g. `launchit.core`) does not import PySide and PyXDG,
+    unless the modules depending on them are actually used.
+
+    Module-level `__getattr__()` needs Python 3.7 or later, so the package's
+    module is replaced by an instance of this type inside `sys.modules`.
+    """
+    def __getattr__(self, name):
+        if name in __all__:
+            return importlib.import_module('.' + name, __name__)
+        msg = 'module {0!r} has no attribute {1!r}'
+        raise AttributeError(msg.format(__name__, name))
+
+_package = _LazyPackage(__name__)
+_package.__dict__.update(globals())
+# Python 2 clears the globals of a module, when it is deallocated
+_package._module = sys.modules[__name__]
+sys.modules[__name__] = _package
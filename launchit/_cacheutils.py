@@ -0,0 +1,203 @@
+"""
+Helpers to store data in cache files, which are invalidated as soon as one
+of their source files has changed. (Not part of the launchit API)
+"""
+# Stdlib
+from collections import OrderedDict
+import json
+import os
+import tempfile
+import threading
+
+# Launchit package
+from . import logger, settings, stringtable
+
+# Increase this when the structure of a cache file changes
+FORMAT_VERSION = 1
+
+def get_mtimes(paths):
+    """
+    Return a dictionary, which maps each of the given `paths` to the path's
+    modification time. Paths that do not exist are mapped to `None`.
+    """
+    mtimes = {}
+    for path in paths:
+        try:
+            mtimes[path] = os.stat(path).st_mtime
+        except OSError:
+            mtimes[path] = None
+    return mtimes
+
+def load_cache(filename, key=None):
+    """
+    Return the data, which was stored in the cache file named `filename` by
+    `save_cache()`. `None` is returned, if the file does not exist, if it is
+    unreadable, if it was stored with another `key` or if the modification
+    time of one of its sources has changed since then.
+
+    Note that `key` must be JSON-serializable. Lists should be used instead
+    of tuples, since JSON does not know about tuples.
+    """
+    entry = load_cache_entry(filename, key)
+    return entry[0] if entry is not None else None
+
+def load_cache_entry(filename, key=None):
+    """
+    Return the data and the modification times of its sources (as given to
+    `save_cache()`) as a tuple. `None` is returned under the same conditions
+    as for `load_cache()`.
+    """
+    path = settings.get_cache_path(filename)
+    try:
+        with open(path) as cache_file:
+            cache = json.load(cache_file)
+    except (EnvironmentError, ValueError):
+        return None
+    if cache.get('version') != FORMAT_VERSION or cache.get('key') != key:
+        return None
+    sources = cache.get('sources', {})
+    if get_mtimes(sources) != sources:
+        return None
+    return (cache.get('data'), sources)
+
+def save_cache(filename, data, mtimes, key=None):
+    """
+    Store `data` in the cache file named `filename`. `mtimes` should be the
+    result of `get_mtimes()` for the source paths of `data`. It should have
+    been retrieved *before* the data was generated, so that changes in the
+    meantime will invalidate the cache. Return `True` on success. On failure
+    a warning is logged and `False` is returned.
+
+    The file is replaced atomically, so that concurrent readers never see
+    incomplete contents.
+    """
+    cache = {'version': FORMAT_VERSION, 'key': key,
+             'sources': mtimes, 'data': data}
+
+    def write(path):
+        with open(path, 'w') as cache_file:
+            json.dump(cache, cache_file)
+
+    return replace_file(settings.get_cache_path(filename), write)
+
+def load_table(filename, key=None):
+    """
+    Return a `stringtable.StringTable` for the table file named `filename`
+    inside the user's cache directory, which was stored by `save_table()`.
+    `None` is returned under the same conditions as for `load_cache()`.
+    """
+    path = settings.get_cache_path(filename)
+    try:
+        table = stringtable.StringTable(path)
+    except (EnvironmentError, ValueError):
+        return None
+    try:
+        meta = json.loads(table.get_meta().decode('utf-8'))
+    except ValueError:
+        meta = {}
+    sources = meta.get('sources', {})
+    if (meta.get('version') != FORMAT_VERSION or meta.get('key') != key
+            or get_mtimes(sources) != sources):
+        table.close()
+        return None
+    return table
+
+def save_table(filename, items, mtimes, key=None):
+    """
+    Store `items` (an iterable of `(key, value)`-tuples of byte strings) as
+    a table file named `filename`. See `save_cache()` for the other 
+    arguments and for the return value. 
+
+    Note that processes, which still use the replaced file, keep on seeing
+    its old contents, since the file is not changed in-place.
+    """
+    meta = {'version': FORMAT_VERSION, 'key': key, 'sources': mtimes}
+    meta = json.dumps(meta).encode('utf-8')
+    def write(path):
+        stringtable.write_table(path, items, meta)
+    return replace_file(settings.get_cache_path(filename), write)
+
+def replace_file(path, write):
+    """
+    Call `write` with the path of a new temporary file and atomically move
+    that file to `path` afterwards. The directory of `path` is created if
+    needed. Return `True` on success. On failure a warning is logged and 
+    `False` is returned.
+    """
+    dirname = os.path.dirname(path)
+    try:
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        fd, temp_path = tempfile.mkstemp(dir=dirname)
+        os.close(fd)
+    except EnvironmentError as error:
+        logger.warning('Unable to create cache file: {0}'.format(error))
+        return False
+    try:
+        write(temp_path)
+        os.rename(temp_path, path)
+    except EnvironmentError as error:
+        logger.warning('Unable to write cache file: {0}'.format(error))
+        os.remove(temp_path)
+        return False
+    return True
+
+class LRUCache(object):
+    """
+    A size-bounded mapping, which evicts its least recently used entry when
+    a new entry is added while the cache is full. The numbers of hits, misses
+    and evictions are counted. All operations are thread-safe.
+    """
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        """
+        Return the value for `key` and mark it as recently used. Return
+        `default` if `key` is not inside the cache.
+        """
+        with self._lock:
+            try:
+                value = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._entries[key] = value
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Store `value` for `key`. Evict the least recently used entry, if 
+        the cache is full.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = value
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Remove all entries. Note that the counters are left unchanged.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """
+        Return a dictionary containing the counters and the current size.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 
+                'evictions': self.evictions, 'size': len(self._entries), 
+                'maxsize': self.maxsize}
@@ -0,0 +1,165 @@
+"""
+Headless command-line interface, which does not need PySide or a display.
+
+It is meant to be used by scripts and keybindings (e.g. together with dmenu)
+and writes its results to `stdout`, one per line, as soon as they are known:
+
+    launchit --complete FRAGMENT   Print the completions for FRAGMENT
+    launchit --icon COMMAND        Print the icon name and path for COMMAND
+    launchit --launch CMDLINE      Launch CMDLINE
+    launchit --stdin               Read requests from `stdin`
+
+When `--stdin` is given, each line of the input is a request in the form
+"complete FRAGMENT", "icon COMMAND" or "launch CMDLINE". The response to
+a request consists of its result lines followed by an empty line. A failed
+request is answered by a line starting with "error: ".
+"""
+# Stdlib
+import argparse
+import errno
+import os
+import sys
+
+# Launchit package
+from . import core, logger
+
+class RequestError(Exception):
+    """
+    Used to indicate that a request could not be fulfilled.
+    """
+    pass
+
+def iter_completions(fragment, limit=None):
+    """
+    Yield the completions for `fragment`. Completions for names inside
+    `$PATH` are yielded in sorted order. Completions for path names are
+    yielded in the order, in which the directory returns them, while the
+    directory is being read. Directories get a trailing separator. Up to
+    `limit` completions are yielded (all, if this is `None`).
+    """
+    if os.path.dirname(fragment):
+        for completion in core.iter_path_completions(fragment, limit):
+            yield completion.get_display_name()
+    else:
+        completions, total = core.get_best_completions(fragment, limit)
+        for completion in completions:
+            yield completion
+
+def iter_icon_lines(command):
+    """
+    Yield a line containing the guessed icon name for `command`, followed
+    by a tab and the path of that icon inside the configured theme. The
+    path is left empty, if no file was found.
+    """
+    # Imported here, since the icon stuff is not needed for the other modes
+    from . import icongetter
+    name = icongetter.guess_icon_name(command)
+    path = icongetter.get_icon_path(name)
+    yield '{0}\t{1}'.format(name, path or '')
+
+def iter_launch_lines(cmdline):
+    """
+    Launch `cmdline` without waiting for it and yield nothing. Raise a
+    `RequestError` if that failed.
+    """
+    try:
+        core.launch(cmdline)
+    except (core.LaunchError, EnvironmentError, ValueError) as error:
+        # `EnvironmentError` is raised when e.g. the starter is missing
+        raise RequestError(str(error))
+    return iter([])
+
+def get_handlers(limit=None):
+    """
+    Return a dictionary, which maps each request name to a function that
+    takes the request's argument and returns an iterator over the lines
+    to write. `limit` is used for completions.
+    """
+    return {
+        'complete': lambda fragment: iter_completions(fragment, limit),
+        'icon': iter_icon_lines,
+        'launch': iter_launch_lines,
+    }
+
+def write_lines(lines, output):
+    """
+    Write each item of `lines` as a line to `output`. Output is flushed after
+    each line, so that a reader gets each result as soon as it is known, even
+    if `output` is a (block-buffered) pipe.
+    """
+    for line in lines:
+        output.write(line)
+        output.write('\n')
+        output.flush()
+
+def serve(input, output, limit=None):
+    """
+    Answer the requests read from `input` by writing to `output` until the
+    end of `input` is reached. See the module's docstring for details about
+    the protocol. Output is flushed after each line. Invalid arguments
+    (e.g. a command line with an unterminated quote) are answered by an
+    error line, so they do not stop the server.
+    """
+    handlers = get_handlers(limit)
+    for line in iter(input.readline, ''):
+        line = line.rstrip('\r\n')
+        if not line:
+            continue
+        name, _, argument = line.partition(' ')
+        try:
+            handler = handlers.get(name)
+            if handler is None:
+                raise RequestError('Unknown request {0!r}'.format(name))
+            write_lines(handler(argument), output)
+        except (RequestError, LookupError, ValueError) as error:
+            output.write('error: {0}\n'.format(error))
+        output.write('\n')
+        output.flush()
+
+def parse_args(args):
+    """
+    Parse the command-line arguments `args` (without the program name) and
+    return the result as an `argparse.Namespace`.
+    """
+    parser = argparse.ArgumentParser(
+        prog='launchit', description='Complete, inspect and launch commands '
+                                     'without starting the GUI.')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--complete', metavar='FRAGMENT',
+                       help='print the completions for FRAGMENT')
+    group.add_argument('--icon', metavar='COMMAND',
+                       help='print the icon name and path for COMMAND')
+    group.add_argument('--launch', metavar='CMDLINE',
+                       help='launch CMDLINE')
+    group.add_argument('--stdin', action='store_true',
+                       help='read requests from stdin')
+    parser.add_argument('--limit', type=int, metavar='N',
+                        help='print no more than N completions')
+    return parser.parse_args(args)
+
+def main(args=None):
+    """
+    Run the interface for the command-line arguments `args` (without the
+    program name). If `args` is `None`, then `sys.argv` is used. Return
+    the exit code.
+    """
+    options = parse_args(sys.argv[1:] if args is None else args)
+    output = sys.stdout
+    try:
+        if options.stdin:
+            serve(sys.stdin, output, options.limit)
+        else:
+            handlers = get_handlers(options.limit)
+            for name in ('complete', 'icon', 'launch'):
+                argument = getattr(options, name)
+                if argument is not None:
+                    write_lines(handlers[name](argument), output)
+            output.flush()
+    except (RequestError, LookupError, ValueError) as error:
+        logger.error(str(error))
+        return 1
+    except IOError as error:
+        # The reader went away (e.g. `head` got enough lines)
+        if error.errno != errno.EPIPE:
+            raise
+    return 0
@@ -1,14 +1,25 @@
 """
 Basic functionality to launch files and commands.
 """
+import heapq
 from itertools import chain
 import os
 import shlex
+import stat
 import subprocess
+import sys
+import threading
+import time
+
+try:
+    from os import scandir
+except ImportError:
+    # Python < 3.5
+    scandir = None
 
 # launchit package
 from ._stringutils import altstring, basestring, convert, ENCODING
-from . import settings
+from . import _cacheutils, logger, settings
 
 class LaunchError(Exception):
     """
@@ -19,12 +30,18 @@ class LaunchError(Exception):
 # Readable helper when checking exit code
 EXIT_SUCCESS = 0
 
+# Maximal number of command names remembered by `command_resolver`
+COMMAND_CACHE_SIZE = 1024
+
+# Marks a name, which is not inside the cache (misses are stored as `None`)
+MISSING = object()
+
 # The tool used to open a file in the "preferred way"
 STARTER = settings.config['starter']
 
 ### High-level functions
 
-def get_name_completions(fragment=''):
+def get_name_completions(fragment='', index=None):
     """
     Return matching (path-)names based on given fragment.
 
@@ -42,22 +59,46 @@ def get_name_completions(fragment=''):
     is kept in original spelling when completed, although "~" and
     "~home" are internally expanded to the user's home directory.
     Non-existing dirnames are silently ignored.
+
+    The contents of the PATH directories are retrieved via `index`, which 
+    should be a `CommandIndex`-like instance. If `index` is `None`, then 
+    the module-level `command_index` is used.
     """
-    dirname = os.path.dirname(fragment)
-    if dirname:
-        expanded = os.path.expanduser(dirname)
-        if not os.path.isdir(expanded):
-            return []
-        names = (os.path.join(dirname, name) for name in os.listdir(expanded))
-    else:
-        dirnames = get_path_dirs() + [os.curdir]
-        if isinstance(fragment, altstring):
-            dirnames = (convert(dirname, altstring) for dirname in dirnames)
-        names = set(chain.from_iterable(map(os.listdir, dirnames)))
-    if os.path.basename(fragment):
-        names = (name for name in names if fragment in name)
-    return sorted(names)
+    return sorted(iter_matching_names(fragment, index))
+
+@logger.timed('completion')
+def get_best_completions(fragment='', limit=None, key=None, index=None):
+    """
+    Return the first `limit` completions for `fragment` together with the
+    total number of matching names as a tuple in the form `(completions, 
+    total)`. The completions are ordered by `key`, which is used like the 
+    `key`-argument of `sorted()`. If `limit` is `None`, all completions are 
+    returned.
+
+    This is meant to be used instead of `get_name_completions()`, when only
+    a few completions can be shown anyway. Since a partial selection is done
+    instead of sorting all names, this is much faster for short fragments.
+    See `get_name_completions()` for details on `fragment` and `index`.
+    """
+    return select_best(list(iter_matching_names(fragment, index)), limit, key)
+
+def iter_path_completions(fragment, limit=None, timeout=None):
+    """
+    Yield a `PathCompletion` for each name inside the directory part of 
+    `fragment`, which matches `fragment` like it would do for the function 
+    `get_name_completions()`. Names are yielded in the order, in which the 
+    directory returns them, while the directory is being read. Nothing is 
+    yielded, if `fragment` has no directory part or if the directory does 
+    not exist.
+
+    Reading is stopped as soon as `limit` completions were yielded or when 
+    more than `timeout` seconds have elapsed. This is meant to be used for 
+    huge directories, where only the first few completions are of interest.
+    """
+    for name, entry in iter_path_entries(fragment, limit, timeout):
+        yield PathCompletion(name, entry)
 
+@logger.timed('launch')
 def launch(cmdline, skip_starter=False):
     """
     Analyze given command-line string and make the most reasonable kind of
@@ -81,6 +122,12 @@ def launch(cmdline, skip_starter=False):
     directory. It sometimes might be useful to specify a directory component to 
     avoid name clashes, e.g. things like "./test" instead of "test", but beware 
     that "./test.py" will not necessarily execute the script (as noted above).
+
+    This blocks while the starter is running, since its exit code decides 
+    whether the next kind of invocation is tried and whether a `LaunchError`
+    is raised to the caller (e.g. to report failure by an exit code). Common
+    starters return as soon as they have passed the path to an application.
+    Callers, which must not block (like the GUI), use `launch_async()`.
     """
     args = parse_commandline(cmdline)
     if not args:
@@ -88,18 +135,81 @@ def launch(cmdline, skip_starter=False):
     # Trial and error through the kinds of invocation
     success = False
     if is_command(args[0]):
-        subprocess.Popen(args)
+        process_supervisor.spawn(args)
         success = True
     if not success and not skip_starter and len(args) == 1:
         success = open_with_starter(args[0], silent=True) == EXIT_SUCCESS
     if not success and is_executable_file(args[0]):
         args[0] = os.path.abspath(args[0])
-        subprocess.Popen(args)
+        process_supervisor.spawn(args)
         success = True
     if not success:
         error = 'Unable to launch {0}'.format(' '.join(args))
         raise LaunchError(error)
 
+@logger.timed('launch')
+def launch_async(cmdline, on_exit=None, on_error=None, skip_starter=False,
+                 supervisor=None):
+    """
+    Do the same as `launch()`, but without blocking the caller. 
+
+    The invoked process is started by `supervisor`, which should be a 
+    `ProcessSupervisor`-like instance. If `supervisor` is `None`, then the 
+    module-level `process_supervisor` is used. When the process has exited, 
+    `on_exit` is called with the process's arguments and its exit code. If 
+    nothing could be launched, `on_error` is called with a `LaunchError`. 
+    Note that both callbacks are always called on a background thread.
+
+    The kinds of invocation are tried on a background thread, since looking
+    up a file's default application may need to read some files. The 
+    starter's exit code is needed to decide, whether the next kind of 
+    invocation should be tried, so that step is continued on the starter's 
+    reaper thread. A `ValueError` is raised immediately, if `cmdline` does 
+    not contain any arguments.
+    """
+    args = parse_commandline(cmdline)
+    if not args:
+        raise ValueError('Got no arguments, so nothing is launched')
+    if supervisor is None:
+        supervisor = process_supervisor
+
+    def spawn(args, on_exit, silent=False):
+        try:
+            supervisor.spawn(args, on_exit, silent)
+            return True
+        except OSError:
+            return False
+
+    def launch_in_curdir():
+        path = os.path.abspath(args[0])
+        if is_executable_file(args[0]) and spawn([path] + args[1:], on_exit):
+            return
+        if on_error is not None:
+            error = 'Unable to launch {0}'.format(' '.join(args))
+            on_error(LaunchError(error))
+
+    def handle_starter_exit(starter_args, exit_code):
+        if exit_code != EXIT_SUCCESS:
+            launch_in_curdir()
+        elif on_exit is not None:
+            on_exit(starter_args, exit_code)
+
+    def dispatch():
+        # Trial and error through the kinds of invocation
+        if is_command(args[0]) and spawn(args, on_exit):
+            return
+        if not skip_starter and len(args) == 1:
+            command = get_default_app_command(args[0])
+            if command is not None and spawn(command, on_exit):
+                return
+            if spawn([STARTER, args[0]], handle_starter_exit, silent=True):
+                return
+        launch_in_curdir()
+
+    dispatcher = threading.Thread(target=dispatch)
+    dispatcher.daemon = True
+    dispatcher.start()
+
 def get_marked_completion(completion, fragment, start_mark, end_mark):
     """
     Replace each occurrence of given fragment with the fragment surrounded
@@ -109,6 +219,486 @@ def get_marked_completion(completion, fragment, start_mark, end_mark):
     marked_fragment = start_mark + fragment + end_mark
     return completion.replace(fragment, marked_fragment)
 
+### Caching
+
+class CommandIndex(object):
+    """
+    A cache for the contents of the directories, which are used to look up
+    command names (i.e. the directories defined inside the environment
+    variable PATH and the current directory).
+
+    Each directory listing is stored together with the directory's inode,
+    device and modification time. On a lookup, every directory is checked 
+    with a single `os.stat()`-call and only those directories are listed 
+    again, whose stat-values have changed since the last lookup. Names of
+    directories that do not exist (anymore) are silently ignored.
+
+    Directories, which are observed by a file watcher (see `launchit.watcher`)
+    may be marked as watched. They are not checked on lookups anymore. 
+    Instead, the watcher is expected to report changes via `add_name()` and 
+    `remove_name()` (or `invalidate()` if the changes are unknown).
+
+    If the configuration dictionary's value for `cache-method` is "mmap",
+    then each listing is stored as a table file inside the user's cache 
+    directory (see `launchit.stringtable`), which is shared by all processes
+    listing the same directory. The names are not copied into memory then.
+
+    Names are returned in the string type of the given dirnames. Therefore,
+    listings are cached separately for native and alternate dirnames, which
+    compare equal on Python 2. Watched directories are updated for both.
+    """
+    def __init__(self):
+        self._listings = {}
+        self._watched = set()
+        self._dirnames = None
+        self._names = frozenset()
+        self._dirty = False
+        self._lock = threading.RLock()
+        # Increased each time the set of known names may have changed
+        self.generation = 0
+
+    def get_names(self, dirnames):
+        """
+        Return a `frozenset` of all names inside the given `dirnames`. Note
+        that the result is cached as long as none of the directories has 
+        changed. Thus, callers must not rely on getting a new object.
+
+        If tables are used, then a set-like `stringtable.UnionSet` is 
+        returned instead, which also provides `iter_matches()`.
+        """
+        dirnames = tuple(get_typed_key(dirname) for dirname in dirnames)
+        with self._lock:
+            changed = self._dirty or (dirnames != self._dirnames)
+            for dirname in set(dirnames):
+                if self._update_listing(dirname):
+                    changed = True
+            if changed:
+                listings = [self._listings[dirname][1] for dirname in dirnames 
+                            if dirname in self._listings]
+                if any(not isinstance(names, frozenset) 
+                       for names in listings):
+                    # Avoid copying the tables
+                    from .stringtable import UnionSet
+                    self._names = UnionSet(listings)
+                else:
+                    self._names = frozenset(chain.from_iterable(listings))
+                self._dirnames = dirnames
+                self._dirty = False
+                self.generation += 1
+            return self._names
+
+    def set_watched(self, dirname, watched=True):
+        """
+        Mark `dirname` as being observed by a file watcher (or unmark it, if 
+        `watched` is `False`).
+        """
+        with self._lock:
+            for key in iter_typed_keys(dirname):
+                if watched:
+                    self._watched.add(key)
+                else:
+                    self._watched.discard(key)
+
+    def add_name(self, dirname, name):
+        """
+        Add `name` to the cached listing of `dirname`. Nothing is done, if 
+        `dirname` was not listed yet.
+        """
+        self._change_listing(dirname, name, 
+                             lambda names, name: names | set([name]))
+
+    def remove_name(self, dirname, name):
+        """
+        Remove `name` from the cached listing of `dirname`. Nothing is done, 
+        if `dirname` was not listed yet.
+        """
+        self._change_listing(dirname, name, 
+                             lambda names, name: names - set([name]))
+
+    def invalidate(self, dirname):
+        """
+        Drop the cached listing of `dirname`. It will be listed again on the
+        next lookup.
+        """
+        with self._lock:
+            for key in iter_typed_keys(dirname):
+                if self._listings.pop(key, None) is not None:
+                    self._dirty = True
+
+    def clear(self):
+        """
+        Remove all cached directory listings.
+        """
+        with self._lock:
+            self._listings.clear()
+            self._dirnames = None
+            self._names = frozenset()
+            self.generation += 1
+
+    def _change_listing(self, dirname, name, change):
+        """
+        Replace each cached listing of `dirname` with the result of calling 
+        `change` on it and on `name` (converted to the listing's string type).
+        """
+        with self._lock:
+            for typed_key in iter_typed_keys(dirname):
+                if typed_key not in self._listings:
+                    continue
+                key, names = self._listings[typed_key]
+                try:
+                    typed_name = convert(name, typed_key[0])
+                except UnicodeError:
+                    typed_name = None
+                if isinstance(names, frozenset) and typed_name is not None:
+                    names = change(names, typed_name)
+                    self._listings[typed_key] = (key, names)
+                else:
+                    # Tables are read-only, so the directory is listed again
+                    del self._listings[typed_key]
+                self._dirty = True
+
+    def _update_listing(self, typed_key):
+        """
+        Re-list the directory given by `typed_key` (see `get_typed_key()`), 
+        if it was modified since the last call. Return `True` if the cached 
+        listing has changed, otherwise `False`.
+        """
+        if typed_key in self._watched and typed_key in self._listings:
+            return False
+        dirname = typed_key[1]
+        key = get_dir_signature(dirname)
+        if key is None:
+            return self._listings.pop(typed_key, None) is not None
+        cached = self._listings.get(typed_key)
+        if cached is not None and cached[0] == key:
+            return False
+        names = None
+        if settings.config['cache-method'] == 'mmap':
+            names = get_listing_table(dirname, key)
+        if names is None:
+            try:
+                names = frozenset(os.listdir(dirname))
+            except OSError:
+                # Probably missing read permissions
+                names = frozenset()
+        self._listings[typed_key] = (key, names)
+        return True
+
+def get_typed_key(dirname):
+    """
+    Return a key for `dirname`, which differs for native and alternate 
+    strings. Those would compare equal on Python 2, although the names 
+    listed for them have different types.
+    """
+    return (type(dirname), dirname)
+
+def iter_typed_keys(dirname):
+    """
+    Yield the keys (see `get_typed_key()`) of `dirname` for both string
+    types. Dirnames, which cannot be converted, are skipped.
+    """
+    for string_type in (str, altstring):
+        try:
+            yield get_typed_key(convert(dirname, string_type))
+        except UnicodeError:
+            pass
+
+def get_listing_table(dirname, signature):
+    """
+    Return the names inside `dirname` as a `stringtable.TableSet`, which is
+    read from the table file for `dirname` inside the user's cache directory.
+    That file is written, if it is missing or if it was made for another 
+    `signature` of the directory (see `get_dir_signature()`). Return `None`
+    if the directory cannot be listed or if the file cannot be written.
+    """
+    # Imported here, since this is only used with a certain configuration
+    import hashlib
+    from . import stringtable
+    native_dirname = stringtable.decode(stringtable.encode(dirname))
+    filename = 'names-{0}.table'.format(
+        hashlib.md5(stringtable.encode(dirname)).hexdigest())
+    key = [native_dirname, list(signature)]
+    table = _cacheutils.load_table(filename, key)
+    if table is None:
+        try:
+            names = os.listdir(dirname)
+        except OSError:
+            return None
+        items = ((stringtable.encode(name), b'') for name in names)
+        if not _cacheutils.save_table(filename, items, {}, key):
+            return None
+        table = _cacheutils.load_table(filename, key)
+        if table is None:
+            return None
+    return stringtable.TableSet(table, type(dirname))
+
+# Used by `get_name_completions()` when no explicit index was given
+command_index = CommandIndex()
+
+class CompletionSession(object):
+    """
+    Make name completions for a fragment, which is typically growing by
+    one character after another while the user is typing. 
+
+    The session remembers the completions made for the previous fragment.
+    If the new fragment just extends the previous one and if the underlying 
+    names did not change in the meantime, then only the previous completions 
+    are filtered. In any other case (e.g. when a character was removed or 
+    when the fragment's dirname has changed), the completions are made from 
+    scratch by calling `iter_matching_names()`.
+    """
+    def __init__(self, index=None):
+        """
+        Setup the session. `index` is passed to `iter_matching_names()` 
+        and may therefore be `None` in order to use `command_index`.
+        """
+        self.index = index
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the previous completions. The next call to 
+        `get_completions()` will do a full scan.
+        """
+        self._fragment = None
+        self._source = None
+        self._matches = []
+
+    def get_completions(self, fragment=''):
+        """
+        Return the completions for `fragment`, as `get_name_completions()` 
+        would do.
+        """
+        return sorted(self._get_matches(fragment))
+
+    @logger.timed('completion')
+    def get_best_completions(self, fragment='', limit=None, key=None):
+        """
+        Return the first `limit` completions for `fragment` and the total
+        number of completions, as `get_best_completions()` would do.
+        """
+        return select_best(self._get_matches(fragment), limit, key)
+
+    def _get_matches(self, fragment):
+        """
+        Return an unordered list of the names matching `fragment`.
+        """
+        source = self._get_source(fragment)
+        if fragment == self._fragment and source == self._source:
+            return self._matches
+        if self._can_narrow(fragment, source):
+            matches = [name for name in self._matches if fragment in name]
+        else:
+            matches = list(iter_matching_names(fragment, self.index))
+        self._fragment = fragment
+        self._source = source
+        self._matches = matches
+        return matches
+
+    def _can_narrow(self, fragment, source):
+        """
+        Return `True` if the completions for `fragment` may be obtained by 
+        filtering the previous completions, otherwise `False`.
+        """
+        previous = self._fragment
+        return (previous is not None and source == self._source
+                and type(fragment) is type(previous)
+                and fragment.startswith(previous))
+
+    def _get_source(self, fragment):
+        """
+        Return a value, which identifies the names that `fragment` is 
+        completed from. Two equal values are returned only if those names 
+        did not change in between.
+        """
+        dirname = os.path.dirname(fragment)
+        if dirname:
+            expanded = os.path.expanduser(dirname)
+            return (dirname, get_dir_signature(expanded))
+        index = command_index if self.index is None else self.index
+        dirnames = splitenv('PATH') + [os.curdir]
+        if isinstance(fragment, altstring):
+            dirnames = [convert(dirname, altstring) for dirname in dirnames]
+        index.get_names(dirnames)
+        return (None, id(index), index.generation)
+
+class CommandResolver(object):
+    """
+    A cache for the paths of commands inside the directories defined by the 
+    environment variable PATH. Misses are cached, too. Only bare command 
+    names are remembered (at most `maxsize` of them). Names containing a 
+    path separator are checked on each call, since they may refer to files 
+    outside of PATH, whose changes would not be noticed.
+
+    The cache is cleared automatically, when the value of PATH has changed 
+    or when the signature of one of its directories (see the function 
+    `get_dir_signature()`) has changed. Directories, which are observed by 
+    a file watcher, may be marked as watched. They are not checked anymore.
+    Instead, the watcher is expected to call `invalidate()` on changes. 
+    Note that changes of a file's permissions are not noticed at all, so
+    `invalidate()` needs to be called in that case, too.
+    """
+    def __init__(self, maxsize=COMMAND_CACHE_SIZE):
+        self._path = None
+        self._dirnames = []
+        self._signatures = None
+        self._watched = set()
+        self._paths = _cacheutils.LRUCache(maxsize)
+        self._lock = threading.RLock()
+
+    def resolve(self, filename):
+        """
+        Return the path of the first executable file named `filename` inside 
+        the PATH directories, or `None` if there is no such file.
+        """
+        with self._lock:
+            self._validate()
+            return self._get_path(filename)
+
+    def resolve_many(self, filenames):
+        """
+        Return a list containing the result of `resolve()` for each item of
+        `filenames`. PATH and its directories are checked only once, so all
+        results refer to the same state of them.
+        """
+        with self._lock:
+            self._validate()
+            return [self._get_path(filename) for filename in filenames]
+
+    def set_watched(self, dirname, watched=True):
+        """
+        Mark `dirname` as being observed by a file watcher (or unmark it, if 
+        `watched` is `False`).
+        """
+        with self._lock:
+            if watched:
+                self._watched.add(dirname)
+            else:
+                self._watched.discard(dirname)
+            self._signatures = None
+
+    def invalidate(self):
+        """
+        Clear the cache.
+        """
+        with self._lock:
+            self._paths.clear()
+
+    def _validate(self):
+        """
+        Clear the cache, if PATH or one of its directories has changed.
+        """
+        path = os.getenv('PATH', '')
+        if path != self._path:
+            self._path = path
+            self._dirnames = splitenv('PATH')
+            self._signatures = None
+        signatures = tuple(dirname in self._watched or 
+                           get_dir_signature(dirname) 
+                           for dirname in self._dirnames)
+        if signatures != self._signatures:
+            self._signatures = signatures
+            self._paths.clear()
+
+    def _get_path(self, filename):
+        """
+        Return the path of `filename` and remember it, if `filename` is a 
+        bare command name. The cache must have been validated before.
+        """
+        if os.path.dirname(filename):
+            return self._lookup(filename)
+        path = self._paths.get(filename, MISSING)
+        if path is MISSING:
+            path = self._lookup(filename)
+            self._paths.put(filename, path)
+        return path
+
+    def _lookup(self, filename):
+        """
+        Return the path of `filename` without using the cache.
+        """
+        if os.path.isabs(filename):
+            # Joining would return `filename` for each directory anyway
+            if any(signature is not None for signature in self._signatures):
+                if is_executable_file(filename):
+                    return filename
+            return None
+        for path_dir, signature in zip(self._dirnames, self._signatures):
+            if signature is None:
+                # Not an existing directory
+                continue
+            if isinstance(filename, altstring):
+                path_dir = convert(path_dir, altstring)
+            path = os.path.join(path_dir, filename)
+            if is_executable_file(path):
+                return path
+        return None
+
+# Used by `get_command_path()`
+command_resolver = CommandResolver()
+
+### Process handling
+
+class ProcessSupervisor(object):
+    """
+    Start processes without blocking and wait for them to terminate.
+
+    Each process is started inside a new session, so that it is detached 
+    from launchit's terminal and process group. A reaper thread is waiting 
+    for each process. Thus, terminated processes are not left behind as 
+    zombies and their exit codes can be reported.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._processes = {}
+
+    def spawn(self, args, on_exit=None, silent=False):
+        """
+        Start a process for `args` and return it as a `subprocess.Popen`-
+        object. `on_exit` is called with `args` and the exit code, after 
+        the process has terminated. If `silent` is `True`, then the output 
+        of the process is suppressed. Raise `OSError` if the process could 
+        not be started.
+        """
+        kwargs = {'close_fds': True}
+        if sys.version_info >= (3, 2):
+            kwargs['start_new_session'] = True
+        else:
+            kwargs['preexec_fn'] = os.setsid
+        with open(os.devnull, 'r+b') as null:
+            kwargs['stdin'] = null
+            if silent:
+                kwargs['stdout'] = kwargs['stderr'] = null
+            process = subprocess.Popen(args, **kwargs)
+        with self._lock:
+            self._processes[process.pid] = (process, args)
+        reaper = threading.Thread(target=self._reap, 
+                                  args=(process, args, on_exit))
+        reaper.daemon = True
+        reaper.start()
+        return process
+
+    def get_running(self):
+        """
+        Return a list of the processes, which have not terminated yet.
+        """
+        with self._lock:
+            return [process for process, args in self._processes.values()]
+
+    def _reap(self, process, args, on_exit):
+        """
+        Wait for `process` to terminate and report its exit code. This is
+        called on the process's reaper thread.
+        """
+        exit_code = process.wait()
+        with self._lock:
+            del self._processes[process.pid]
+        if on_exit is not None:
+            on_exit(args, exit_code)
+
+# Used by `launch()` and `launch_async()` when no explicit supervisor is given
+process_supervisor = ProcessSupervisor()
+
 ### Low-level functions
 
 def splitenv(varname):
@@ -127,6 +717,164 @@ def get_path_dirs():
     """
     return [name for name in splitenv('PATH') if os.path.isdir(name)]
 
+def iter_matching_names(fragment='', index=None):
+    """
+    Iterate over the names matching `fragment` in arbitrary order. See 
+    `get_name_completions()` for details.
+    """
+    if os.path.dirname(fragment):
+        return (name for name, entry in iter_path_entries(fragment))
+    else:
+        if index is None:
+            index = command_index
+        dirnames = splitenv('PATH') + [os.curdir]
+        if isinstance(fragment, altstring):
+            dirnames = [convert(dirname, altstring) for dirname in dirnames]
+        names = index.get_names(dirnames)
+    if os.path.basename(fragment):
+        if hasattr(names, 'iter_matches'):
+            # Search the tables without creating all names
+            return names.iter_matches(fragment)
+        names = (name for name in names if fragment in name)
+    return iter(names)
+
+def iter_path_entries(fragment, limit=None, timeout=None):
+    """
+    Do the work for `iter_path_completions()`, but yield a tuple in the 
+    form `(name, entry)` for each match, where `entry` is the match's 
+    `os.DirEntry`-like object.
+    """
+    dirname = os.path.dirname(fragment)
+    if not dirname:
+        return
+    if timeout is not None:
+        deadline = time.time() + timeout
+    try:
+        entries = iter_dir_entries(os.path.expanduser(dirname))
+    except OSError:
+        return
+    count = 0
+    match_all = not os.path.basename(fragment)
+    try:
+        for entry in entries:
+            if limit is not None and count >= limit:
+                break
+            if timeout is not None and time.time() > deadline:
+                break
+            name = os.path.join(dirname, entry.name)
+            if match_all or fragment in name:
+                count += 1
+                yield (name, entry)
+    finally:
+        # Release the directory handle when stopped early
+        if hasattr(entries, 'close'):
+            entries.close()
+
+class PathCompletion(object):
+    """
+    A completed path name as yielded by `iter_path_completions()`. 
+
+    The `name`-attribute holds the completion (with the directory part kept 
+    in the original spelling). The type of the path can be asked for by 
+    `is_dir()` and `is_symlink()`. Their answers are usually taken from the 
+    directory listing, so that no extra `os.stat()`-call is needed. Since 
+    the listing does not contain the file's permissions, `is_executable()` 
+    has to do a check on its own.
+    """
+    def __init__(self, name, entry):
+        self.name = name
+        self._entry = entry
+
+    def __repr__(self):
+        return '{0}({1!r})'.format(type(self).__name__, self.name)
+
+    def is_dir(self):
+        """
+        Return `True` if the path refers to a directory (or to a symlink
+        pointing to a directory), otherwise `False`.
+        """
+        try:
+            return self._entry.is_dir()
+        except OSError:
+            return False
+
+    def is_symlink(self):
+        """
+        Return `True` if the path refers to a symlink, otherwise `False`.
+        """
+        try:
+            return self._entry.is_symlink()
+        except OSError:
+            return False
+
+    def is_executable(self):
+        """
+        Return `True` if the path refers to an executable file, otherwise 
+        `False`.
+        """
+        if self.is_dir():
+            return False
+        return os.access(self._entry.path, os.X_OK)
+
+    def get_display_name(self):
+        """
+        Return the completion with a trailing separator for directories.
+        """
+        if self.is_dir() and os.path.basename(self.name):
+            # Joining an empty string keeps the string type of `name`
+            return os.path.join(self.name, self.name[:0])
+        return self.name
+
+class _ListedEntry(object):
+    """
+    A minimal replacement for `os.DirEntry`, which is used when `os.scandir()`
+    is not available. Its methods need `os.stat()`-calls.
+    """
+    def __init__(self, dirname, name):
+        self.name = name
+        self.path = os.path.join(dirname, name)
+
+    def is_dir(self):
+        return os.path.isdir(self.path)
+
+    def is_symlink(self):
+        return os.path.islink(self.path)
+
+def iter_dir_entries(dirname):
+    """
+    Return an iterator over the entries of `dirname` as `os.DirEntry`-like 
+    objects. Raise `OSError` if the directory cannot be read.
+    """
+    if scandir is not None:
+        return scandir(dirname)
+    return (_ListedEntry(dirname, name) for name in os.listdir(dirname))
+
+def select_best(names, limit=None, key=None):
+    """
+    Return the `limit` smallest items of the `names`-list with regard to 
+    `key` and the length of `names` as a tuple. Only if `limit` is `None` 
+    or not smaller than the number of names, all names are sorted.
+    """
+    total = len(names)
+    if limit is None or limit >= total:
+        return (sorted(names, key=key), total)
+    return (heapq.nsmallest(limit, names, key=key), total)
+
+def get_dir_signature(path):
+    """
+    Return a tuple of the inode, the device and the modification time of 
+    the directory `path`. These values will change when the directory's
+    contents have changed. Return `None` if `path` does not refer to an
+    existing directory.
+    """
+    try:
+        path_stat = os.stat(path)
+    except OSError:
+        return None
+    if not stat.S_ISDIR(path_stat.st_mode):
+        return None
+    return (path_stat.st_ino, path_stat.st_dev, path_stat.st_mtime)
+
 def parse_commandline(cmdline):
     """
     Split given cmdline string into a list of arguments matching Unix-like
@@ -167,12 +915,23 @@ def get_command_path(filename):
     check, whether they contain an executable file named `filename`. The 
     first path that matches will be returned. `None` is returned if no 
     match was found.
+
+    Note that results are cached by `command_resolver`. Call its method 
+    `invalidate()` if the cache needs to be cleared explicitly.
+    """
+    return command_resolver.resolve(filename)
+
+def resolve_commands(filenames):
+    """
+    Return a list containing the result of `get_command_path()` for each 
+    item of `filenames` (in the same order). Duplicates are resolved only 
+    once and PATH is checked only once for all of them. This is meant to be
+    used when many commands need to be resolved at once.
     """
-    for path_dir in get_path_dirs():
-        path = os.path.join(path_dir, filename)
-        if is_executable_file(path):
-            return path
-    return None
+    filenames = list(filenames)
+    unique = list(set(filenames))
+    paths = dict(zip(unique, command_resolver.resolve_many(unique)))
+    return [paths[filename] for filename in filenames]
 
 def is_command(name):
     """
@@ -189,7 +948,18 @@ def open_with_starter(path, silent=False):
 
     Note that the starter is defined inside `launchit.settings.config`
     and may be changed, if needed.
+
+    If `get_default_app_command()` returns a command for `path`, then that
+    command is started instead (without waiting for it) and `EXIT_SUCCESS` 
+    is returned. The starter is only used as a fallback in that case.
     """
+    command = get_default_app_command(path)
+    if command is not None:
+        try:
+            process_supervisor.spawn(command, silent=silent)
+            return EXIT_SUCCESS
+        except OSError:
+            pass
     args = [STARTER, path]
     if silent:
         with open(os.devnull, 'wb') as null:
@@ -198,6 +968,21 @@ def open_with_starter(path, silent=False):
         exit_code = subprocess.call(args)
     return exit_code
 
+def get_default_app_command(path):
+    """
+    Return the arguments needed to open `path` with the default application
+    for its MIME-type as a list by use of `launchit.mimeapps`. This avoids 
+    the overhead of invoking the starter. Return `None` if no application 
+    could be determined or if the configuration dictionary's value for 
+    `open-method` is not "builtin". (The default is "starter", meaning 
+    that files are always opened by the starter.)
+    """
+    if settings.config['open-method'] != 'builtin':
+        return None
+    # Imported here, since the module depends on PyXDG
+    from . import mimeapps
+    return mimeapps.get_open_command(path)
+
 def is_executable_file(path):
     """
     Return `True` if given `path` refers to a executable file, otherwise 
@@ -9,12 +9,18 @@ Graphical user-interface made with PySide.
 import sys
 
 # 3rd party
-from PySide import QtCore, QtGui
+from PySide import QtCore, QtGui, QtNetwork
 
 # Launchit package
-from . import core, icongetter, settings
+from . import _cacheutils, core, icongetter, logger, settings, watcher
 from ._stringutils import altstring, convert
 
+# Maximal number of instances kept by `Icon.fromTheme()`
+ICON_CACHE_SIZE = 128
+
+# Maximal number of pixmaps kept by `Icon.cachedPixmap()`
+PIXMAP_CACHE_SIZE = 64
+
 class MarkedCompletionRenderer(QtGui.QTextDocument):
     """
     A rich text / HTML renderer that is specialized to create the markup 
@@ -22,7 +28,7 @@ class MarkedCompletionRenderer(QtGui.QTextDocument):
     may be rendered by a painter.
     """
     def __init__(self, fragment='', startMark='<b><u>', 
-                       endMark='</u></b>', parent=None):
+                       endMark='</u></b>', cacheSize=1024, parent=None):
         """
         Given `startMark` and `endMark` are intended to be used as tags in
         order to surround the current `fragment` inside a given completion. 
@@ -30,11 +36,16 @@ class MarkedCompletionRenderer(QtGui.QTextDocument):
         is done. Note that the fragment does not need to be known on instance 
         creation-time, since it may be set/changed later by just accessing the 
         instance's `fragment`-attribute.
+
+        The laid-out document and its size are cached for the last 
+        `cacheSize` combinations of text, fragment, marks and width.
         """
         QtGui.QTextDocument.__init__(self, parent)
         self.fragment = fragment
         self.startMark = startMark
         self.endMark = endMark
+        self.cache = _cacheutils.LRUCache(cacheSize)
+        self._currentDocument = self
 
     def _getMarkup(self, completion):
         """
@@ -44,26 +55,59 @@ class MarkedCompletionRenderer(QtGui.QTextDocument):
         return core.get_marked_completion(completion, self.fragment,
                                           self.startMark, self.endMark)
 
+    @logger.timed('render.markup')
     def makeCompletionMarkup(self, text, maxWidth=None):
         """
-        Generate markup for given `text` and set the result onto the renderer.
-        If `maxWidth` is set to a pixel value and the rendered result would
-        become larger than that width, the result is truncated by an ellipsis. 
+        Generate markup for given `text` and make the laid-out result the
+        current document (see `currentDocument()`). If `maxWidth` is set to 
+        a pixel value and the rendered result would become larger than that
+        width, the result is truncated by an ellipsis. Return the size of 
+        the result as a `QSize`.
+        """
+        key = (text, self.fragment, self.startMark, self.endMark, maxWidth)
+        cached = self.cache.get(key)
+        if cached is None:
+            self.setHtml(self._getMarkup(text))
+            if maxWidth is not None and self.idealWidth() > maxWidth:
+                self._getElidedMarkup(text, maxWidth)
+            # Keep a copy, so that a cache hit needs neither parsing nor 
+            # layout. The copy is owned by the cache (i.e. has no parent).
+            document = self.clone()
+            cached = (document, document.size().toSize())
+            self.cache.put(key, cached)
+        self._currentDocument = cached[0]
+        return cached[1]
+
+    def currentDocument(self):
+        """
+        Return the document, which holds the result of the last call to 
+        `makeCompletionMarkup()`. This is the renderer itself, if it was
+        not called yet.
         """
-        markup = self._getMarkup(text)
+        return self._currentDocument
+
+    def _getElidedMarkup(self, text, maxWidth):
+        """
+        Return the markup for the longest beginning of `text`, which fits
+        into `maxWidth` when followed by an ellipsis, and leave it set onto
+        the renderer.
+        """
+        # Note that truncation can't be made with QFontMetrics.elidedText()
+        # here, since that doesn't handle rich text. Instead, the cut point
+        # is searched by bisection, which needs only a few layouts. This
+        # assumes that a shorter text never becomes wider when rendered.
+        ellipsis = '...'
+        low, high = 0, len(text) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            self.setHtml(self._getMarkup(text[:middle]) + ellipsis)
+            if self.idealWidth() > maxWidth:
+                high = middle - 1
+            else:
+                low = middle
+        markup = self._getMarkup(text[:low]) + ellipsis
         self.setHtml(markup)
-        if maxWidth is not None:
-            # Note that truncation can't be made with QFontMetrics.elidedText()
-            # here, since that doesn't handle rich text. The trial and error
-            # approach has been chosen in order to avoid messing with the
-            # rendering engine. There probably should be no situation where
-            # memory consumption of this method is really getting noticeable.
-            ellipsis = '...'
-            renderedWidth = self.idealWidth
-            while text and (renderedWidth() > maxWidth):
-                text = text[:-1]
-                markup = self._getMarkup(text) + ellipsis
-                self.setHtml(markup)
+        return markup
 
 class MarkedCompletionDelegate(QtGui.QItemDelegate):
     """
@@ -77,6 +121,8 @@ class MarkedCompletionDelegate(QtGui.QItemDelegate):
         """
         QtGui.QItemDelegate.__init__(self, parent)
         self.renderer = renderer or MarkedCompletionRenderer(parent=self)
+        # Width available for the text, when an item was painted last time
+        self._textWidth = None
 
     def updateFragment(self, fragment):
         """
@@ -91,17 +137,18 @@ class MarkedCompletionDelegate(QtGui.QItemDelegate):
         You should not need to call that method directly, since Qt is
         already doing this on every paint request.
         """
-        self.renderer.makeCompletionMarkup(text, rect.width())
+        self._textWidth = rect.width()
+        self.renderer.makeCompletionMarkup(text, self._textWidth)
         self.drawMarkup(painter, rect.topLeft())
 
     def drawMarkup(self, painter, startPos):
         """
-        Draw the renderer's markup with `painter`. Note that painting
-        is done relative to `startPos`.
+        Draw the renderer's current document with `painter`. Note that 
+        painting is done relative to `startPos`.
         """
         painter.save()
         painter.translate(startPos)
-        self.renderer.drawContents(painter)
+        self.renderer.currentDocument().drawContents(painter)
         painter.restore()
 
     def sizeHint(self, option, index):
@@ -109,9 +156,224 @@ class MarkedCompletionDelegate(QtGui.QItemDelegate):
         Reimplemented method, which returns the size of the rendered
         entry. This is needed by Qt in order to know about how much
         space it should provide for the item, when its painting is
-        requested.
+        requested. The size is the one of the text as it is painted, 
+        i.e. truncated to the width that was available for painting.
+        """
+        text = index.data(QtCore.Qt.DisplayRole) or ''
+        return self.renderer.makeCompletionMarkup(text, self._textWidth)
+
+class _BackgroundWorker(QtCore.QObject):
+    """
+    Helper for `BackgroundCaller`, which lives inside the worker thread.
+    """
+    finished = QtCore.Signal(int, object, object)
+
+    def __init__(self, func, isCurrent):
+        QtCore.QObject.__init__(self)
+        self.func = func
+        self.isCurrent = isCurrent
+
+    def run(self, sequence, argument):
+        """
+        Call the function with `argument` and emit the result, unless a
+        newer request has been made in the meantime.
+        """
+        if not self.isCurrent(sequence):
+            return
+        result = self.func(argument)
+        self.finished.emit(sequence, argument, result)
+
+class BackgroundCaller(QtCore.QObject):
+    """
+    Call a function on a worker thread, while only the result for the most
+    recently requested argument is of interest.
+
+    Each request gets a sequence number. Requests, which are superseded by
+    a newer one before the worker got to them, are skipped. Results, which
+    arrive after a newer request was made, are discarded. The result for
+    the newest request is emitted via the `resultReady`-signal, which is
+    delivered inside the thread that the caller lives in.
+    """
+    resultReady = QtCore.Signal(object, object)
+    _requested = QtCore.Signal(int, object)
+
+    def __init__(self, func, delay=0, parent=None):
         """
-        return self.renderer.size().toSize()
+        Setup the caller and start its worker thread. 
+
+        `func` must be a callable that takes one argument. It is called on 
+        the worker thread. Thus, it should not touch any widgets.
+
+        `delay` is a time in milliseconds to wait after a request, before 
+        the request is passed to the worker. Each new request within that 
+        time restarts the delay, so that a series of fast requests results 
+        in just one call.
+        """
+        QtCore.QObject.__init__(self, parent)
+        self._sequence = 0
+        self._argument = None
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay)
+        self._timer.timeout.connect(self._submit)
+        self._worker = _BackgroundWorker(func, self.isCurrent)
+        self._thread = QtCore.QThread(self)
+        self._worker.moveToThread(self._thread)
+        self._requested.connect(self._worker.run, QtCore.Qt.QueuedConnection)
+        self._worker.finished.connect(self._deliver, 
+                                      QtCore.Qt.QueuedConnection)
+        app = QtCore.QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.stop)
+        self._thread.start()
+
+    @property
+    def delay(self):
+        """
+        Return the delay in milliseconds, which is used for debouncing.
+        """
+        return self._timer.interval()
+
+    @delay.setter
+    def delay(self, delay):
+        """
+        Set the delay in milliseconds, which is used for debouncing.
+        """
+        self._timer.setInterval(delay)
+
+    def request(self, argument):
+        """
+        Request a call with `argument`. This makes any earlier request stale.
+        """
+        self._sequence += 1
+        self._argument = argument
+        self._timer.start()
+
+    def isCurrent(self, sequence):
+        """
+        Return `True` if `sequence` refers to the newest request, otherwise 
+        `False`.
+        """
+        return sequence == self._sequence
+
+    def stop(self):
+        """
+        Stop the worker thread after it has finished its current call.
+        """
+        self._timer.stop()
+        self._sequence += 1
+        self._thread.quit()
+        self._thread.wait()
+
+    def _submit(self):
+        """
+        Pass the newest request to the worker.
+        """
+        self._requested.emit(self._sequence, self._argument)
+
+    def _deliver(self, sequence, argument, result):
+        """
+        Emit the `resultReady`-signal, if `result` is still current.
+        """
+        if self.isCurrent(sequence):
+            self.resultReady.emit(argument, result)
+
+class CompletionModel(QtCore.QAbstractListModel):
+    """
+    A list model, which is backed by a sequence of completions (such as the 
+    list returned by `core.get_best_completions()`). The sequence is neither 
+    copied nor converted. Instead, its items are exposed in chunks: A view 
+    asks for the next chunk via `fetchMore()`, when it was scrolled to its 
+    end. Thus, the number of rows a view has to deal with does not depend 
+    on the number of all completions.
+
+    The sequence may hold less than `total` completions. When all of its 
+    items are exposed, then the `moreRequested`-signal is emitted instead. 
+    Whoever provides the completions should then pass a longer sequence to 
+    `extendCompletions()`.
+    """
+    moreRequested = QtCore.Signal()
+
+    def __init__(self, chunkSize=64, parent=None):
+        QtCore.QAbstractListModel.__init__(self, parent)
+        self.chunkSize = chunkSize
+        self.completions = []
+        self.total = 0
+        self._rowCount = 0
+        self._moreRequested = False
+        self._changing = False
+
+    def setCompletions(self, completions, total=None):
+        """
+        Replace the model's contents with the first chunk of `completions`.
+        `total` is the number of all available completions. If this is 
+        `None`, the length of `completions` is used.
+        """
+        self._changing = True
+        self.beginResetModel()
+        self.completions = completions
+        self.total = len(completions) if total is None else total
+        self._rowCount = min(self.chunkSize, len(completions))
+        self._moreRequested = False
+        self.endResetModel()
+        self._changing = False
+
+    def extendCompletions(self, completions, total=None):
+        """
+        Replace the model's sequence with `completions`, which must start 
+        with the items of the current sequence, and expose the next chunk.
+        """
+        self.completions = completions
+        self.total = len(completions) if total is None else total
+        self._moreRequested = False
+        self.fetchMore()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        """
+        Return the number of currently exposed completions.
+        """
+        return 0 if parent.isValid() else self._rowCount
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        """
+        Return the completion for `index`, when it is requested for display 
+        or editing. Return `None` for all other roles.
+        """
+        if not index.isValid() or role not in (QtCore.Qt.DisplayRole,
+                                                 QtCore.Qt.EditRole):
+            return None
+        return self.completions[index.row()]
+
+    def canFetchMore(self, parent=QtCore.QModelIndex()):
+        """
+        Return `True` if not all completions are exposed, otherwise `False`.
+        """
+        return not parent.isValid() and self._rowCount < self.total
+
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        """
+        Expose the next chunk of completions. If the sequence does not hold
+        any further items, the `moreRequested`-signal is emitted (once until
+        the sequence is extended).
+
+        Calls made while the model is changing are ignored. This is needed 
+        because `QCompleter` re-filters on each change and then fetches 
+        more on its own, which would otherwise expose all completions.
+        """
+        if parent.isValid() or self._changing:
+            return
+        available = len(self.completions) - self._rowCount
+        if available > 0:
+            count = min(self.chunkSize, available)
+            self._changing = True
+            self.beginInsertRows(parent, self._rowCount,
+                                 self._rowCount + count - 1)
+            self._rowCount += count
+            self.endInsertRows()
+            self._changing = False
+        elif self._rowCount < self.total and not self._moreRequested:
+            self._moreRequested = True
+            self.moreRequested.emit()
 
 class CommandlineCompleter(QtGui.QCompleter):
     """
@@ -120,25 +382,53 @@ class CommandlineCompleter(QtGui.QCompleter):
     """
     fragmentUpdated = QtCore.Signal([str], [altstring])
 
-    def __init__(self, completiongetter, markFragment=True, parent=None):
+    def __init__(self, completiongetter, markFragment=True, delay=None,
+                       chunked=False, parent=None):
         """
         Setup the completer. 
 
         `completiongetter` should be a callable that takes a string as an 
         argument for a given fragment. Its return value should be a list 
-        of possible completions based on that fragment.
+        of possible completions based on that fragment. Note that it is 
+        called on a worker thread, so that slow lookups will not block 
+        the user interface.
+
+        The completions are shown by use of a `CompletionModel`. Thus, the 
+        popup only deals with one chunk of them at a time. If `chunked` is 
+        `True`, then even the lookup is done in chunks: Only the first chunk 
+        is requested and more completions are requested, when the popup was 
+        scrolled to its end. In that case, `completiongetter` must take the 
+        maximal number of completions as its second argument and return a 
+        tuple in the form `(completions, total)`, where `total` is the number
+        of all available completions (just like the function 
+        `core.get_best_completions()` does).
 
         `markFragment` is used to determine, whether the current fragment 
         should appear as marked inside each completion item. When this is 
         `True`, the item delegate of the completer's popup is replaced with 
         `MarkedCompletionDelegate`.
+
+        `delay` is the time in milliseconds to wait for further keystrokes, 
+        before completions are looked up. If this is `None`, the value for 
+        `completion-delay` inside the configuration dictionary is used.
         """
         QtGui.QCompleter.__init__(self, parent)
         mode = self.UnfilteredPopupCompletion
         self.setCompletionMode(mode)
-        model = QtGui.QStringListModel(parent=self)
+        model = CompletionModel(parent=self)
+        model.moreRequested.connect(self._requestMore)
         self.setModel(model)
+        # Rows have the same height, so they don't need to be measured
+        self.popup().setUniformItemSizes(True)
         self.completiongetter = completiongetter
+        self.chunked = chunked
+        self._requestedFragment = None
+        self._fragment = None
+        self._limit = None
+        if delay is None:
+            delay = int(settings.config['completion-delay'])
+        self.caller = BackgroundCaller(self._getCompletions, delay, self)
+        self.caller.resultReady.connect(self._applyCompletions)
         if markFragment:
             self.delegate = MarkedCompletionDelegate()
 
@@ -164,18 +454,91 @@ class CommandlineCompleter(QtGui.QCompleter):
 
     def update(self, fragment):
         """
-        Update the list of possible completions based on `fragment` and 
-        emit a `fragmentUpdated`-signal, using the new fragment as the 
-        signal's argument.
+        Request an update of the list of possible completions based on 
+        `fragment`. When the completions are available, they are set on 
+        the completer's model and a `fragmentUpdated`-signal is emitted, 
+        using the new fragment as the signal's argument. This is skipped,
+        if another update was requested in the meantime.
+        """
+        self._limit = self.model().chunkSize if self.chunked else None
+        self._requestedFragment = fragment
+        self.caller.request((fragment, self._limit, False))
+
+    def _requestMore(self):
         """
-        completions = self.completiongetter(fragment)
-        self.model().setStringList(completions)
+        Request another chunk of completions for the current fragment, which 
+        will be appended to the model. This is skipped, if an update for
+        another fragment is pending.
+        """
+        if self.chunked and self._fragment == self._requestedFragment:
+            self._limit += self.model().chunkSize
+            self.caller.request((self._fragment, self._limit, True))
+
+    def _getCompletions(self, request):
+        """
+        Return the completions and their total number for the requested 
+        fragment and limit. This is called on the worker thread.
+        """
+        fragment, limit, isFetch = request
+        if limit is None:
+            completions = self.completiongetter(fragment)
+            return (completions, len(completions))
+        return self.completiongetter(fragment, limit)
+
+    def _applyCompletions(self, request, result):
+        """
+        Set the completions on the model and show them inside the popup.
+        When more completions for the current fragment have been fetched,
+        the new completions are appended instead.
+        """
+        fragment, limit, isFetch = request
+        completions, total = result
+        if isFetch:
+            self.model().extendCompletions(completions, total)
+            return
+        self._fragment = fragment
+        self.model().setCompletions(completions, total)
         self.fragmentUpdated.emit(fragment)
+        widget = self.widget()
+        if fragment and widget is not None and widget.hasFocus():
+            self.complete()
+        else:
+            self.popup().hide()
+
+class AsyncLauncher(QtCore.QObject):
+    """
+    Launch command-lines via `core.launch_async()`, so that the user 
+    interface is never blocked. The outcome is reported by signals: 
+    `finished` is emitted with the arguments and the exit code of a process 
+    that has terminated, while `failed` is emitted with a `core.LaunchError`
+    if a command-line could not be launched at all. 
+    """
+    finished = QtCore.Signal(object, int)
+    failed = QtCore.Signal(object)
+
+    def __init__(self, supervisor=None, parent=None):
+        """
+        Setup the launcher. `supervisor` is passed to `core.launch_async()`.
+        """
+        QtCore.QObject.__init__(self, parent)
+        self.supervisor = supervisor
+
+    def launch(self, cmdline):
+        """
+        Launch `cmdline` and return immediately. Raise `ValueError` if it 
+        does not contain any arguments.
+        """
+        # Signals emitted by the background threads are delivered inside 
+        # the thread of the receiving objects
+        core.launch_async(cmdline, self.finished.emit, self.failed.emit,
+                          supervisor=self.supervisor)
 
 class LaunchEdit(QtGui.QLineEdit):
     """
     An editable text field, into which the user may type a command.
     """
+    launched = QtCore.Signal(str)
+
     def __init__(self, launcher, description=None, parent=None):
         """
         Setup the text field. Possible completions will appear as soon as 
@@ -184,7 +547,8 @@ class LaunchEdit(QtGui.QLineEdit):
 
         Note that `launcher` is expected to be a callable that takes the 
         command to launch as a string. The way how the given command will 
-        be invoked is up to that callable.
+        be invoked is up to that callable. If it returned without raising 
+        an exception, then the `launched`-signal is emitted.
 
         `description` may be used to set some descriptive text onto the 
         widget. That text is used as the tooltip for the edit field and 
@@ -196,8 +560,9 @@ class LaunchEdit(QtGui.QLineEdit):
         if description:
             self.setPlaceholderText(description)
             self.setToolTip(description)
-        completer = CommandlineCompleter(
-            core.get_name_completions, parent=self)
+        session = core.CompletionSession()
+        completer = CommandlineCompleter(session.get_best_completions, 
+                                         chunked=True, parent=self)
         self.textEdited.connect(completer.update)
         self.setCompleter(completer)
         self.launcher = launcher
@@ -207,12 +572,22 @@ class LaunchEdit(QtGui.QLineEdit):
         """
         Launch the contents of the text field.
         """
-        self.launcher(self.text())
+        text = self.text()
+        self.launcher(text)
+        self.launched.emit(text)
 
 class Icon(QtGui.QIcon):
     """
     A class specialized to use theme icons based on given commands.
+
+    Instances made by `fromTheme()` are cached per theme and name, so that
+    the theme is only searched once for each name. Pixmaps, which were 
+    rendered by `cachedPixmap()`, are cached, too. Both caches are bounded
+    (see `ICON_CACHE_SIZE` and `PIXMAP_CACHE_SIZE`).
     """
+    _iconCache = _cacheutils.LRUCache(ICON_CACHE_SIZE)
+    _pixmapCache = _cacheutils.LRUCache(PIXMAP_CACHE_SIZE)
+
     def __init__(self, icon):
         """
         Setup an instance for the given `icon`, which may either be a
@@ -226,8 +601,8 @@ class Icon(QtGui.QIcon):
     @classmethod
     def fromCommand(cls, command):
         """
-        Return a new instance of this class holding an appropriated 
-        icon for the given `command`.
+        Return an instance of this class holding an appropriated icon 
+        for the given `command`.
         """
         iconName = icongetter.guess_icon_name(command, theme=cls.themeName())
         return cls.fromTheme(iconName)
@@ -236,8 +611,23 @@ class Icon(QtGui.QIcon):
     def fromTheme(cls, name, fallback=QtGui.QIcon()):
         """
         Look for icon with given `name` inside the current icon theme
-        and return it in a new instance of this class. If no suitable
+        and return it in an instance of this class. If no suitable
         icon was found, then the instance is based on `fallback`.
+
+        Note that the same instance is returned for repeated calls with
+        the same theme, `name` and `fallback`. It should not be changed.
+        """
+        key = (cls, cls.themeName(), name, fallback.cacheKey())
+        icon = cls._iconCache.get(key)
+        if icon is None:
+            icon = cls._makeFromTheme(name, fallback)
+            cls._iconCache.put(key, icon)
+        return icon
+
+    @classmethod
+    def _makeFromTheme(cls, name, fallback):
+        """
+        Do the work for `fromTheme()` without using the cache.
         """
         icon = cls(QtGui.QIcon.fromTheme(name) or \
                    cls._getIconPath(name) or fallback)
@@ -266,6 +656,21 @@ class Icon(QtGui.QIcon):
         """
         return QtGui.QIcon.hasThemeIcon(name) or bool(cls._getIconPath(name))
 
+    def cachedPixmap(self, size, devicePixelRatio=1):
+        """
+        Return a pixmap of the icon for the given `size` (a `QSize`) like
+        `pixmap()` does. The result is cached by the icon's `cacheKey()`, 
+        the size and `devicePixelRatio` (which should be the one of the 
+        widget showing the pixmap), so that the icon's image needs to be
+        scaled only once for them.
+        """
+        key = (self.cacheKey(), size.width(), size.height(), devicePixelRatio)
+        pixmap = self._pixmapCache.get(key)
+        if pixmap is None:
+            pixmap = self.pixmap(size)
+            self._pixmapCache.put(key, pixmap)
+        return pixmap
+
     def name(self):
         """
         Return the name used to create the icon. Note that this is usually
@@ -278,7 +683,8 @@ class CommandIconLabel(QtGui.QLabel):
     """
     A label, which holds an icon to represent a command.
     """
-    def __init__(self, iconName=None, iconTheme=None, parent=None):
+    def __init__(self, iconName=None, iconTheme=None, delay=None, 
+                       parent=None):
         """
         Setup the icon label.
 
@@ -290,11 +696,21 @@ class CommandIconLabel(QtGui.QLabel):
         to change that icon theme, a new theme name may be passed as 
         `iconTheme`. This might be helpful, since Qt is making wrong 
         assumptions about that theme on some desktop environments.
+
+        Icon names for commands are guessed on a worker thread. `delay` is
+        the time in milliseconds to wait for further updates, before that
+        is done. If this is `None`, the value for `icon-delay` inside the 
+        configuration dictionary is used.
         """
         QtGui.QLabel.__init__(self, parent)
         if iconTheme:
             Icon.setThemeName(iconTheme)
-        self.icon = Icon.fromTheme(iconName or icongetter.ICON_RUN)
+        self._iconName = iconName or icongetter.ICON_RUN
+        self.icon = Icon.fromTheme(self._iconName)
+        if delay is None:
+            delay = int(settings.config['icon-delay'])
+        self.caller = BackgroundCaller(self._guessIconName, delay, self)
+        self.caller.resultReady.connect(self._applyIconName)
 
     @property
     def icon(self):
@@ -309,7 +725,12 @@ class CommandIconLabel(QtGui.QLabel):
         Replace the old icon inside the label with new `icon`,
         which should a `QIcon`- or `Icon`-like instance.
         """
-        pixmap = icon.pixmap(self.size())
+        if isinstance(icon, Icon):
+            # Qt 4 does not know about device pixel ratios
+            ratio = getattr(self, 'devicePixelRatio', lambda: 1)()
+            pixmap = icon.cachedPixmap(self.size(), ratio)
+        else:
+            pixmap = icon.pixmap(self.size())
         self.setPixmap(pixmap)
         self._icon = icon
 
@@ -318,8 +739,28 @@ class CommandIconLabel(QtGui.QLabel):
         Update the icon inside the label based on given `command`. 
         If the command consists of multiple arguments, only its 
         first argument is used for determination.
+
+        This returns immediately. A series of fast updates is coalesced 
+        and the icon is only replaced for the most recent `command`.
+        """
+        self.caller.request((command, Icon.themeName()))
+
+    def _guessIconName(self, request):
+        """
+        Return the icon name for the requested command and theme. This is
+        called on the worker thread.
+        """
+        command, theme = request
+        return icongetter.guess_icon_name(command, theme=theme)
+
+    @logger.timed('render.icon')
+    def _applyIconName(self, request, iconName):
+        """
+        Show the icon named `iconName`, unless it is shown already.
         """
-        self.icon = Icon.fromCommand(command)
+        if iconName != self._iconName:
+            self.icon = Icon.fromTheme(iconName)
+            self._iconName = iconName
 
 class LaunchWidget(QtGui.QWidget):
     """
@@ -336,16 +777,27 @@ class LaunchWidget(QtGui.QWidget):
         To explicitly set a custom theme name as the current icon theme, 
         `iconName` may be used. If this is `None`, then the configuration 
         dictionary's value for `icon-theme` is used instead (if any).
+
+        Commands are launched by an `AsyncLauncher`, which is available as 
+        the widget's `launcher`-attribute. Failures are logged.
         """
         QtGui.QWidget.__init__(self, parent)
         theme = iconTheme or settings.config['icon-theme']
         self.iconLabel = CommandIconLabel(iconTheme=theme, parent=self)
-        self.edit = LaunchEdit(core.launch, 
+        self.launcher = AsyncLauncher(parent=self)
+        self.launcher.failed.connect(self._reportError)
+        self.edit = LaunchEdit(self.launcher.launch, 
                                description='Type in a command to launch',
                                parent=self)
         self.edit.textChanged.connect(self.iconLabel.update)
         self._makeLayout([self.iconLabel, self.edit])
 
+    def _reportError(self, error):
+        """
+        Log an error, which occurred when launching a command.
+        """
+        logger.warning(str(error))
+
     def _makeLayout(self, widgets):
         """
         Create a horizontal layout and fill it with `widgets` with respect 
@@ -357,6 +809,132 @@ class LaunchWidget(QtGui.QWidget):
             layout.addWidget(widget)
         self.setLayout(layout)
 
+class LaunchServer(QtCore.QObject):
+    """
+    Listen on a Unix domain socket for commands sent by other launchit 
+    processes and apply them to a `LaunchWidget`. This is used to keep a 
+    launcher running in the background, which just needs to be shown.
+
+    Each command is a single line. The server understands "show" (show the
+    launcher), "timings" (log the recorded timings, see `logger.span()`), 
+    "ping" (do nothing, used to check for a running server) and "quit" 
+    (terminate the application) and answers with "ok" or with "error" for 
+    unknown commands. 
+    """
+    def __init__(self, launcher, path=None, parent=None):
+        """
+        Setup the server for `launcher`. `path` is the socket's path. If 
+        this is `None`, then `settings.get_socket_path()` is used (which 
+        may raise `OSError`).
+        """
+        QtCore.QObject.__init__(self, parent)
+        self.launcher = launcher
+        self.path = path or settings.get_socket_path()
+        self.server = QtNetwork.QLocalServer(self)
+        self.server.newConnection.connect(self._acceptConnections)
+        launcher.edit.launched.connect(self.hideLauncher)
+        QtGui.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key_Escape), 
+                        launcher, self.hideLauncher)
+
+    def isRunning(self, timeout=1000):
+        """
+        Return `True` if another server accepts connections on the socket
+        within `timeout` milliseconds, otherwise `False`.
+        """
+        socket = QtNetwork.QLocalSocket()
+        socket.connectToServer(self.path)
+        running = socket.waitForConnected(timeout)
+        socket.abort()
+        return running
+
+    def listen(self):
+        """
+        Start listening. A socket file, which was left behind by a server
+        that did not shut down properly, is removed before. Return `True` 
+        on success, otherwise `False`. Note that listening fails, if another
+        server is still running on the socket (see `isRunning()`).
+        """
+        if self.isRunning():
+            return False
+        QtNetwork.QLocalServer.removeServer(self.path)
+        return self.server.listen(self.path)
+
+    def close(self):
+        """
+        Stop listening and remove the socket file.
+        """
+        self.server.close()
+
+    def showLauncher(self):
+        """
+        Show the launcher with an empty text field and give it the focus.
+        """
+        self.launcher.edit.clear()
+        self.launcher.show()
+        self.launcher.raise_()
+        self.launcher.activateWindow()
+        self.launcher.edit.setFocus()
+
+    def hideLauncher(self):
+        """
+        Hide the launcher (including the completion popup).
+        """
+        self.launcher.edit.completer().popup().hide()
+        self.launcher.hide()
+
+    def _acceptConnections(self):
+        """
+        Read commands from each pending connection.
+        """
+        while self.server.hasPendingConnections():
+            connection = self.server.nextPendingConnection()
+            connection.readyRead.connect(
+                lambda connection=connection: self._readCommand(connection))
+            connection.disconnected.connect(connection.deleteLater)
+            self._readCommand(connection)
+
+    def _readCommand(self, connection):
+        """
+        Execute the command sent via `connection`, once it is complete.
+        """
+        if not connection.canReadLine():
+            return
+        command = bytes(connection.readLine()).strip()
+        actions = {b'show': self.showLauncher, 
+                   b'timings': logger.dump_timings,
+                   b'ping': lambda: None,
+                   b'quit': QtGui.QApplication.instance().quit}
+        action = actions.get(command)
+        connection.write(b'ok\n' if action else b'error\n')
+        connection.flush()
+        connection.disconnectFromServer()
+        if action:
+            action()
+
+def watchTimings(app, interval=500):
+    """
+    Log the timings recorded by `logger` whenever the process receives
+    `SIGUSR1` and when `app` is about to quit. Note that Python's signal
+    handlers are only run, when the interpreter gets control. Therefore, 
+    a timer is started, which wakes it up every `interval` milliseconds.
+    """
+    app.aboutToQuit.connect(logger.dump_timings)
+    if logger.install_dump_handler():
+        timer = QtCore.QTimer(app)
+        timer.timeout.connect(lambda: None)
+        timer.start(interval)
+
+def createLauncher(title='Launchit', windowIconName='system-run'):
+    """
+    Return a new `LaunchWidget` with `title` and the icon for 
+    `windowIconName` set onto its window. See `runApp()` for details.
+    """
+    launcher = LaunchWidget()
+    launcher.setWindowTitle(title)
+    icon = Icon.fromTheme(windowIconName)
+    launcher.setWindowIcon(icon)
+    return launcher
+
 def runApp(args=[], title='Launchit', windowIconName='system-run'):
     """
     Run the application based on `args`. 
@@ -367,23 +945,79 @@ def runApp(args=[], title='Launchit', windowIconName='system-run'):
     window icon. Note that the latter is done after widget creation. Thus,
     some setup regarding the icon theme may be done before, if needed.
 
+    Unless the configuration dictionary's value for `watch-method` is set
+    to "none", launchit's caches are kept up to date by a file watcher.
+
+    If timing is enabled inside `logger`, the recorded timings are logged 
+    on `SIGUSR1` and on exit (see `watchTimings()`).
+
     At the end of execution the applications's exit code will be returned.
     """
     app = QtGui.QApplication(args)
-    launcher = LaunchWidget()
-    launcher.setWindowTitle(title)
-    icon = Icon.fromTheme(windowIconName)
-    launcher.setWindowIcon(icon)
+    if logger.TIMINGS is not None:
+        watchTimings(app)
+    if settings.config['watch-method'] != 'none':
+        watcher.watch_caches()
+    launcher = createLauncher(title, windowIconName)
     launcher.show()
     return app.exec_()
 
+def runDaemon(args=[], title='Launchit', windowIconName='system-run'):
+    """
+    Run the application as a daemon based on `args`.
+
+    Unlike `runApp()` the `LaunchWidget` is created hidden. The caches are 
+    filled in advance and a `LaunchServer` waits for requests to show the 
+    launcher. The launcher is hidden again after a command was launched or
+    when the escape key was pressed. Closing it does not quit the daemon.
+    If another daemon is already running, then nothing is done.
+
+    Recorded timings are logged like it is done by `runApp()`.
+
+    At the end of execution the applications's exit code will be returned.
+    """
+    app = QtGui.QApplication(args)
+    app.setQuitOnLastWindowClosed(False)
+    if logger.TIMINGS is not None:
+        watchTimings(app)
+    launcher = createLauncher(title, windowIconName)
+    try:
+        server = LaunchServer(launcher)
+    except OSError as error:
+        logger.warning('Unable to use the socket: {0}'.format(error))
+        return 1
+    if server.isRunning():
+        logger.warning('A daemon is already running on {0!r}'.format(
+            server.path))
+        return 1
+    if not server.listen():
+        logger.warning('Unable to listen on {0!r}: {1}'.format(
+            server.path, server.server.errorString()))
+        return 1
+    app.aboutToQuit.connect(server.close)
+    if settings.config['watch-method'] != 'none':
+        watcher.watch_caches()
+    # Fill the caches, so that the first request is answered quickly
+    core.get_best_completions('', 1)
+    icongetter.init_icon_cache()
+    icongetter.get_icon_path(icongetter.ICON_RUN, theme=Icon.themeName())
+    return app.exec_()
+
 def main():
     """
     This function is intended to be used as an entry point, when Launchit 
     was invoked from the commandline. It will run the GUI with respect to 
     the commandline's arguments. When the GUI was exited, it will also exit
     the interpreter using the application's return value as the exit code. 
+
+    If `--daemon` is given, the GUI is started as a daemon by `runDaemon()`.
+    If `--timing` is given, the time spent inside the hot code paths is 
+    recorded (see `logger.span()`).
     """
+    if '--timing' in sys.argv[1:]:
+        logger.enable_timing()
+    if '--daemon' in sys.argv[1:]:
+        sys.exit(runDaemon(sys.argv))
     sys.exit(runApp(sys.argv))
 
 if __name__ == '__main__':
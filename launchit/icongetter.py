@@ -3,22 +3,37 @@ Detect suitable command icons.
 """
 # Stdlib
 import glob
+import io
 import os
 import warnings
 
 # 3rd party
-import xdg.IconTheme
-import xdg.Menu
-import xdg.Mime
+# Note that `xdg.Menu` and `xdg.Mime` are imported when needed, since they
+# take a while to import and are only used by the "menu"-backend and as a
+# fallback for MIME-type detection.
+from xdg.BaseDirectory import xdg_data_dirs
 
 # Launchit package
-from . import settings
-from ._stringutils import convert, keep_string_type
-from .core import get_command_path, get_trimmed, parse_commandline
+from . import (_cacheutils, icontheme, logger, mimecache, settings, 
+               stringtable)
+from ._stringutils import basestring, convert, keep_string_type
+from .core import (get_command_path, get_path_dirs, get_trimmed,
+                   parse_commandline, resolve_commands)
 
 ICON_RUN = 'system-run'
 
+# Name of the file inside the user's cache directory, which holds the icons
+ICON_CACHE_FILENAME = 'command-icons.json'
+
+# Names of the table files used instead, if `cache-method` is "mmap". They
+# map commands to icons and desktop files to commands.
+ICON_TABLE_FILENAMES = ('command-icons.table', 'desktop-commands.table')
+
+# Maximal number of results kept by `guess_icon_name()`
+ICON_NAME_CACHE_SIZE = 512
+
 @keep_string_type
+@logger.timed('icon.lookup')
 def get_icon_path(icon_name, size=48, theme=None):
     """
     Return a path, which refers to an icon file with the given name 
@@ -27,17 +42,18 @@ def get_icon_path(icon_name, size=48, theme=None):
 
     Note that `theme` may be set to `None`. It is then retrieved via 
     launchit's internal config dict (`settings.config['theme-name']`).
+
+    The lookup is done by the theme's index (see `launchit.icontheme`),
+    so that no filesystem access is needed once the index is loaded.
     """
     if os.path.isabs(icon_name):
-        # Work around strange PyXDG behavior, 
-        # which would return an absolute path
-        # unchanged (for whatever reason)
         return None
     if theme is None:
         theme = settings.config['icon-theme']
-    return xdg.IconTheme.getIconPath(icon_name, size, theme)
+    return icontheme.lookup_icon(convert(icon_name, str), size, theme)
 
 @keep_string_type
+@logger.timed('icon.guess')
 def guess_icon_name(command, split_args=True, theme=None, fallback=ICON_RUN):
     """
     Return a suitable icon name for the given `command`. 
@@ -56,23 +72,107 @@ def guess_icon_name(command, split_args=True, theme=None, fallback=ICON_RUN):
     theme does not contain the name, the next "namegetter" is used
     (keeping the order as described above). Only the `fallback` icon 
     itself (as the last resort) is returned without any checks.
+
+    Results are cached inside `icon_name_cache` by the resolved path of
+    the command, the theme, the modification time of the command's file 
+    and the generation of the theme's index (see `launchit.icontheme`). 
+    Note that the cache is cleared by `init_icon_cache()`.
     """
+    command = get_command_name(command, split_args)
     if not command:
         return fallback
+    cmd_path = get_command_path(command) or command
+    if theme is None:
+        theme = settings.config['icon-theme']
+    key = (cmd_path, theme, _cacheutils.get_mtimes([cmd_path])[cmd_path],
+           icontheme.get_theme_generation(theme))
+    name = icon_name_cache.get(key, MISSING)
+    if name is MISSING:
+        name = find_icon_name(cmd_path, theme)
+        icon_name_cache.put(key, name)
+    return fallback if name is None else name
+
+@logger.timed('icon.guess-many')
+def guess_icon_names(commands, split_args=True, theme=None, 
+                     fallback=ICON_RUN, processes=None):
+    """
+    Return a list containing the icon name for each item of `commands` (in 
+    the same order), as `guess_icon_name()` would do. The arguments have
+    the same meaning as for that function.
+
+    This is meant to be used when icons are needed for many commands at 
+    once. Each distinct command is handled only once and all commands are
+    resolved against the same state of PATH. Commands, whose icon names 
+    are not cached yet, are examined concurrently by a pool of `processes`
+    threads. If `processes` is `None`, the number of CPUs is used.
+    """
+    commands = list(commands)
+    if theme is None:
+        theme = settings.config['icon-theme']
+    names = [get_command_name(command, split_args) for command in commands]
+    unique = list(set(filter(None, names)))
+    cmd_paths = dict((name, path or name) for name, path 
+                     in zip(unique, resolve_commands(unique)))
+    mtimes = _cacheutils.get_mtimes(set(cmd_paths.values()))
+    generation = icontheme.get_theme_generation(theme)
+    icon_names = {}
+    for cmd_path, mtime in mtimes.items():
+        icon_names[cmd_path] = icon_name_cache.get(
+            (cmd_path, theme, mtime, generation), MISSING)
+    missing = [cmd_path for cmd_path, name in icon_names.items() 
+               if name is MISSING]
+    if missing:
+        # Load the shared caches before, so that the threads don't race
+        if not icon_cache_initialized:
+            init_icon_cache()
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(processes)
+        try:
+            results = pool.map(
+                lambda cmd_path: find_icon_name(cmd_path, theme), missing)
+        finally:
+            pool.close()
+            pool.join()
+        for cmd_path, name in zip(missing, results):
+            icon_name_cache.put(
+                (cmd_path, theme, mtimes[cmd_path], generation), name)
+            icon_names[cmd_path] = name
+    results = []
+    for command, name in zip(commands, names):
+        icon_name = icon_names[cmd_paths[name]] if name else None
+        if icon_name is None:
+            icon_name = fallback
+        if isinstance(icon_name, basestring):
+            # Keep the string type like `guess_icon_name()` does
+            icon_name = convert(icon_name, type(command))
+        results.append(icon_name)
+    return results
+
+def get_command_name(command, split_args=True):
+    """
+    Return the part of `command`, which is used to guess its icon, as
+    described in `guess_icon_name()`. Return `None` if `command` is empty.
+    """
+    if not command:
+        return None
     if split_args:
         args = parse_commandline(command)
-        if not args:
-            return fallback
-        else:
-            command = args[0]
-    cmd_path = get_command_path(command) or command
+        return args[0] if args else None
+    return command
+
+def find_icon_name(cmd_path, theme):
+    """
+    Return the first icon name for `cmd_path`, which is available in the 
+    given `theme`, as described in `guess_icon_name()`. Return `None` if 
+    no such name was found.
+    """
     for namegetter in (guess_starter_icon, 
                        get_mimetype_name, 
                        get_gnome_mimetype_name):
         name = namegetter(cmd_path)
         if name and get_icon_path(name, theme=theme):
             return name
-    return fallback
+    return None
 
 @keep_string_type
 def guess_starter_icon(command, use_cache=True):
@@ -87,8 +187,8 @@ def guess_starter_icon(command, use_cache=True):
     entries. To speed this up, the icon names are cached, unless 
     `use_cache` is False. In fact, using the cache means that the 
     function will look for contents inside that cache when invoked. 
-    If it sees an empty cache (e.g. right after the module has been 
-    initialized) the cache will be filled using the results of 
+    If the cache was not initialized yet (e.g. right after the module has
+    been imported) the cache will be filled using the results of 
     `iter_command_icons()`. These cached results are used for any 
     later call. The cache may be rebuilt via `init_icon_cache()`, 
     if needed.
@@ -96,7 +196,7 @@ def guess_starter_icon(command, use_cache=True):
     if not isinstance(command, basestring):
         raise TypeError('command must be a string')
     if use_cache:
-        if not icon_cache:
+        if not icon_cache_initialized:
             init_icon_cache()
         icons = icon_cache
     else:
@@ -121,8 +221,13 @@ def get_mimetype_name(filename):
     if not os.path.exists(filename):
         # PyXDG would return text/plain
         return None
-    mimetype = xdg.Mime.get_type(filename)
-    return '{}-{}'.format(mimetype.media, mimetype.subtype)
+    mimetype = mimecache.get_type(filename)
+    if mimetype is None:
+        # No `mime.cache` available, so let PyXDG parse the database
+        import xdg.Mime
+        mimetype = xdg.Mime.get_type(filename)
+        return '{}-{}'.format(mimetype.media, mimetype.subtype)
+    return mimetype.replace('/', '-')
 
 @keep_string_type
 def get_gnome_mimetype_name(filename):
@@ -139,19 +244,162 @@ def get_gnome_mimetype_name(filename):
     name = get_mimetype_name(filename)
     if not name:
         return None
-    return 'gnome-mime-' + name
+    return 'gnome-mime-' + convert(name, str)
 
 # Low-level stuff
 
 icon_cache = {}
 
-def init_icon_cache():
+# Whether `icon_cache` was filled by `init_icon_cache()`. An empty cache is
+# valid (e.g. if there are no menu entries), so this is tracked separately.
+icon_cache_initialized = False
+
+# Holds the results of `guess_icon_name()`
+icon_name_cache = _cacheutils.LRUCache(ICON_NAME_CACHE_SIZE)
+
+# Marks a missing entry inside `icon_name_cache`
+MISSING = object()
+
+# Maps the path of a desktop file to the command it has put into `icon_cache`
+desktop_file_commands = {}
+
+def init_icon_cache(use_disk_cache=True):
     """
     (Re-)Initialize the cache used to guess the icon for a given command.
+
+    If `use_disk_cache` is `True`, then the icons are loaded from a cache 
+    file inside the user's cache directory, unless one of the menu files 
+    or one of the directories containing desktop files has changed since 
+    that file was written. Otherwise the menus are parsed and the result
+    is written to the cache file.
+
+    If the configuration dictionary's value for `cache-method` is "mmap",
+    then the icons are read from table files, which are shared by all 
+    processes (see `load_icon_tables()`). Both `icon_cache` and 
+    `desktop_file_commands` become `stringtable.TableMapping`s then.
     """
-    icons = iter_command_icons()
+    global icon_cache, desktop_file_commands, icon_cache_initialized
+    key = get_icon_cache_key()
+    if settings.config['cache-method'] == 'mmap':
+        tables = load_icon_tables(key, use_disk_cache)
+        if tables is not None:
+            icon_cache = stringtable.TableMapping(tables[0])
+            desktop_file_commands = stringtable.TableMapping(tables[1])
+            icon_name_cache.clear()
+            icon_cache_initialized = True
+            return
+    entries = None
+    if use_disk_cache:
+        entries = _cacheutils.load_cache(ICON_CACHE_FILENAME, key)
+    if entries is None:
+        mtimes = _cacheutils.get_mtimes(iter_icon_cache_sources())
+        entries = list(iter_desktop_file_icons())
+        _cacheutils.save_cache(ICON_CACHE_FILENAME, entries, mtimes, key)
     icon_cache.clear()
-    icon_cache.update(icons)
+    desktop_file_commands.clear()
+    icon_name_cache.clear()
+    for path, cmd, icon in entries:
+        icon_cache[cmd] = icon
+        desktop_file_commands[path] = cmd
+    icon_cache_initialized = True
+
+def load_icon_tables(key, use_disk_cache=True):
+    """
+    Return a tuple of two `stringtable.StringTable`s, which map commands to
+    their icons and desktop files to their commands. The tables are loaded
+    from the user's cache directory like it is described for the cache file
+    in `init_icon_cache()`. If they are rebuilt, they are written before
+    being loaded. Return `None` if writing failed.
+    """
+    if use_disk_cache:
+        tables = [_cacheutils.load_table(filename, key) 
+                  for filename in ICON_TABLE_FILENAMES]
+        if None not in tables:
+            return tuple(tables)
+        for table in tables:
+            if table is not None:
+                table.close()
+    mtimes = _cacheutils.get_mtimes(iter_icon_cache_sources())
+    entries = list(iter_desktop_file_icons())
+    encode = stringtable.encode
+    contents = ([(encode(cmd), encode(icon)) for path, cmd, icon in entries],
+                [(encode(path), encode(cmd)) for path, cmd, icon in entries])
+    for filename, items in zip(ICON_TABLE_FILENAMES, contents):
+        if not _cacheutils.save_table(filename, items, mtimes, key):
+            return None
+    tables = [_cacheutils.load_table(filename, key) 
+              for filename in ICON_TABLE_FILENAMES]
+    if None in tables:
+        return None
+    return tuple(tables)
+
+def get_icon_cache_key():
+    """
+    Return a list of the settings, which the icon cache depends on, except
+    for its source files. This includes the PATH directories, since they 
+    decide which commands are trimmed to their names (see `get_trimmed()`).
+    """
+    key = [settings.config['icon-backend'], settings.config['menu-dir']]
+    return key + get_application_dirs() + get_path_dirs()
+
+def iter_icon_cache_sources():
+    """
+    Yield the paths of the files and directories, which are used to fill 
+    the icon cache. These are the menu directory, its `.menu`-files and 
+    the application directories (see `get_application_dirs()`) including
+    their subdirectories. Note that the directories are yielded even if 
+    they do not exist, since they might be created later.
+    """
+    menu_dir = settings.config['menu-dir']
+    for path in glob.glob(os.path.join(menu_dir, '*.menu')):
+        yield path
+    for top_dir in [menu_dir] + get_application_dirs():
+        yield top_dir
+        for dirpath, dirnames, filenames in os.walk(top_dir):
+            yield dirpath
+
+def get_application_dirs():
+    """
+    Return a list of the XDG directories, which may contain desktop files.
+    """
+    return [os.path.join(data_dir, 'applications')
+            for data_dir in xdg_data_dirs]
+
+def invalidate_icon_cache():
+    """
+    Empty the icon cache. It will be re-initialized on its next use.
+    """
+    global icon_cache_initialized
+    icon_cache_initialized = False
+    icon_cache.clear()
+    desktop_file_commands.clear()
+    icon_name_cache.clear()
+
+def add_desktop_file(path):
+    """
+    Read the desktop file at `path` and put its command and its icon into 
+    the icon cache. Invalid desktop files and desktop files without a 
+    command or an icon are ignored. Nothing is done, if the icon cache was 
+    not initialized, since it will be filled completely on its next use.
+    """
+    if not icon_cache_initialized:
+        return
+    result = read_command_icon(path)
+    if result is not None:
+        cmd, icon = result
+        icon_cache[cmd] = icon
+        desktop_file_commands[path] = cmd
+        icon_name_cache.clear()
+
+def remove_desktop_file(path):
+    """
+    Remove the command, which was read from the desktop file at `path`,
+    from the icon cache. Unknown paths are ignored.
+    """
+    cmd = desktop_file_commands.pop(path, None)
+    if cmd is not None:
+        icon_cache.pop(cmd, None)
+        icon_name_cache.clear()
 
 def iter_command_icons():
     """
@@ -163,12 +411,50 @@ def iter_command_icons():
     an absolute path, it will be shortened to its file name (e.g. 
     `/usr/bin/firefox` => `firefox`).
     """
+    for path, cmd, icon in iter_desktop_file_icons():
+        yield (cmd, icon)
+
+def iter_desktop_file_icons(backend=None):
+    """
+    Work like `iter_command_icons()`, but yield tuples in the form 
+    `(path, command, icon)`, where `path` refers to the desktop file,
+    which the command and the icon were taken from.
+
+    `backend` determines how the desktop files are found: "menu" means 
+    that the user's menu files are parsed by PyXDG, while "desktop-files" 
+    means that the application directories are scanned directly (which is 
+    much faster, but also includes entries that are not part of any menu). 
+    If `backend` is `None`, then the configuration dictionary's value for 
+    `icon-backend` is used.
+    """
+    if backend is None:
+        backend = settings.config['icon-backend']
+    if backend == 'desktop-files':
+        for result in scan_desktop_files():
+            yield result
+        return
     for menu in iter_menu_files():
         for entry in iter_desktop_entries(menu):
-            exec_ = convert(entry.getExec(), str)
-            cmd = parse_commandline(exec_)[0]
-            icon = convert(entry.getIcon(), str)
-            yield (get_trimmed(cmd), icon)
+            result = get_command_icon(entry.getExec(), entry.getIcon())
+            if result is not None:
+                yield (entry.getFileName(),) + result
+
+def get_command_icon(exec_, icon):
+    """
+    Return the command of a desktop entry's `exec_`-value and the given 
+    `icon` as a tuple in the form `(command, icon)`. The command is trimmed 
+    as described in `iter_command_icons()`. Return `None` if `exec_` does 
+    not contain a command.
+    """
+    exec_ = convert(exec_, str)
+    if any(char in exec_ for char in '"\'\\'):
+        args = parse_commandline(exec_)
+    else:
+        # Shortcut for the common case, where no shell-parsing is needed
+        args = [os.path.expanduser(arg) for arg in exec_.split(None, 1)[:1]]
+    if not args:
+        return None
+    return (get_trimmed(args[0]), convert(icon, str))
 
 # PyXDG-related helper functions
 
@@ -177,6 +463,7 @@ def iter_menu_files():
     Iterate through the user's `.menu`-files and yield a `xdg.Menu.Menu` 
     object for each file to provide its entries as a parsed structure.
     """
+    import xdg.Menu
     menu_dir = settings.config['menu-dir']
     menu_files = os.path.join(menu_dir, '*.menu')
     for menu_file in glob.glob(menu_files):
@@ -194,6 +481,7 @@ def iter_desktop_entries(menu):
     that submenu before dealing with the entries, which remain 
     inside the parent menu.
     """
+    import xdg.Menu
     for entry in menu.getEntries():
         if isinstance(entry, xdg.Menu.MenuEntry):
             yield entry.DesktopEntry
@@ -202,3 +490,105 @@ def iter_desktop_entries(menu):
             for desktop_entry in iter_desktop_entries(entry):
                 yield desktop_entry
         # (Other types are ignored)
+
+# Direct access to desktop files (without PyXDG)
+
+# Escape sequences used inside of desktop entry values
+DESKTOP_ESCAPES = {'s': ' ', 'n': '\n', 't': '\t', 'r': '\r', '\\': '\\'}
+
+def scan_desktop_files(processes=None):
+    """
+    Read the command and the icon of each desktop file inside the user's 
+    application directories and return a list of `(path, command, icon)`-
+    tuples. The files are read concurrently by a pool of `processes` 
+    threads. If `processes` is `None`, the number of CPUs is used.
+    """
+    paths = list(iter_desktop_files())
+    if not paths:
+        return []
+    from multiprocessing.pool import ThreadPool
+    pool = ThreadPool(processes)
+    try:
+        results = pool.map(read_command_icon, paths)
+    finally:
+        pool.close()
+        pool.join()
+    return [(path,) + result for path, result in zip(paths, results)
+            if result is not None]
+
+def iter_desktop_files():
+    """
+    Yield the path of each desktop file inside the application directories
+    (including their subdirectories). If two files have the same desktop
+    file ID, then only the one inside the more important directory is used.
+    """
+    seen_ids = set()
+    for app_dir in get_application_dirs():
+        for dirpath, dirnames, filenames in os.walk(app_dir):
+            prefix = os.path.relpath(dirpath, app_dir).replace(os.sep, '-')
+            prefix = '' if prefix == os.curdir else prefix + '-'
+            for filename in filenames:
+                if not filename.endswith('.desktop'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                desktop_id = prefix + filename
+                if desktop_id not in seen_ids:
+                    seen_ids.add(desktop_id)
+                    yield path
+
+def read_command_icon(path):
+    """
+    Read the desktop file at `path` and return a `(command, icon)`-tuple 
+    as `get_command_icon()` would do. Return `None` if the file could not 
+    be read, if it is hidden or if it does not contain a command.
+    """
+    try:
+        entry = read_desktop_entry(path, ('Exec', 'Icon', 'Hidden'))
+        if entry.get('Hidden') == 'true' or 'Exec' not in entry:
+            return None
+        return get_command_icon(entry['Exec'], entry.get('Icon', ''))
+    except (EnvironmentError, ValueError):
+        return None
+
+def read_desktop_entry(path, keys, group='Desktop Entry'):
+    """
+    Return a dictionary of the values, which are defined for the given
+    `keys` inside `group` of the desktop file (or any other file in that 
+    format) at `path`. Keys that do not appear in the file are missing 
+    inside the dictionary. Note that localized keys are not supported.
+    """
+    header = '[{0}]'.format(group)
+    entry = {}
+    in_group = False
+    with io.open(path, encoding='utf-8', errors='replace') as lines:
+        for line in lines:
+            line = line.strip()
+            if line.startswith('['):
+                if in_group:
+                    break
+                in_group = (line == header)
+            elif in_group and '=' in line:
+                key, value = line.split('=', 1)
+                key = key.strip()
+                if key in keys:
+                    entry[key] = convert(unescape_value(value.strip()), str)
+    return entry
+
+def unescape_value(value):
+    """
+    Replace the escape sequences inside of a desktop entry's `value` with
+    their corresponding characters.
+    """
+    if '\\' not in value:
+        return value
+    chars = []
+    escaped = False
+    for char in value:
+        if escaped:
+            chars.append(DESKTOP_ESCAPES.get(char, '\\' + char))
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        else:
+            chars.append(char)
+    return ''.join(chars)
@@ -0,0 +1,375 @@
+"""
+Look up icons inside XDG icon themes by use of a prebuilt index.
+
+Each theme (including the themes it inherits from and `hicolor`) is scanned
+once and the resulting index is stored inside the user's cache directory,
+together with the modification times of the scanned directories. After that,
+a lookup is answered by the index without any filesystem access, except for
+a check of those modification times every `CHECK_INTERVAL` seconds, so that
+installed or removed icons are noticed.
+"""
+# Stdlib
+import io
+import os
+import time
+
+# 3rd party
+from xdg.BaseDirectory import xdg_data_dirs
+
+# Launchit package
+from . import _cacheutils
+from ._stringutils import convert
+
+# Preferred file extensions (in that order)
+EXTENSIONS = ('png', 'svg', 'xpm')
+
+# Name of the theme, which every theme implicitly inherits from
+FALLBACK_THEME = 'hicolor'
+
+# Increase this when the structure of the stored index changes
+INDEX_VERSION = 1
+
+# Minimal number of seconds between checks whether an index is outdated
+CHECK_INTERVAL = 5
+
+def get_base_dirs():
+    """
+    Return a list of the directories, which may contain icon themes.
+    """
+    base_dirs = [os.path.expanduser('~/.icons')]
+    base_dirs.extend(os.path.join(data_dir, 'icons')
+                     for data_dir in xdg_data_dirs)
+    return base_dirs
+
+def get_fallback_dirs():
+    """
+    Return a list of the directories, which may contain icons that do not
+    belong to any theme.
+    """
+    fallback_dirs = get_base_dirs()
+    fallback_dirs.extend(os.path.join(data_dir, 'pixmaps')
+                         for data_dir in xdg_data_dirs)
+    return fallback_dirs
+
+class ThemeIndex(object):
+    """
+    An index of all icons inside a theme, the themes it inherits from and
+    the fallback directories.
+    """
+    def __init__(self, theme):
+        self.theme = theme
+        # Themes in lookup order
+        self.chain = []
+        # theme -> subdir -> (type, size, min_size, max_size, threshold, scale)
+        self.directories = {}
+        # theme -> icon name -> list of (subdir, path)
+        self.icons = {}
+        # Modification times of the scanned files and directories
+        self.sources = {}
+        # icon name -> path
+        self.fallback_icons = {}
+
+    @classmethod
+    def load(cls, theme, use_disk_cache=True):
+        """
+        Return an index for `theme`. If `use_disk_cache` is `True` and if
+        none of the scanned directories has changed, it is loaded from the
+        user's cache directory. Otherwise the directories are scanned and
+        the result is stored there.
+        """
+        filename = 'icon-theme-{0}.json'.format(theme)
+        key = [INDEX_VERSION, theme] + get_fallback_dirs()
+        index = cls(theme)
+        entry = None
+        if use_disk_cache:
+            entry = _cacheutils.load_cache_entry(filename, key)
+        if entry is None:
+            mtimes = _cacheutils.get_mtimes(index.iter_sources())
+            index.build()
+            _cacheutils.save_cache(filename, index.to_data(), mtimes, key)
+            index.sources = mtimes
+        else:
+            data, index.sources = entry
+            index.from_data(data)
+        return index
+
+    def is_outdated(self):
+        """
+        Return `True` if one of the scanned files or directories has changed
+        since the index was built, otherwise `False`.
+        """
+        return _cacheutils.get_mtimes(self.sources) != self.sources
+
+    def iter_sources(self):
+        """
+        Yield the paths of all files and directories, which the index is
+        built from. Note that this reads the involved `index.theme`-files.
+        """
+        for theme in self.get_chain():
+            for theme_dir in self.iter_theme_dirs(theme):
+                yield theme_dir
+                yield os.path.join(theme_dir, 'index.theme')
+                for subdir in self.read_directories(theme):
+                    yield os.path.join(theme_dir, subdir)
+        for fallback_dir in get_fallback_dirs():
+            yield fallback_dir
+
+    def build(self):
+        """
+        Scan the theme directories and fill the index.
+        """
+        self.chain = self.get_chain()
+        for theme in self.chain:
+            directories = self.read_directories(theme)
+            icons = {}
+            for theme_dir in self.iter_theme_dirs(theme):
+                for subdir in directories:
+                    path = os.path.join(theme_dir, subdir)
+                    for name, icon_path in iter_icon_files(path):
+                        icons.setdefault(name, []).append((subdir, icon_path))
+            self.directories[theme] = directories
+            self.icons[theme] = icons
+        for fallback_dir in reversed(get_fallback_dirs()):
+            # Reversed, so that the more important directories win
+            self.fallback_icons.update(iter_icon_files(fallback_dir))
+
+    def lookup(self, name, size=48, scale=1):
+        """
+        Return the path of the icon named `name`, which matches the given
+        `size` and `scale` best. Return `None` if no such icon exists.
+        """
+        base, extension = os.path.splitext(name)
+        if extension[1:] in EXTENSIONS:
+            name = base
+        for theme in self.chain:
+            entries = self.icons[theme].get(name)
+            if entries:
+                return self._select(theme, entries, size, scale)
+        return self.fallback_icons.get(name)
+
+    def _select(self, theme, entries, size, scale):
+        """
+        Return the path of the entry, whose directory matches the size best.
+        """
+        directories = self.directories[theme]
+        for subdir, path in entries:
+            if matches_size(directories[subdir], size, scale):
+                return path
+        distances = ((size_distance(directories[subdir], size, scale), path)
+                     for subdir, path in entries)
+        return min(distances)[1]
+
+    def get_chain(self):
+        """
+        Return a list containing the theme and all the themes it inherits
+        from in lookup order. `FALLBACK_THEME` is always the last item.
+        """
+        chain = []
+        pending = [self.theme]
+        while pending:
+            theme = pending.pop(0)
+            if theme in chain or theme == FALLBACK_THEME:
+                continue
+            groups = self.read_index_file(theme)
+            if groups is None:
+                continue
+            chain.append(theme)
+            inherits = groups.get('Icon Theme', {}).get('Inherits', '')
+            pending.extend(name.strip() for name in inherits.split(',')
+                           if name.strip())
+        return chain + [FALLBACK_THEME]
+
+    def read_directories(self, theme):
+        """
+        Return a dictionary, which maps each subdirectory of `theme` to
+        a tuple in the form `(type, size, min_size, max_size, threshold,
+        scale)` describing the icons inside that subdirectory.
+        """
+        groups = self.read_index_file(theme) or {}
+        header = groups.get('Icon Theme', {})
+        names = header.get('Directories', '').split(',')
+        names += header.get('ScaledDirectories', '').split(',')
+        directories = {}
+        for subdir in filter(None, (name.strip() for name in names)):
+            values = groups.get(subdir, {})
+            try:
+                size = int(values.get('Size', 0))
+                directories[subdir] = (
+                    values.get('Type', 'Threshold'), size,
+                    int(values.get('MinSize', size)),
+                    int(values.get('MaxSize', size)),
+                    int(values.get('Threshold', 2)),
+                    int(values.get('Scale', 1)))
+            except ValueError:
+                continue
+        return directories
+
+    def read_index_file(self, theme):
+        """
+        Return the parsed `index.theme`-file of `theme`. See the function
+        `read_index_file()` for details. Return `None` if the theme does
+        not exist.
+        """
+        for theme_dir in self.iter_theme_dirs(theme):
+            path = os.path.join(theme_dir, 'index.theme')
+            if os.path.isfile(path):
+                return read_index_file(path)
+        return None
+
+    def iter_theme_dirs(self, theme):
+        """
+        Yield the existing directories, which belong to `theme`.
+        """
+        for base_dir in get_base_dirs():
+            theme_dir = os.path.join(base_dir, theme)
+            if os.path.isdir(theme_dir):
+                yield theme_dir
+
+    def to_data(self):
+        """
+        Return the index as a JSON-serializable object.
+        """
+        return {'chain': self.chain, 'directories': self.directories,
+                'icons': self.icons, 'fallback_icons': self.fallback_icons}
+
+    def from_data(self, data):
+        """
+        Fill the index with `data` as returned by `to_data()`.
+        """
+        self.chain = data['chain']
+        self.directories = dict(
+            (theme, dict((subdir, tuple(values))
+                         for subdir, values in directories.items()))
+            for theme, directories in data['directories'].items())
+        self.icons = data['icons']
+        self.fallback_icons = data['fallback_icons']
+
+def matches_size(directory, size, scale):
+    """
+    Return `True` if icons inside `directory` (given as a tuple like the
+    ones returned by `ThemeIndex.read_directories()`) are suitable for the
+    given `size` and `scale`, otherwise `False`.
+    """
+    type_, dir_size, min_size, max_size, threshold, dir_scale = directory
+    if dir_scale != scale:
+        return False
+    if type_ == 'Fixed':
+        return dir_size == size
+    if type_ == 'Scalable':
+        return min_size <= size <= max_size
+    return dir_size - threshold <= size <= dir_size + threshold
+
+def size_distance(directory, size, scale):
+    """
+    Return the distance between the icon size of `directory` and the given
+    `size` and `scale` as defined by the icon theme specification.
+    """
+    type_, dir_size, min_size, max_size, threshold, dir_scale = directory
+    if type_ == 'Fixed':
+        return abs(dir_size * dir_scale - size * scale)
+    if type_ == 'Scalable':
+        lower, upper = min_size, max_size
+    else:
+        lower, upper = dir_size - threshold, dir_size + threshold
+    if size * scale < lower * dir_scale:
+        return lower * dir_scale - size * scale
+    if size * scale > upper * dir_scale:
+        return size * scale - upper * dir_scale
+    return 0
+
+def iter_icon_files(dirname):
+    """
+    Yield a `(name, path)`-tuple for each icon file inside `dirname`, where
+    `name` is the icon's file name without extension. If there are multiple
+    files for the same name, only the one with the preferred extension is
+    yielded. Nothing is yielded if `dirname` does not exist.
+    """
+    try:
+        filenames = os.listdir(dirname)
+    except OSError:
+        return
+    found = {}
+    for filename in filenames:
+        name, extension = os.path.splitext(filename)
+        extension = extension[1:]
+        if extension not in EXTENSIONS:
+            continue
+        if name in found and found[name] <= EXTENSIONS.index(extension):
+            continue
+        found[name] = EXTENSIONS.index(extension)
+    for name, rank in found.items():
+        filename = '{0}.{1}'.format(name, EXTENSIONS[rank])
+        yield (name, os.path.join(dirname, filename))
+
+def read_index_file(path):
+    """
+    Read an `index.theme`-file at `path` and return a dictionary, which maps
+    each group name to a dictionary of the group's keys and values.
+    """
+    groups = {}
+    group = None
+    with io.open(path, encoding='utf-8', errors='replace') as lines:
+        for line in lines:
+            line = convert(line.strip(), str)
+            if line.startswith('[') and line.endswith(']'):
+                group = groups.setdefault(line[1:-1], {})
+            elif group is not None and '=' in line:
+                key, value = line.split('=', 1)
+                group[key.strip()] = value.strip()
+    return groups
+
+# Maps theme names to their `ThemeIndex`
+theme_indexes = {}
+
+# Maps theme names to the time, when their index was checked the last time
+theme_check_times = {}
+
+# Maps theme names to the number of times, their index has been loaded
+theme_generations = {}
+
+def get_theme_index(theme):
+    """
+    Return the `ThemeIndex` for `theme`. Each index is loaded only once,
+    but it is loaded again, if it turns out to be outdated. That check is
+    done at most every `CHECK_INTERVAL` seconds.
+    """
+    index = theme_indexes.get(theme)
+    now = time.time()
+    if index is not None:
+        if now - theme_check_times.get(theme, 0) < CHECK_INTERVAL:
+            return index
+        theme_check_times[theme] = now
+        if not index.is_outdated():
+            return index
+    index = theme_indexes[theme] = ThemeIndex.load(theme)
+    theme_check_times[theme] = now
+    theme_generations[theme] = theme_generations.get(theme, 0) + 1
+    return index
+
+def get_theme_generation(theme):
+    """
+    Return a number, which is increased each time the index of `theme` is
+    (re)loaded by `get_theme_index()`. Results depending on the index may 
+    be cached along with this number, so that they are not used anymore 
+    after the theme has changed.
+    """
+    get_theme_index(theme)
+    return theme_generations.get(theme, 0)
+
+def invalidate(theme=None):
+    """
+    Drop the loaded index of `theme` (or of all themes if `theme` is `None`).
+    It will be loaded again on the next lookup, which means that it will be
+    rebuilt if one of its directories has changed.
+    """
+    if theme is None:
+        theme_indexes.clear()
+    else:
+        theme_indexes.pop(theme, None)
+
+def lookup_icon(name, size=48, theme=FALLBACK_THEME):
+    """
+    Return the path of the icon named `name` inside `theme` for the given
+    `size`. Return `None` if no such icon exists.
+    """
+    return get_theme_index(theme).lookup(name, size)
@@ -1,7 +1,13 @@
 """
-Common interface for propagating logable messages.
+Common interface for propagating logable messages and for measuring the
+time spent inside hot code paths.
 """
+from collections import deque
+import functools
 import logging
+import signal
+import threading
+from timeit import default_timer
 
 def set_console_handler(logger, format):
     """
@@ -73,3 +79,217 @@ def error(message):
     Log a `message` with logging level `ERROR` on the `LOGGER`.
     """
     _log(logging.ERROR, message)
+
+### Timing
+
+# Upper bounds (in milliseconds) of the buckets used by `Histogram`
+BUCKET_BOUNDS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+class Histogram(object):
+    """
+    Rolling record of the durations measured for a span. Only the last
+    `size` durations are kept, so that the statistics follow the current
+    behavior. The total number of measurements is counted nonetheless.
+
+    Durations may be added by several threads. The statistics are computed
+    from a snapshot of the recorded durations.
+    """
+    def __init__(self, size=1024):
+        self.durations = deque(maxlen=size)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def add(self, duration):
+        """
+        Record `duration`, which is expected to be given in seconds.
+        """
+        with self._lock:
+            self.durations.append(duration)
+            self.count += 1
+
+    def get_snapshot(self):
+        """
+        Return a list of the recorded durations and the total number of
+        measurements as a tuple.
+        """
+        with self._lock:
+            return (list(self.durations), self.count)
+
+    def get_percentile(self, percent):
+        """
+        Return the duration in milliseconds, which is not exceeded by
+        `percent` percent of the recorded durations. Return `None` if
+        nothing was recorded.
+        """
+        durations, count = self.get_snapshot()
+        return _get_percentile(sorted(durations), percent)
+
+    def get_buckets(self):
+        """
+        Return a list of `(bound, count)`-tuples, where `count` is the
+        number of recorded durations up to `bound` milliseconds, but above
+        the previous bound. The last bound is `None` (i.e. unbounded).
+        """
+        bounds = BUCKET_BOUNDS + (None,)
+        counts = [0] * len(bounds)
+        durations, count = self.get_snapshot()
+        for duration in durations:
+            duration *= 1000
+            for number, bound in enumerate(bounds):
+                if bound is None or duration <= bound:
+                    counts[number] += 1
+                    break
+        return list(zip(bounds, counts))
+
+    def get_summary(self):
+        """
+        Return a line, which summarizes the recorded durations.
+        """
+        durations, count = self.get_snapshot()
+        if not durations:
+            return 'no calls'
+        durations.sort()
+        return '{0} calls, p50 {1:.3f} ms, p90 {2:.3f} ms, ' \
+               'p99 {3:.3f} ms, max {4:.3f} ms'.format(
+                   count, _get_percentile(durations, 50),
+                   _get_percentile(durations, 90),
+                   _get_percentile(durations, 99), durations[-1] * 1000)
+
+def _get_percentile(durations, percent):
+    """
+    Return the duration in milliseconds, which is not exceeded by `percent`
+    percent of the sorted list `durations` (nearest rank). Return `None` if
+    `durations` is empty.
+    """
+    if not durations:
+        return None
+    rank = max(0, int(round(percent / 100.0 * len(durations))) - 1)
+    return durations[rank] * 1000
+
+# Maps span names to their `Histogram`. Used by `span()` and `timed()`,
+# which do nothing apart from running the code when this is `None`.
+TIMINGS = None
+
+_timings_lock = threading.Lock()
+
+def enable_timing():
+    """
+    Start recording the durations of spans. Durations recorded before are
+    kept.
+    """
+    global TIMINGS
+    if TIMINGS is None:
+        TIMINGS = {}
+
+def disable_timing():
+    """
+    Stop recording durations and drop the recorded ones. This is setting
+    `TIMINGS` to `None`.
+    """
+    global TIMINGS
+    TIMINGS = None
+
+def add_duration(name, duration):
+    """
+    Record `duration` (in seconds) for the span named `name`. Do nothing,
+    if timing is disabled.
+    """
+    timings = TIMINGS
+    if timings is None:
+        return
+    histogram = timings.get(name)
+    if histogram is None:
+        with _timings_lock:
+            histogram = timings.setdefault(name, Histogram())
+    histogram.add(duration)
+
+class _Span(object):
+    """
+    Context manager, which records the time spent inside its block.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = default_timer()
+        return self
+
+    def __exit__(self, *exc_info):
+        add_duration(self.name, default_timer() - self.start)
+
+class _NullSpan(object):
+    """
+    Context manager, which does nothing. Used when timing is disabled.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+def span(name):
+    """
+    Return a context manager, which records the time spent inside its
+    block for the span named `name`. When timing is disabled, a shared
+    context manager is returned, which does nothing.
+    """
+    if TIMINGS is None:
+        return _NULL_SPAN
+    return _Span(name)
+
+def timed(name):
+    """
+    Decorator, which records the time spent inside each call of the
+    decorated function for the span named `name`. When timing is disabled,
+    the function is just called.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if TIMINGS is None:
+                return func(*args, **kwargs)
+            start = default_timer()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                add_duration(name, default_timer() - start)
+        return wrapper
+    return decorate
+
+def get_timing_summaries():
+    """
+    Return a list of `(name, summary)`-tuples for all spans, which were
+    recorded so far, sorted by name. See `Histogram.get_summary()` for
+    details about `summary`. The list is empty if timing is disabled.
+    """
+    timings = TIMINGS
+    if timings is None:
+        return []
+    with _timings_lock:
+        items = sorted(timings.items())
+    return [(name, histogram.get_summary()) for name, histogram in items]
+
+def dump_timings():
+    """
+    Log a line for each recorded span with logging level `INFO` on the
+    `LOGGER`.
+    """
+    for name, summary in get_timing_summaries():
+        info('Timing {0}: {1}'.format(name, summary))
+
+def install_dump_handler(signum=getattr(signal, 'SIGUSR1', None)):
+    """
+    Make `dump_timings()` run whenever the process receives the signal
+    `signum` (default: `SIGUSR1`). Return `False` if that is not possible
+    (e.g. when not called from the main thread), otherwise `True`.
+    """
+    if signum is None:
+        return False
+    try:
+        signal.signal(signum, lambda signum, frame: dump_timings())
+    except ValueError:
+        return False
+    return True
@@ -0,0 +1,290 @@
+"""
+Open files with the user's default application without invoking a starter
+like `xdg-open`.
+
+The default application for a MIME-type is looked up in the `mimeapps.list`
+-files as defined by the XDG specification and in the `mimeinfo.cache`-files,
+which are written by `update-desktop-database`. The involved files are read
+once and the result is kept until one of them has changed.
+"""
+# Stdlib
+import os
+import re
+import threading
+
+# 3rd party
+from xdg.BaseDirectory import xdg_config_dirs, xdg_data_dirs
+
+# Launchit package
+from . import _cacheutils, icongetter, mimecache
+from ._stringutils import convert
+from .core import parse_commandline
+from .icontheme import read_index_file
+
+# Groups used inside `mimeapps.list`-files
+DEFAULT_GROUP = 'Default Applications'
+ADDED_GROUP = 'Added Associations'
+REMOVED_GROUP = 'Removed Associations'
+
+# Group used inside `mimeinfo.cache`-files
+CACHE_GROUP = 'MIME Cache'
+
+# Field codes, which are replaced with the file's path
+FILE_CODES = ('f', 'F', 'u', 'U')
+
+FIELD_CODE = re.compile('%(.)')
+
+def get_desktop_names():
+    """
+    Return a list of the lowercased names of the current desktop environment
+    as defined by `XDG_CURRENT_DESKTOP`. The list may be empty.
+    """
+    names = os.getenv('XDG_CURRENT_DESKTOP', '').lower().split(':')
+    return [name for name in names if name]
+
+def get_mimeapps_paths():
+    """
+    Return the paths of all `mimeapps.list`-files, which may exist, in the
+    order of their precedence.
+    """
+    dirnames = list(xdg_config_dirs)
+    dirnames.extend(os.path.join(data_dir, 'applications')
+                    for data_dir in xdg_data_dirs)
+    filenames = ['{0}-mimeapps.list'.format(name)
+                 for name in get_desktop_names()]
+    filenames.append('mimeapps.list')
+    return [os.path.join(dirname, filename)
+            for dirname in dirnames for filename in filenames]
+
+def get_mimeinfo_paths():
+    """
+    Return the paths of all `mimeinfo.cache`-files, which may exist, in the
+    order of their precedence.
+    """
+    return [os.path.join(app_dir, 'mimeinfo.cache')
+            for app_dir in icongetter.get_application_dirs()]
+
+def read_list(path, group):
+    """
+    Read the file at `path` and return a dictionary, which maps each key
+    inside `group` to the list of desktop file IDs given as its value. An
+    empty dictionary is returned if the file does not exist.
+    """
+    try:
+        groups = read_index_file(path)
+    except EnvironmentError:
+        return {}
+    return dict((key, [name for name in value.split(';') if name])
+                for key, value in groups.get(group, {}).items())
+
+class AssociationTable(object):
+    """
+    Associations between MIME-types and desktop files.
+    """
+    def __init__(self):
+        self.mimeapps_paths = get_mimeapps_paths()
+        self.mimeinfo_paths = get_mimeinfo_paths()
+        self.mtimes = _cacheutils.get_mtimes(self.iter_sources())
+        # Each item is a dictionary of a `mimeapps.list`-file's groups
+        self.mimeapps = []
+        for path in self.mimeapps_paths:
+            self.mimeapps.append(dict(
+                (group, read_list(path, group))
+                for group in (DEFAULT_GROUP, ADDED_GROUP, REMOVED_GROUP)))
+        self.mimeinfo = [read_list(path, CACHE_GROUP)
+                         for path in self.mimeinfo_paths]
+        self.desktop_files = {}
+        for path in icongetter.iter_desktop_files():
+            self.desktop_files.setdefault(get_desktop_id(path), path)
+        self._defaults = {}
+
+    def iter_sources(self):
+        """
+        Yield the paths of the files and directories, which the table is
+        built from.
+        """
+        for path in self.mimeapps_paths + self.mimeinfo_paths:
+            yield path
+        for app_dir in icongetter.get_application_dirs():
+            yield app_dir
+
+    def is_stale(self):
+        """
+        Return `True` if one of the table's sources has changed since the
+        table was built, otherwise `False`.
+        """
+        return _cacheutils.get_mtimes(self.mtimes) != self.mtimes
+
+    def get_candidates(self, mimetype):
+        """
+        Return a list of the desktop file IDs, which are associated with
+        `mimetype`, in the order of preference. The default applications
+        come first, followed by the added associations and the associations
+        inside the `mimeinfo.cache`-files. Associations, which were removed
+        by a `mimeapps.list`-file, are ignored for the added associations of
+        files with lower precedence and for the `mimeinfo.cache`-files. The 
+        default applications are not affected by removed associations.
+        """
+        candidates = []
+        added = []
+        removed = set()
+        for groups in self.mimeapps:
+            candidates.extend(groups[DEFAULT_GROUP].get(mimetype, []))
+            desktop_ids = groups[ADDED_GROUP].get(mimetype, [])
+            added.extend(desktop_id for desktop_id in desktop_ids
+                         if desktop_id not in removed)
+            removed.update(groups[REMOVED_GROUP].get(mimetype, []))
+        candidates.extend(added)
+        for associations in self.mimeinfo:
+            candidates.extend(desktop_id
+                              for desktop_id in associations.get(mimetype, [])
+                              if desktop_id not in removed)
+        return candidates
+
+    def get_default(self, mimetype):
+        """
+        Return the path of the default application's desktop file for
+        `mimetype`. Return `None` if no installed application is associated
+        with that MIME-type. Results are memoized.
+        """
+        try:
+            return self._defaults[mimetype]
+        except KeyError:
+            pass
+        path = None
+        for desktop_id in self.get_candidates(mimetype):
+            path = self.desktop_files.get(desktop_id)
+            if path is not None:
+                break
+        self._defaults[mimetype] = path
+        return path
+
+def get_desktop_id(path):
+    """
+    Return the desktop file ID for the desktop file at `path`. This is the
+    path relative to the application directory, where each separator is
+    replaced by "-".
+    """
+    for app_dir in icongetter.get_application_dirs():
+        app_dir = os.path.join(app_dir, '')
+        if path.startswith(app_dir):
+            return path[len(app_dir):].replace(os.sep, '-')
+    return os.path.basename(path)
+
+def has_quoted_file_code(exec_):
+    """
+    Return `True` if a field code for the file is used inside a quoted part
+    of the `Exec`-value `exec_` (e.g. `sh -c "cat %f"`), otherwise `False`.
+    """
+    quote = None
+    position = 0
+    while position < len(exec_):
+        char = exec_[position]
+        if char == '\\' and quote != "'":
+            # Skip the escaped character
+            position += 1
+        elif char in '"\'' and quote in (None, char):
+            quote = None if quote else char
+        elif char == '%':
+            code = exec_[position + 1:position + 2]
+            if quote and code in FILE_CODES:
+                return True
+            if code == '%':
+                position += 1
+        position += 1
+    return False
+
+def expand_exec(exec_, path, name='', icon='', desktop_file=''):
+    """
+    Return the arguments for the `Exec`-value `exec_` of a desktop file as
+    a list, where the field codes are expanded in order to open the file
+    at `path`. `name`, `icon` and `desktop_file` are the values used for
+    `%c`, `%i` and `%k`. Deprecated field codes are removed. If `exec_`
+    does not contain a code for the file, then `path` is appended.
+
+    Raise `ValueError` if `exec_` cannot be parsed or if it uses a code for
+    the file inside a quoted argument. The specification leaves the result
+    undefined in that case and the argument might be interpreted by a shell,
+    so substituting a path, which may contain any character, is not safe.
+    """
+    if has_quoted_file_code(exec_):
+        raise ValueError('File code inside quoted argument: ' + exec_)
+    args = []
+    path_used = [False]
+
+    def expand(match):
+        code = match.group(1)
+        if code in FILE_CODES:
+            path_used[0] = True
+            return path
+        return {'%': '%', 'c': name, 'k': desktop_file}.get(code, '')
+
+    for arg in parse_commandline(exec_):
+        if arg == '%i':
+            if icon:
+                args.extend(['--icon', icon])
+        elif '%' in arg:
+            arg = FIELD_CODE.sub(expand, arg)
+            if arg:
+                args.append(arg)
+        else:
+            args.append(arg)
+    if not path_used[0]:
+        args.append(path)
+    return args
+
+_table = None
+_table_lock = threading.Lock()
+
+def get_table():
+    """
+    Return the shared `AssociationTable`. It is built on first use and built
+    again when one of its sources has changed.
+    """
+    global _table
+    with _table_lock:
+        if _table is None or _table.is_stale():
+            _table = AssociationTable()
+        return _table
+
+def get_default_app(mimetype):
+    """
+    Return the path of the default application's desktop file for
+    `mimetype` or `None` if there is no such application. If a `text/`-type
+    has no application, then the one for `text/plain` is used.
+    """
+    table = get_table()
+    path = table.get_default(mimetype)
+    if path is None and mimetype.startswith('text/'):
+        path = table.get_default('text/plain')
+    return path
+
+def get_open_command(path):
+    """
+    Return the arguments needed to open the file (or directory) at `path`
+    with its default application as a list. Return `None` if `path` does
+    not exist, if its MIME-type is unknown or if no default application
+    could be found.
+    """
+    if not os.path.exists(path):
+        return None
+    mimetype = mimecache.get_type(path)
+    if mimetype is None:
+        return None
+    desktop_file = get_default_app(mimetype)
+    if desktop_file is None:
+        return None
+    keys = ('Exec', 'Icon', 'Name', 'Hidden')
+    try:
+        entry = icongetter.read_desktop_entry(desktop_file, keys)
+    except EnvironmentError:
+        return None
+    if entry.get('Hidden') == 'true' or not entry.get('Exec'):
+        return None
+    try:
+        return expand_exec(entry['Exec'], convert(path, str),
+                           entry.get('Name', ''), entry.get('Icon', ''),
+                           desktop_file)
+    except ValueError:
+        # Invalid or unsafe quoting inside the `Exec`-value
+        return None
@@ -0,0 +1,425 @@
+"""
+Detect MIME-types by reading the binary `mime.cache`-files, which are built
+by shared-mime-info's `update-mime-database`.
+
+The files are accessed through `mmap`, so that nothing needs to be parsed
+in advance. Detection results are memoized per file. If no `mime.cache` is
+available, `get_type()` returns `None` and callers should fall back to
+PyXDG's `xdg.Mime`-module.
+"""
+# Stdlib
+import fnmatch
+import mmap
+import os
+import stat
+import struct
+import threading
+
+# 3rd party
+from xdg.BaseDirectory import xdg_data_dirs
+
+# Launchit package
+from . import _cacheutils
+from ._stringutils import convert
+
+# Supported major version of the cache format
+MAJOR_VERSION = 1
+
+# Offsets of the section offsets inside the header
+LITERAL_LIST = 12
+REVERSE_SUFFIX_TREE = 16
+GLOB_LIST = 20
+MAGIC_LIST = 24
+
+# Flag inside a glob weight, which indicates a case-sensitive pattern
+CASE_SENSITIVE = 0x100
+
+# Types used for special filesystem objects (as returned by PyXDG)
+STAT_TYPES = (
+    (stat.S_ISDIR, 'inode/directory'),
+    (stat.S_ISCHR, 'inode/chardevice'),
+    (stat.S_ISBLK, 'inode/blockdevice'),
+    (stat.S_ISFIFO, 'inode/fifo'),
+    (stat.S_ISLNK, 'inode/symlink'),
+    (stat.S_ISSOCK, 'inode/socket'),
+)
+
+# Type of files, which are neither known nor recognized as text
+OCTET_STREAM = 'application/octet-stream'
+
+# Number of bytes to check when guessing whether a file contains text
+TEXT_CHECK_SIZE = 32
+
+UINT32 = struct.Struct('>I')
+TREE_NODE = struct.Struct('>3I')
+MATCH = struct.Struct('>4I')
+MATCHLET = struct.Struct('>8I')
+
+class MimeCache(object):
+    """
+    Read-only access to a single `mime.cache`-file.
+    """
+    def __init__(self, path):
+        """
+        Map the file at `path` into memory. Raise `EnvironmentError` if the
+        file cannot be read and `ValueError` if its format is unsupported.
+        """
+        self.path = path
+        with open(path, 'rb') as cache_file:
+            self._buffer = mmap.mmap(cache_file.fileno(), 0,
+                                     access=mmap.ACCESS_READ)
+        if self._get_uint(0) >> 16 != MAJOR_VERSION:
+            raise ValueError('Unsupported format: {0!r}'.format(path))
+
+    def close(self):
+        """
+        Unmap the file.
+        """
+        self._buffer.close()
+
+    def get_max_extent(self):
+        """
+        Return the number of bytes, which a file's head must have in order
+        to check all magic rules.
+        """
+        return self._get_uint(self._get_uint(MAGIC_LIST) + 4)
+
+    def match_literal(self, name):
+        """
+        Return a list of `(weight, mimetype)`-tuples for the literal
+        patterns (e.g. `Makefile`) that are equal to `name`.
+        """
+        matches = self._lookup_literal(name, True)
+        if not matches:
+            matches = self._lookup_literal(name.lower(), False)
+        return matches
+
+    def _lookup_literal(self, name, case_sensitive):
+        """
+        Do a binary search for `name` inside the (sorted) literal list.
+        """
+        offset = self._get_uint(LITERAL_LIST)
+        target = name if isinstance(name, bytes) else name.encode('utf-8')
+        low, high = 0, self._get_uint(offset) - 1
+        while low <= high:
+            mid = (low + high) // 2
+            entry = offset + 4 + 12 * mid
+            literal = self._get_string(self._get_uint(entry))
+            if literal < target:
+                low = mid + 1
+            elif literal > target:
+                high = mid - 1
+            else:
+                weight = self._get_uint(entry + 8)
+                if not case_sensitive and weight & CASE_SENSITIVE:
+                    return []
+                mimetype = self._get_string(self._get_uint(entry + 4))
+                return [(weight & 0xff, mimetype.decode('ascii'))]
+        return []
+
+    def match_suffix(self, name):
+        """
+        Return a list of `(weight, mimetype)`-tuples for the longest suffix
+        patterns (e.g. `*.tar.gz`) matching `name`.
+        """
+        offset = self._get_uint(REVERSE_SUFFIX_TREE)
+        count, first = self._get_uint(offset), self._get_uint(offset + 4)
+        matches = self._lookup_suffix(count, first, name.lower(), False)
+        if not matches:
+            matches = self._lookup_suffix(count, first, name, True)
+        return matches
+
+    def _lookup_suffix(self, count, offset, name, case_sensitive):
+        """
+        Walk down the reverse suffix tree starting with the `count` nodes
+        at `offset`, while consuming the characters of `name` from its end.
+        """
+        if not name:
+            return []
+        char = ord(name[-1])
+        low, high = 0, count - 1
+        while low <= high:
+            mid = (low + high) // 2
+            node_char, n_children, child_offset = self._get_node(offset, mid)
+            if node_char < char:
+                low = mid + 1
+            elif node_char > char:
+                high = mid - 1
+            else:
+                matches = self._lookup_suffix(n_children, child_offset,
+                                              name[:-1], case_sensitive)
+                if not matches:
+                    matches = self._get_leaves(n_children, child_offset,
+                                               case_sensitive)
+                return matches
+        return []
+
+    def _get_leaves(self, count, offset, case_sensitive):
+        """
+        Return the MIME-types of the leaves among the given nodes. Leaves
+        have the character 0, so they come first.
+        """
+        matches = []
+        for index in range(count):
+            node_char, mimetype_offset, weight = self._get_node(offset, index)
+            if node_char != 0:
+                break
+            if case_sensitive or not weight & CASE_SENSITIVE:
+                mimetype = self._get_string(mimetype_offset).decode('ascii')
+                matches.append((weight & 0xff, mimetype))
+        return matches
+
+    def match_glob(self, name):
+        """
+        Return a list of `(weight, mimetype)`-tuples for the remaining glob
+        patterns, which match `name`.
+        """
+        offset = self._get_uint(GLOB_LIST)
+        matches = []
+        for index in range(self._get_uint(offset)):
+            entry = offset + 4 + 12 * index
+            pattern = self._get_string(self._get_uint(entry))
+            weight = self._get_uint(entry + 8)
+            candidate = name if weight & CASE_SENSITIVE else name.lower()
+            if fnmatch.fnmatchcase(candidate, pattern.decode('utf-8')):
+                mimetype = self._get_string(self._get_uint(entry + 4))
+                matches.append((weight & 0xff, mimetype.decode('ascii')))
+        return matches
+
+    def match_magic(self, data, possible=None):
+        """
+        Return the `(priority, mimetype)`-tuple of the first magic rule,
+        which matches `data` (the head of a file as bytes). If `possible`
+        is given, then only the rules for the MIME-types inside `possible`
+        are checked. Return `None` if no rule matches.
+        """
+        offset = self._get_uint(MAGIC_LIST)
+        count = self._get_uint(offset)
+        first = self._get_uint(offset + 8)
+        # Rules are sorted by descending priority
+        for index in range(count):
+            priority, mimetype_offset, n_matchlets, matchlet_offset = \
+                MATCH.unpack_from(self._buffer, first + 16 * index)
+            mimetype = self._get_string(mimetype_offset).decode('ascii')
+            if possible is not None and mimetype not in possible:
+                continue
+            if self._match_matchlets(n_matchlets, matchlet_offset, data):
+                return (priority, mimetype)
+        return None
+
+    def _match_matchlets(self, count, offset, data):
+        """
+        Return `True` if any of the `count` matchlets at `offset` matches
+        `data`, otherwise `False`.
+        """
+        for index in range(count):
+            (range_start, range_length, word_size, value_length,
+             value_offset, mask_offset, n_children, child_offset) = \
+                MATCHLET.unpack_from(self._buffer, offset + 32 * index)
+            value = self._buffer[value_offset:value_offset + value_length]
+            end = range_start + range_length + value_length - 1
+            if mask_offset:
+                mask = self._buffer[mask_offset:mask_offset + value_length]
+                matched = any(
+                    _match_masked(data[start:start + value_length],
+                                  value, mask)
+                    for start in range(range_start, min(
+                        range_start + range_length, len(data))))
+            else:
+                # Let the (fast) builtin search the whole range at once
+                matched = data.find(value, range_start, end) >= 0
+            if matched and (not n_children or self._match_matchlets(
+                    n_children, child_offset, data)):
+                return True
+        return False
+
+    def _get_uint(self, offset):
+        """
+        Return the big-endian 32-bit integer at `offset`.
+        """
+        return UINT32.unpack_from(self._buffer, offset)[0]
+
+    def _get_node(self, offset, index):
+        """
+        Return the fields of the tree node with the given `index` among the
+        nodes starting at `offset` as a tuple.
+        """
+        return TREE_NODE.unpack_from(self._buffer, offset + 12 * index)
+
+    def _get_string(self, offset):
+        """
+        Return the NUL-terminated byte string at `offset`.
+        """
+        return self._buffer[offset:self._buffer.find(b'\0', offset)]
+
+class MimeDatabase(object):
+    """
+    Detect MIME-types by use of all available `mime.cache`-files. Results
+    are memoized per path, modification time and size of the file.
+    """
+    def __init__(self, paths=None, memo_size=256):
+        """
+        Open the caches at `paths`. If `paths` is `None`, the `mime.cache`
+        inside each XDG data directory is used. Unavailable or unsupported
+        files are ignored.
+        """
+        if paths is None:
+            paths = [os.path.join(data_dir, 'mime', 'mime.cache')
+                     for data_dir in xdg_data_dirs]
+        self.mtimes = _cacheutils.get_mtimes(paths)
+        self.caches = []
+        for path in paths:
+            try:
+                self.caches.append(MimeCache(path))
+            except (EnvironmentError, ValueError):
+                continue
+        self.memo = _cacheutils.LRUCache(memo_size)
+
+    def is_stale(self):
+        """
+        Return `True` if one of the cache files has changed since they were
+        opened, otherwise `False`.
+        """
+        return _cacheutils.get_mtimes(self.mtimes) != self.mtimes
+
+    def close(self):
+        """
+        Close all caches.
+        """
+        for cache in self.caches:
+            cache.close()
+        self.caches = []
+
+    def get_type(self, path):
+        """
+        Return the MIME-type of the file at `path` as a string in the form
+        `media/subtype`. The checking order recommended by XDG is used (like
+        PyXDG's `get_type2()` does): The file name is checked first and the
+        file's contents are only read, if the name is unknown or ambiguous.
+        If that fails, `application/x-executable` is returned for executable
+        files and `text/plain` or `application/octet-stream` for others.
+
+        Return `None` if no `mime.cache` is available.
+        """
+        if not self.caches:
+            return None
+        try:
+            path_stat = os.stat(path)
+        except OSError:
+            return self.get_type_by_name(path) or OCTET_STREAM
+        key = (path, path_stat.st_mtime, path_stat.st_size)
+        mimetype = self.memo.get(key)
+        if mimetype is None:
+            mimetype = self._detect(path, path_stat)
+            self.memo.put(key, mimetype)
+        return mimetype
+
+    def get_type_by_name(self, path):
+        """
+        Return the MIME-type for the file name of `path` or `None` if the
+        name is unknown.
+        """
+        candidates = self.get_name_candidates(path)
+        return candidates[0] if candidates else None
+
+    def get_name_candidates(self, path):
+        """
+        Return a list of the MIME-types, which are associated with the file
+        name of `path` by the highest weight. Literal patterns win over
+        suffix patterns, which in turn win over the remaining globs.
+        """
+        name = convert(os.path.basename(path), str)
+        for method in ('match_literal', 'match_suffix', 'match_glob'):
+            matches = []
+            for cache in self.caches:
+                matches.extend(getattr(cache, method)(name))
+            if matches:
+                best = max(weight for weight, mimetype in matches)
+                candidates = []
+                for weight, mimetype in matches:
+                    if weight == best and mimetype not in candidates:
+                        candidates.append(mimetype)
+                return candidates
+        return []
+
+    def get_type_by_data(self, data, possible=None):
+        """
+        Return the MIME-type for `data` according to the magic rules or
+        `None` if no rule matches. See `MimeCache.match_magic()` for the
+        meaning of `possible`.
+        """
+        matches = [cache.match_magic(data, possible) for cache in self.caches]
+        matches = [match for match in matches if match is not None]
+        if not matches:
+            return None
+        return max(matches, key=lambda match: match[0])[1]
+
+    def _detect(self, path, path_stat):
+        """
+        Detect the MIME-type of the file at `path` without memoization.
+        """
+        mode = path_stat.st_mode
+        if not stat.S_ISREG(mode):
+            for check, mimetype in STAT_TYPES:
+                if check(mode):
+                    return mimetype
+            return 'inode/door'
+        candidates = self.get_name_candidates(path)
+        if len(candidates) == 1:
+            return candidates[0]
+        extent = max(cache.get_max_extent() for cache in self.caches)
+        try:
+            with open(path, 'rb') as data_file:
+                data = data_file.read(max(extent, TEXT_CHECK_SIZE))
+        except EnvironmentError:
+            data = b''
+        mimetype = self.get_type_by_data(data, candidates or None)
+        if mimetype is not None:
+            return mimetype
+        if candidates:
+            return candidates[0]
+        if stat.S_IMODE(mode) & 0o111:
+            return 'application/x-executable'
+        if is_text(data[:TEXT_CHECK_SIZE]):
+            return 'text/plain'
+        return OCTET_STREAM
+
+def _match_masked(chunk, value, mask):
+    """
+    Return `True` if `chunk` equals `value` at all bits set in `mask`.
+    """
+    if len(chunk) != len(value):
+        return False
+    return all((byte & mask_byte) == (value_byte & mask_byte)
+               for byte, value_byte, mask_byte
+               in zip(bytearray(chunk), bytearray(value), bytearray(mask)))
+
+def is_text(data):
+    """
+    Guess whether `data` is text by checking for ASCII control characters.
+    """
+    return not any(byte <= 0x08 or 0x0e <= byte < 0x20 or byte == 0x7f
+                   for byte in bytearray(data))
+
+_database = None
+_database_lock = threading.Lock()
+
+def get_database():
+    """
+    Return the shared `MimeDatabase`. It is created on first use and opened
+    again when one of its cache files has changed.
+    """
+    global _database
+    with _database_lock:
+        if _database is None or _database.is_stale():
+            if _database is not None:
+                _database.close()
+            _database = MimeDatabase()
+        return _database
+
+def get_type(path):
+    """
+    Return the MIME-type of the file at `path` by use of the shared database.
+    See `MimeDatabase.get_type()` for details.
+    """
+    return get_database().get_type(path)
@@ -2,18 +2,26 @@
 Configuration stuff.
 """
 # Stdlib
+import errno
 import os
-# 3rd party
-from xdg.BaseDirectory import xdg_config_home
+import stat
+import tempfile
 # Launchit package
 from . import logger
 
 # Default configuration
 config = {
+    'cache-method': 'memory',
+    'completion-delay': '30',
     'encoding': 'utf-8',
+    'icon-backend': 'menu',
+    'icon-delay': '50',
     'icon-theme': 'hicolor',
     'menu-dir': '/etc/xdg/menus',
+    'open-method': 'starter',
+    'poll-interval': '2',
     'starter' : 'xdg-open',
+    'watch-method': 'inotify',
 }
 
 CONFIG_FILENAME = 'launchit.conf'
@@ -60,8 +68,57 @@ def get_config_path(filename=None):
         filename = CONFIG_FILENAME
     if os.path.dirname(filename):
         raise ValueError('filename may not contain any path separator')
+    # Imported here, so that importing this module does not need PyXDG
+    from xdg.BaseDirectory import xdg_config_home
     return os.path.join(xdg_config_home, filename)
 
+def get_cache_path(filename):
+    """
+    Return a XDG-compliant path for a cache file named `filename`. Note that
+    the directory, which would contain that file, may not exist yet.
+    """
+    if os.path.dirname(filename):
+        raise ValueError('filename may not contain any path separator')
+    from xdg.BaseDirectory import xdg_cache_home
+    return os.path.join(xdg_cache_home, 'launchit', filename)
+
+def get_socket_path():
+    """
+    Return the path of the Unix domain socket, on which a running launchit 
+    daemon listens. The user's runtime directory is preferred. If that is 
+    not defined, a per-user directory inside the temporary directory is 
+    used (see `make_private_dir()`). Raise `OSError` if that directory is
+    not safe to use.
+    """
+    runtime_dir = os.getenv('XDG_RUNTIME_DIR')
+    if not runtime_dir:
+        dirname = 'launchit-{0}'.format(os.getuid())
+        runtime_dir = make_private_dir(
+            os.path.join(tempfile.gettempdir(), dirname))
+    return os.path.join(runtime_dir, 'launchit.sock')
+
+def make_private_dir(path):
+    """
+    Create the directory `path`, which only the current user may access,
+    and return `path`. If the directory exists already, then it is checked 
+    instead. Since the parent directory may be writable by anyone, another 
+    user could have created it (or a symlink) before. `OSError` is raised 
+    in that case, i.e. if `path` is not a directory owned by the current 
+    user or if it is accessible by other users.
+    """
+    try:
+        os.mkdir(path, 0o700)
+    except OSError as error:
+        if error.errno != errno.EEXIST:
+            raise
+    path_stat = os.lstat(path)
+    if (not stat.S_ISDIR(path_stat.st_mode) or 
+            path_stat.st_uid != os.getuid() or 
+            path_stat.st_mode & 0o077):
+        msg = '{0!r} is not a private directory of the current user'
+        raise OSError(errno.EPERM, msg.format(path))
+    return path
+
 def get_config_entries(path):
     """
     Read a configuration file from the given path and return a dictionary, 
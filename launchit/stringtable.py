@@ -0,0 +1,433 @@
+"""
+A compact, read-only table of strings, which is stored inside a file and
+accessed through `mmap`.
+
+This is used for the command names and for the icon cache, when the
+configuration dictionary's value for `cache-method` is "mmap". Since the
+table is not copied into Python objects, the pages of a table file are
+shared by all processes using it. Keys are kept sorted, so that a key is
+found by a binary search and keys with a given prefix or substring can be
+yielded in sorted order.
+
+The file starts with a header (see `HEADER`), which is followed by a meta
+data blob, by the keys and by the values. Each key and value is prefixed by
+its length. The index contains an offset pair (key, value) for each entry.
+All numbers are unsigned 32-bit integers in big-endian byte order. Keys and
+values are byte strings. See `encode()` and `decode()` for native strings.
+"""
+# Stdlib
+import heapq
+import mmap
+import os
+import struct
+
+# Launchit package
+from ._stringutils import ENCODING, on_py3k
+
+MAGIC = b'LTAB'
+
+# Increase this when the format changes
+VERSION = 1
+
+# Magic, version, number of entries, meta data offset, meta data size,
+# index offset, keys offset and keys size
+HEADER = struct.Struct('>4s7I')
+
+UINT32 = struct.Struct('>I')
+OFFSETS = struct.Struct('>2I')
+
+# Number of keys to walk over before a binary search is used to find a match
+MAX_SKIPPED_KEYS = 16
+
+def encode(string):
+    """
+    Return the byte string, which is stored for the native string `string`.
+    Undecodable file names are preserved on Python 3.
+    """
+    if isinstance(string, bytes):
+        return string
+    if on_py3k:
+        return string.encode(ENCODING, 'surrogateescape')
+    return string.encode(ENCODING)
+
+def decode(data):
+    """
+    Return the native string for the byte string `data` as stored by
+    `encode()`.
+    """
+    if on_py3k:
+        return data.decode(ENCODING, 'surrogateescape')
+    return data
+
+def write_table(path, items, meta=b''):
+    """
+    Write a table to the file at `path`. `items` must be an iterable of
+    `(key, value)`-tuples of byte strings. If a key occurs more than once,
+    then its last value is used (like it is done by `dict()`). `meta` is
+    stored as is and may be used by the caller to check whether the table
+    is up to date.
+    """
+    entries = {}
+    for key, value in items:
+        entries[key] = value
+    keys = sorted(entries)
+    meta_offset = HEADER.size
+    keys_offset = meta_offset + len(meta)
+    key_offsets = []
+    position = keys_offset
+    for key in keys:
+        key_offsets.append(position)
+        position += UINT32.size + len(key)
+    value_offsets = []
+    for key in keys:
+        value_offsets.append(position)
+        position += UINT32.size + len(entries[key])
+    index_offset = position
+    with open(path, 'wb') as table_file:
+        table_file.write(HEADER.pack(
+            MAGIC, VERSION, len(keys), meta_offset, len(meta), index_offset,
+            keys_offset, value_offsets[0] - keys_offset if keys else 0))
+        table_file.write(meta)
+        for key in keys:
+            table_file.write(UINT32.pack(len(key)) + key)
+        for key in keys:
+            value = entries[key]
+            table_file.write(UINT32.pack(len(value)) + value)
+        for offsets in zip(key_offsets, value_offsets):
+            table_file.write(OFFSETS.pack(*offsets))
+
+class StringTable(object):
+    """
+    Read-only access to a table written by `write_table()`.
+    """
+    def __init__(self, path):
+        """
+        Map the file at `path` into memory. Raise `EnvironmentError` if the
+        file cannot be read and `ValueError` if its format is unsupported.
+        """
+        self.path = path
+        with open(path, 'rb') as table_file:
+            if os.fstat(table_file.fileno()).st_size < HEADER.size:
+                raise ValueError('Not a string table: {0!r}'.format(path))
+            self._buffer = mmap.mmap(table_file.fileno(), 0,
+                                     access=mmap.ACCESS_READ)
+        (magic, version, self._count, self._meta_offset, self._meta_size,
+         self._index_offset, self._keys_offset,
+         self._keys_size) = HEADER.unpack_from(self._buffer)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError('Unsupported format: {0!r}'.format(path))
+
+    def close(self):
+        """
+        Unmap the file.
+        """
+        self._buffer.close()
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        """
+        Iterate over the keys in sorted order.
+        """
+        # Keys are stored in order, so the index is not needed here
+        position = self._keys_offset
+        for _ in range(self._count):
+            start = position + UINT32.size
+            position = start + self._get_uint(position)
+            yield self._buffer[start:position]
+
+    def __contains__(self, key):
+        return self.find(key) is not None
+
+    def get_meta(self):
+        """
+        Return the meta data, which was given to `write_table()`.
+        """
+        start = self._meta_offset
+        return self._buffer[start:start + self._meta_size]
+
+    def get_key(self, index):
+        """
+        Return the key of the entry at `index`.
+        """
+        return self._get_string(self._get_offsets(index)[0])
+
+    def get_value(self, index):
+        """
+        Return the value of the entry at `index`.
+        """
+        return self._get_string(self._get_offsets(index)[1])
+
+    def get(self, key, default=None):
+        """
+        Return the value for `key` or `default` if there is no such key.
+        """
+        index = self.find(key)
+        if index is None:
+            return default
+        return self.get_value(index)
+
+    def items(self):
+        """
+        Return an iterator over the `(key, value)`-tuples in sorted order.
+        """
+        return ((self.get_key(index), self.get_value(index))
+                for index in range(self._count))
+
+    def find(self, key):
+        """
+        Return the index of the entry for `key` or `None` if there is no
+        such entry.
+        """
+        index = self._bisect(key)
+        if index < self._count and self.get_key(index) == key:
+            return index
+        return None
+
+    def iter_prefixed(self, prefix):
+        """
+        Yield the keys starting with `prefix` in sorted order.
+        """
+        for index in range(self._bisect(prefix), self._count):
+            key = self.get_key(index)
+            if not key.startswith(prefix):
+                break
+            yield key
+
+    def iter_matches(self, fragment):
+        """
+        Yield the keys containing `fragment` in sorted order. This scans
+        the keys without copying them, so only matching keys are created
+        as Python objects.
+        """
+        if not fragment:
+            for key in self:
+                yield key
+            return
+        start = self._keys_offset
+        end = start + self._keys_size
+        key_offset = start
+        while True:
+            position = self._buffer.find(fragment, start, end)
+            if position < 0:
+                return
+            key_offset = self._skip_keys(key_offset, position)
+            key_start = key_offset + UINT32.size
+            key_end = key_start + self._get_uint(key_offset)
+            if key_start <= position and position + len(fragment) <= key_end:
+                yield self._buffer[key_start:key_end]
+                start = key_offset = key_end
+            else:
+                # The match overlaps a length prefix
+                start = position + 1
+
+    def _bisect(self, key):
+        """
+        Return the index of the first entry, whose key is not less than
+        `key`.
+        """
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self.get_key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _skip_keys(self, offset, position):
+        """
+        Return the offset of the key, which (including its length
+        prefix) contains the byte at `position`, by walking forward from
+        the key at `offset`. Keys further away are located by a binary
+        search instead.
+        """
+        for _ in range(MAX_SKIPPED_KEYS):
+            next_offset = offset + UINT32.size + self._get_uint(offset)
+            if next_offset > position:
+                return offset
+            offset = next_offset
+        return self._get_offsets(self._locate_key(position))[0]
+
+    def _locate_key(self, position):
+        """
+        Return the index of the entry, whose key (including its length
+        prefix) contains the byte at `position`.
+        """
+        low, high = 0, self._count - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self._get_offsets(middle)[0] <= position:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def _get_offsets(self, index):
+        """
+        Return the offsets of the key and of the value at `index`.
+        """
+        position = self._index_offset + OFFSETS.size * index
+        return OFFSETS.unpack_from(self._buffer, position)
+
+    def _get_string(self, offset):
+        """
+        Return the length-prefixed string at `offset`.
+        """
+        start = offset + UINT32.size
+        return self._buffer[start:start + self._get_uint(offset)]
+
+    def _get_uint(self, offset):
+        """
+        Return the unsigned 32-bit integer at `offset`.
+        """
+        return UINT32.unpack_from(self._buffer, offset)[0]
+
+class TableSet(object):
+    """
+    A set-like view on the keys of a `StringTable`. Keys are returned as
+    `string_type`, which may be the native or the alternate string type.
+    """
+    def __init__(self, table, string_type=str):
+        self.table = table
+        self.string_type = string_type
+
+    def __len__(self):
+        return len(self.table)
+
+    def __iter__(self):
+        return (self._convert(key) for key in self.table)
+
+    def __contains__(self, name):
+        return encode(name) in self.table
+
+    def iter_matches(self, fragment):
+        """
+        Yield the names containing `fragment` in sorted order.
+        """
+        for key in self.table.iter_matches(encode(fragment)):
+            yield self._convert(key)
+
+    def _convert(self, key):
+        if isinstance(key, self.string_type):
+            return key
+        name = decode(key)
+        if isinstance(name, self.string_type):
+            return name
+        # Unicode on Python 2
+        return name.decode(ENCODING)
+
+class UnionSet(object):
+    """
+    A set-like union of other set-like objects (e.g. `TableSet`s), which
+    is computed while iterating instead of being copied into memory. Names
+    are yielded in the sorted order of their encoded keys, so the sorted
+    tables can be merged and duplicates are skipped as they come in.
+    """
+    def __init__(self, sets):
+        self.sets = list(sets)
+        self._length = None
+
+    def __len__(self):
+        if self._length is None:
+            self._length = sum(1 for name in self)
+        return self._length
+
+    def __iter__(self):
+        return self.iter_matches('')
+
+    def __contains__(self, name):
+        return any(name in names for names in self.sets)
+
+    def iter_matches(self, fragment):
+        """
+        Yield the names containing `fragment`. Sets, which are not
+        `TableSet`s, are filtered and sorted.
+        """
+        iterators = [self._iter_sorted(names, fragment)
+                     for names in self.sets]
+        last_key = None
+        for key, name in heapq.merge(*iterators):
+            if key != last_key:
+                yield name
+                last_key = key
+
+    def _iter_sorted(self, names, fragment):
+        """
+        Return an iterator over `(key, name)`-tuples for the names of the
+        set `names`, which contain `fragment`, in sorted order.
+        """
+        if isinstance(names, TableSet):
+            keys = names.table.iter_matches(encode(fragment))
+            return ((key, names._convert(key)) for key in keys)
+        matches = (name for name in names if fragment in name)
+        return iter(sorted((encode(name), name) for name in matches))
+
+class TableMapping(object):
+    """
+    A mapping of native strings, which reads from a `StringTable` and keeps
+    changes in memory. This is meant to apply a few updates (e.g. reported
+    by a file watcher) to a table until it is written again.
+    """
+    def __init__(self, table=None):
+        self.table = table
+        # Maps changed keys to their values or to `None` if removed
+        self._changes = {}
+
+    def __len__(self):
+        count = len(self.table) if self.table is not None else 0
+        for key, value in self._changes.items():
+            in_table = self.table is not None and encode(key) in self.table
+            count += (value is not None) - in_table
+        return count
+
+    def __bool__(self):
+        return len(self) > 0
+
+    __nonzero__ = __bool__
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._changes[key] = value
+
+    def get(self, key, default=None):
+        """
+        Return the value for `key` or `default` if there is no such key.
+        """
+        if key in self._changes:
+            value = self._changes[key]
+        elif self.table is not None:
+            value = self.table.get(encode(key))
+            value = decode(value) if value is not None else None
+        else:
+            value = None
+        return default if value is None else value
+
+    def pop(self, key, default=None):
+        """
+        Remove `key` and return its value. Return `default` if there is no
+        such key.
+        """
+        value = self.get(key)
+        if value is None:
+            return default
+        self._changes[key] = None
+        return value
+
+    def clear(self):
+        """
+        Remove all keys. Note that the table is not closed, since it might
+        still be read by another thread. It is unmapped when unused.
+        """
+        self.table = None
+        self._changes.clear()
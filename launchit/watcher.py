@@ -0,0 +1,418 @@
+"""
+Watch directories for added and removed files in order to keep launchit's
+caches up to date without rebuilding them.
+
+On Linux, the kernel's inotify interface is used (accessed via `ctypes`).
+Directories, which cannot be watched that way, are polled instead.
+"""
+# Stdlib
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import threading
+
+# Launchit package
+from . import core, icongetter, logger, settings
+from ._stringutils import altstring, convert
+
+# Event masks taken from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+ADDED_MASK = IN_CREATE | IN_MOVED_TO | IN_CLOSE_WRITE
+REMOVED_MASK = IN_DELETE | IN_MOVED_FROM
+GONE_MASK = IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED
+WATCH_MASK = ADDED_MASK | REMOVED_MASK | IN_DELETE_SELF | IN_MOVE_SELF
+
+# Layout of `struct inotify_event` (without the trailing name)
+EVENT_HEADER = struct.Struct('iIII')
+
+class InotifyError(EnvironmentError):
+    """
+    Used to indicate that inotify is not available or could not be used
+    for a given directory.
+    """
+    pass
+
+def _load_libc():
+    """
+    Return the C library as a `ctypes.CDLL` object. Raise `InotifyError`
+    if it does not provide the inotify functions.
+    """
+    name = ctypes.util.find_library('c')
+    try:
+        libc = ctypes.CDLL(name, use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        raise InotifyError('inotify is not supported on this system')
+    return libc
+
+def _to_bytes(path):
+    """
+    Return `path` as a byte string, which is suitable for passing to C.
+    """
+    return path if isinstance(path, bytes) else convert(path, altstring)
+
+class InotifyBackend(object):
+    """
+    Report changes inside watched directories by use of inotify.
+    """
+    def __init__(self):
+        self._libc = _load_libc()
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise InotifyError(ctypes.get_errno(), 'inotify_init1() failed')
+        # Maps each watch descriptor to a list of dirnames, since aliases of
+        # a directory (e.g. symlinks like /bin -> /usr/bin) share the same
+        # watch descriptor
+        self._dirnames = {}
+
+    def fileno(self):
+        """
+        Return the file descriptor, which becomes readable when events are
+        pending.
+        """
+        return self._fd
+
+    def watch(self, dirname):
+        """
+        Start watching `dirname`. Raise `InotifyError` on failure.
+        """
+        wd = self._libc.inotify_add_watch(self._fd, _to_bytes(dirname),
+                                          WATCH_MASK | IN_ONLYDIR)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise InotifyError(error, os.strerror(error), dirname)
+        dirnames = self._dirnames.setdefault(wd, [])
+        if dirname not in dirnames:
+            dirnames.append(dirname)
+
+    def read_events(self):
+        """
+        Return a list of `(dirname, name, added)`-tuples for all pending
+        events without blocking. `name` is `None` if the whole directory
+        must be considered as changed.
+        """
+        try:
+            data = os.read(self._fd, 65536)
+        except OSError as error:
+            if error.errno == errno.EAGAIN:
+                return []
+            raise
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                events.extend((dirname, None, False)
+                              for dirnames in self._dirnames.values()
+                              for dirname in dirnames)
+                continue
+            dirnames = self._dirnames.get(wd)
+            if dirnames is None:
+                continue
+            if mask & GONE_MASK:
+                del self._dirnames[wd]
+                events.extend((dirname, None, False) for dirname in dirnames)
+            elif name:
+                added = bool(mask & ADDED_MASK)
+                events.extend((dirname, convert(name, type(dirname)), added)
+                              for dirname in dirnames)
+        return events
+
+    def close(self):
+        """
+        Stop watching and release the inotify file descriptor.
+        """
+        os.close(self._fd)
+        self._dirnames.clear()
+
+class PollingBackend(object):
+    """
+    Report changes inside watched directories by comparing their listings.
+    A directory is only listed again if its modification time has changed.
+
+    Note that unlike `InotifyBackend`, this does not notice files, whose
+    contents were changed in place.
+    """
+    def __init__(self):
+        self._listings = {}
+
+    def watch(self, dirname):
+        """
+        Start watching `dirname`.
+        """
+        self._listings[dirname] = self._get_listing(dirname)
+
+    def read_events(self):
+        """
+        Return a list of `(dirname, name, added)`-tuples, which describe the
+        changes since the last call.
+        """
+        events = []
+        for dirname, (key, names) in list(self._listings.items()):
+            if core.get_dir_signature(dirname) == key:
+                continue
+            listing = self._get_listing(dirname)
+            new_names = listing[1]
+            events.extend((dirname, name, True) for name in new_names - names)
+            events.extend((dirname, name, False) for name in names - new_names)
+            self._listings[dirname] = listing
+        return events
+
+    def close(self):
+        """
+        Stop watching.
+        """
+        self._listings.clear()
+
+    def _get_listing(self, dirname):
+        """
+        Return the signature and the names of `dirname` as a tuple.
+        """
+        try:
+            names = set(os.listdir(dirname))
+        except OSError:
+            names = set()
+        return (core.get_dir_signature(dirname), names)
+
+def _get_existing_parent(path):
+    """
+    Return the nearest parent of `path`, which is an existing directory.
+    """
+    path = os.path.abspath(path)
+    while not os.path.isdir(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+class Watcher(object):
+    """
+    Watch directories and pass each change to a handler.
+
+    Handlers are called with the arguments `dirname`, `name` and `added`.
+    `name` refers to the file inside `dirname`, which was created, modified
+    or moved into the directory (`added` is `True`), or which was deleted or
+    moved away (`added` is `False`). If `name` is `None`, then the changes
+    are unknown and the whole directory should be re-read by the handler.
+    """
+    def __init__(self, use_inotify=True, interval=2.0):
+        """
+        Setup the watcher. If `use_inotify` is `True`, then an attempt is
+        made to use inotify. Otherwise, or if that failed, all directories
+        are polled every `interval` seconds.
+        """
+        self.interval = interval
+        self._handlers = {}
+        self._inotify = None
+        if use_inotify:
+            try:
+                self._inotify = InotifyBackend()
+            except InotifyError as error:
+                logger.warning('Falling back to polling: {0}'.format(error))
+        self._polling = PollingBackend()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def watch(self, dirname, handler):
+        """
+        Start watching `dirname` and pass its changes to `handler`. Return
+        `True` if the directory is watched by inotify, otherwise `False`.
+        Non-existing directories are ignored. A directory may be watched 
+        for more than one handler.
+        """
+        if not os.path.isdir(dirname):
+            return False
+        handlers = self._handlers.setdefault(dirname, [])
+        if handler not in handlers:
+            handlers.append(handler)
+        if self._inotify is not None:
+            try:
+                self._inotify.watch(dirname)
+                return True
+            except InotifyError as error:
+                logger.warning('Polling {0!r}: {1}'.format(dirname, error))
+        self._polling.watch(dirname)
+        return False
+
+    def watch_tree(self, dirname, handler):
+        """
+        Start watching `dirname` and its subdirectories and pass their 
+        changes to `handler`. Subdirectories, which are created later, are 
+        watched, too. If `dirname` does not exist, then its nearest existing 
+        parent is watched until `dirname` is created. `handler` is called 
+        with `name` being `None` for each directory, which appears that way,
+        since it may have contents already.
+        """
+        def watch_existing(path):
+            # Symlinks are not followed, just like `os.walk()` does
+            for subdir, dirnames, filenames in os.walk(path):
+                self.watch(subdir, handle_change)
+
+        def handle_change(subdir, name, added):
+            if name is not None and added:
+                path = os.path.join(subdir, name)
+                if os.path.isdir(path) and not os.path.islink(path):
+                    watch_existing(path)
+                    handler(path, None, True)
+                    return
+            handler(subdir, name, added)
+
+        # Set when `dirname` has appeared (a list, since Python 2 does not 
+        # allow to rebind names of the enclosing function)
+        appeared = []
+        target = os.path.abspath(dirname)
+
+        def handle_parent_change(parent, name, added):
+            if appeared:
+                return
+            if name is not None:
+                path = os.path.join(parent, name)
+                if not (target == path or 
+                        target.startswith(os.path.join(path, ''))):
+                    # Not on the way to `dirname`
+                    return
+            if os.path.isdir(dirname):
+                appeared.append(True)
+                watch_existing(dirname)
+                handler(dirname, None, True)
+            else:
+                # Some of the missing directories may have been created
+                self.watch(_get_existing_parent(dirname), 
+                           handle_parent_change)
+
+        if os.path.isdir(dirname):
+            watch_existing(dirname)
+        else:
+            self.watch(_get_existing_parent(dirname), handle_parent_change)
+
+    def process_events(self):
+        """
+        Pass all pending events to their handlers without blocking.
+        """
+        events = self._polling.read_events()
+        if self._inotify is not None:
+            events.extend(self._inotify.read_events())
+        for dirname, name, added in events:
+            # Handlers may add further handlers for the same directory
+            for handler in list(self._handlers.get(dirname, [])):
+                handler(dirname, name, added)
+
+    def start(self):
+        """
+        Process events inside a background thread until `stop()` is called.
+        """
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the background thread (if any) and release all resources.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._inotify is not None:
+            self._inotify.close()
+        self._polling.close()
+
+    def _run(self):
+        """
+        Wait for events and process them until the watcher is stopped.
+        """
+        fds = [] if self._inotify is None else [self._inotify.fileno()]
+        while not self._stopped.is_set():
+            if fds:
+                select.select(fds, [], [], self.interval)
+            else:
+                self._stopped.wait(self.interval)
+            if not self._stopped.is_set():
+                self.process_events()
+
+def watch_caches(index=None, method=None):
+    """
+    Create a `Watcher`, which keeps `index` and `icongetter.icon_cache` up
+    to date, and start it. Return the watcher.
+
+    `index` is expected to be a `core.CommandIndex`-like object. If this is
+    `None`, then `core.command_index` is used. `method` may be "inotify" or
+    "polling". If it is `None`, then the configuration dictionary's value
+    for `watch-method` is used instead. The polling interval is taken from
+    its value for `poll-interval`.
+
+    The application directories and the menu directory are watched including
+    their subdirectories, even if they do not exist yet (see `watch_tree()`
+    of `Watcher`).
+
+    Note that PATH directories are only marked as watched inside `index` 
+    and `core.command_resolver`, if inotify is used for them. Otherwise
+    those caches keep on checking the directories by themselves, which is
+    what polling would do anyway.
+    """
+    if index is None:
+        index = core.command_index
+    if method is None:
+        method = settings.config['watch-method']
+    interval = float(settings.config['poll-interval'])
+    watcher = Watcher(method == 'inotify', interval)
+
+    def update_index(dirname, name, added):
+        core.command_resolver.invalidate()
+        if name is None:
+            index.invalidate(dirname)
+            index.set_watched(dirname, False)
+            core.command_resolver.set_watched(dirname, False)
+        elif added:
+            index.add_name(dirname, name)
+        else:
+            index.remove_name(dirname, name)
+
+    def update_desktop_files(dirname, name, added):
+        if name is None:
+            icongetter.invalidate_icon_cache()
+        elif name.endswith('.desktop'):
+            path = os.path.join(dirname, name)
+            if added:
+                icongetter.add_desktop_file(path)
+            else:
+                icongetter.remove_desktop_file(path)
+
+    def update_menus(dirname, name, added):
+        if name is None or name.endswith('.menu'):
+            icongetter.invalidate_icon_cache()
+
+    for dirname in core.get_path_dirs():
+        if watcher.watch(dirname, update_index):
+            # Changes made before watching started would be missed otherwise
+            index.invalidate(dirname)
+            index.set_watched(dirname)
+            core.command_resolver.set_watched(dirname)
+    for dirname in icongetter.get_application_dirs():
+        watcher.watch_tree(dirname, update_desktop_files)
+    watcher.watch_tree(settings.config['menu-dir'], update_menus)
+    watcher.start()
+    return watcher
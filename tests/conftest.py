@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+from launchit import settings
+
+@pytest.fixture
+def config(monkeypatch):
+    """
+    Return a copy of the configuration dictionary, which may be changed by
+    a test. The original dictionary is restored afterwards.
+    """
+    monkeypatch.setattr(settings, 'config', dict(settings.config))
+    return settings.config
+
+@pytest.fixture
+def cache_dir(tmpdir, monkeypatch):
+    """
+    Make the cache files go into a temporary directory and return it.
+    """
+    cache_dir = tmpdir.mkdir('cache')
+    monkeypatch.setattr(settings, 'get_cache_path',
+                        lambda filename: str(cache_dir.join(filename)))
+    return cache_dir
+
+@pytest.fixture(scope='session')
+def app():
+    """
+    Return the `QApplication`, which is shared by all GUI tests. No display
+    is needed for that.
+    """
+    QtGui = pytest.importorskip('PySide.QtGui')
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    return QtGui.QApplication.instance() or QtGui.QApplication([])
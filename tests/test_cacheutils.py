@@ -0,0 +1,76 @@
+import pytest
+
+from launchit import _cacheutils
+
+def test_get_mtimes(tmpdir):
+    path = tmpdir.join('file')
+    path.write('')
+    missing = str(tmpdir.join('missing'))
+    mtimes = _cacheutils.get_mtimes([str(path), missing])
+    assert mtimes == {str(path): path.mtime(), missing: None}
+
+def test_cache_roundtrip(cache_dir, tmpdir):
+    source = tmpdir.join('source')
+    source.write('')
+    mtimes = _cacheutils.get_mtimes([str(source)])
+    assert _cacheutils.save_cache('test.json', {'a': [1, 2]}, mtimes, ['k'])
+    assert _cacheutils.load_cache('test.json', ['k']) == {'a': [1, 2]}
+    assert _cacheutils.load_cache_entry('test.json', ['k']) == (
+        {'a': [1, 2]}, mtimes)
+    # Another key
+    assert _cacheutils.load_cache('test.json', ['other']) is None
+    # A changed source
+    source.setmtime(source.mtime() + 10)
+    assert _cacheutils.load_cache('test.json', ['k']) is None
+
+def test_missing_or_broken_cache(cache_dir):
+    assert _cacheutils.load_cache('missing.json') is None
+    cache_dir.join('broken.json').write('{')
+    assert _cacheutils.load_cache('broken.json') is None
+
+def test_table_roundtrip(cache_dir):
+    items = [(b'gedit', b'text-editor')]
+    assert _cacheutils.save_table('test.table', items, {}, ['k'])
+    table = _cacheutils.load_table('test.table', ['k'])
+    assert table.get(b'gedit') == b'text-editor'
+    table.close()
+    assert _cacheutils.load_table('test.table', ['other']) is None
+
+def test_replace_file(tmpdir):
+    path = tmpdir.join('new-dir', 'file')
+    def write(path):
+        with open(path, 'w') as new_file:
+            new_file.write('data')
+    assert _cacheutils.replace_file(str(path), write)
+    assert path.read() == 'data'
+
+def test_replace_file_failure(tmpdir):
+    cache_dir = tmpdir.mkdir('cache')
+    def write(path):
+        raise IOError('disk full')
+    assert not _cacheutils.replace_file(str(cache_dir.join('file')), write)
+    # The temporary file is removed
+    assert cache_dir.listdir() == []
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = _cacheutils.LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert 'b' not in cache and 'a' in cache and 'c' in cache
+    assert len(cache) == 2
+    assert cache.get('b', 'missing') == 'missing'
+    assert cache.get_stats() == {'hits': 1, 'misses': 1, 'evictions': 1,
+                                 'size': 2, 'maxsize': 2}
+
+def test_lru_cache_update_and_clear():
+    cache = _cacheutils.LRUCache(2)
+    cache.put('a', 1)
+    cache.put('a', 2)
+    assert cache.get('a') == 2 and len(cache) == 1
+    cache.clear()
+    assert len(cache) == 0 and cache.get('a') is None
+    # Falsy values are stored like any other value
+    cache.put('b', None)
+    assert 'b' in cache
@@ -0,0 +1,84 @@
+import os
+import stat
+
+import pytest
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from launchit import cli, core
+
+@pytest.fixture
+def path_dir(tmpdir, monkeypatch):
+    """
+    Make `PATH` point to a directory with a few executables only. The
+    current directory, which is completed as well, is left empty.
+    """
+    path_dir = tmpdir.mkdir('bin')
+    for name in ('gedit', 'gimp', 'vim'):
+        path = path_dir.join(name)
+        path.write('')
+        path.chmod(stat.S_IRWXU)
+    monkeypatch.setenv('PATH', str(path_dir))
+    monkeypatch.chdir(tmpdir.mkdir('empty'))
+    monkeypatch.setattr(core, 'command_index', core.CommandIndex())
+    return path_dir
+
+def serve(requests, limit=None):
+    output = StringIO()
+    cli.serve(StringIO(''.join(line + '\n' for line in requests)),
+              output, limit)
+    return output.getvalue()
+
+def test_complete(path_dir):
+    assert serve(['complete g']) == 'gedit\ngimp\n\n'
+    assert serve(['complete g'], limit=1) == 'gedit\n\n'
+    assert serve(['complete x']) == '\n'
+
+def test_complete_path(path_dir):
+    fragment = os.path.join(str(path_dir), 'v')
+    assert serve(['complete ' + fragment]) == fragment + 'im\n\n'
+
+def test_empty_lines_are_skipped(path_dir):
+    assert serve(['', 'complete vi', '']) == 'vim\n\n'
+
+def test_unknown_request():
+    assert serve(['bogus']) == "error: Unknown request 'bogus'\n\n"
+
+def test_invalid_arguments_do_not_stop_the_server(path_dir):
+    response = serve(['launch "unterminated', 'complete vi'])
+    assert response == 'error: No closing quotation\n\nvim\n\n'
+
+def test_icon_request_with_invalid_command(path_dir):
+    pytest.importorskip('xdg')
+    response = serve(['icon "unterminated', 'complete vi'])
+    assert response == 'error: No closing quotation\n\nvim\n\n'
+
+def test_main(path_dir, capsys):
+    assert cli.main(['--complete', 'gi']) == 0
+    assert capsys.readouterr()[0] == 'gimp\n'
+    assert cli.main(['--launch', '"unterminated']) == 1
+
+def test_main_needs_a_mode():
+    with pytest.raises(SystemExit):
+        cli.main([])
+
+class FlushedOutput(StringIO):
+    """
+    Remember the contents, which were flushed the last time.
+    """
+    flushed = ''
+
+    def flush(self):
+        self.flushed = self.getvalue()
+
+def test_each_line_is_flushed():
+    output = FlushedOutput()
+    def iter_lines():
+        yield 'gedit'
+        assert output.flushed == 'gedit\n'
+        yield 'gimp'
+    cli.write_lines(iter_lines(), output)
+    assert output.flushed == 'gedit\ngimp\n'
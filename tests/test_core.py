@@ -0,0 +1,176 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from launchit import core
+from launchit._stringutils import altstring, convert
+
+@pytest.fixture(params=['memory', 'mmap'])
+def index(request, config, cache_dir):
+    config['cache-method'] = request.param
+    return core.CommandIndex()
+
+@pytest.fixture
+def bin_dir(tmpdir):
+    bin_dir = tmpdir.mkdir('bin')
+    for name in ('gedit', 'gimp'):
+        bin_dir.join(name).write('')
+    return bin_dir
+
+def touch(directory, name):
+    directory.join(name).write('')
+    # Make sure that the directory's signature changes
+    stat = os.stat(str(directory))
+    os.utime(str(directory), (stat.st_atime, stat.st_mtime + 10))
+
+def test_get_names(index, bin_dir, tmpdir):
+    other_dir = tmpdir.mkdir('other')
+    other_dir.join('gimp').write('')
+    other_dir.join('vim').write('')
+    missing = str(tmpdir.join('missing'))
+    names = index.get_names([str(bin_dir), str(other_dir), missing])
+    assert sorted(names) == ['gedit', 'gimp', 'vim']
+    assert 'vim' in names and len(names) == 3
+
+def test_changed_directory_is_listed_again(index, bin_dir):
+    index.get_names([str(bin_dir)])
+    generation = index.generation
+    touch(bin_dir, 'vim')
+    assert sorted(index.get_names([str(bin_dir)])) == ['gedit', 'gimp', 'vim']
+    assert index.generation > generation
+
+def test_watched_directory(index, bin_dir):
+    dirname = str(bin_dir)
+    index.get_names([dirname])
+    index.set_watched(dirname)
+    touch(bin_dir, 'vim')
+    bin_dir.join('gedit').remove()
+    # Not checked anymore, so the watcher must report the changes
+    assert sorted(index.get_names([dirname])) == ['gedit', 'gimp']
+    index.add_name(dirname, 'vim')
+    index.remove_name(dirname, 'gedit')
+    assert sorted(index.get_names([dirname])) == ['gimp', 'vim']
+    touch(bin_dir, 'emacs')
+    index.invalidate(dirname)
+    assert sorted(index.get_names([dirname])) == ['emacs', 'gimp', 'vim']
+
+def test_names_have_the_type_of_the_dirnames(index, bin_dir):
+    dirname = str(bin_dir)
+    alt_dirname = convert(dirname, altstring)
+    assert all(type(name) is str for name in index.get_names([dirname]))
+    alt_names = index.get_names([alt_dirname])
+    assert sorted(alt_names) == [convert(name, altstring)
+                                 for name in ('gedit', 'gimp')]
+    assert all(type(name) is altstring for name in alt_names)
+
+def test_watcher_updates_both_string_types(index, bin_dir):
+    dirname = str(bin_dir)
+    alt_dirname = convert(dirname, altstring)
+    index.get_names([dirname])
+    index.get_names([alt_dirname])
+    index.set_watched(dirname)
+    touch(bin_dir, 'vim')
+    index.add_name(dirname, 'vim')
+    assert 'vim' in index.get_names([dirname])
+    assert convert('vim', altstring) in index.get_names([alt_dirname])
+
+def test_best_completions(index, bin_dir, monkeypatch, tmpdir):
+    monkeypatch.setenv('PATH', str(bin_dir))
+    monkeypatch.chdir(tmpdir.mkdir('empty'))
+    assert core.get_best_completions('g', 1, index=index) == (['gedit'], 2)
+    assert core.get_name_completions('im', index) == ['gimp']
+    session = core.CompletionSession(index)
+    assert session.get_best_completions('g') == (['gedit', 'gimp'], 2)
+    assert session.get_best_completions('gi') == (['gimp'], 1)
+
+def test_select_best():
+    names = ['gimp', 'gedit', 'vim', 'ed']
+    assert core.select_best(names, 2) == (['ed', 'gedit'], 4)
+    assert core.select_best(names, None, len) == (
+        ['ed', 'vim', 'gimp', 'gedit'], 4)
+
+def test_resolver_checks_paths_on_each_call(bin_dir, monkeypatch, tmpdir):
+    monkeypatch.setenv('PATH', str(bin_dir))
+    monkeypatch.chdir(tmpdir)
+    resolver = core.CommandResolver()
+    build_dir = tmpdir.mkdir('build')
+    for name in (str(build_dir.join('app')), 'build/app'):
+        assert resolver.resolve(name) is None
+    build_dir.join('app').write('')
+    build_dir.join('app').chmod(0o700)
+    assert resolver.resolve(str(build_dir.join('app'))) is not None
+    assert resolver.resolve('build/app') is None
+    assert len(resolver._paths) == 0
+
+def test_resolver_is_bounded(bin_dir, monkeypatch):
+    monkeypatch.setenv('PATH', str(bin_dir))
+    bin_dir.join('gedit').chmod(0o700)
+    resolver = core.CommandResolver(maxsize=2)
+    names = ['gedit', 'missing1', 'missing2', 'gedit']
+    assert resolver.resolve_many(names) == [
+        str(bin_dir.join('gedit')), None, None, str(bin_dir.join('gedit'))]
+    assert len(resolver._paths) == 2
+
+def make_starter(tmpdir, exit_code):
+    starter = tmpdir.join('starter')
+    # Note that `PATH` does not contain `sleep` during the tests
+    starter.write('#!/bin/sh\n"{0}" -c "import time; time.sleep(0.5)"\n'
+                  'exit {1}\n'.format(sys.executable, exit_code))
+    starter.chmod(0o700)
+    return str(starter)
+
+@pytest.fixture
+def starter_env(tmpdir, monkeypatch, config):
+    config['open-method'] = 'starter'
+    monkeypatch.setenv('PATH', str(tmpdir.mkdir('empty-bin')))
+    monkeypatch.chdir(tmpdir)
+
+def test_launch_waits_for_the_starter(tmpdir, monkeypatch, starter_env):
+    monkeypatch.setattr(core, 'STARTER', make_starter(tmpdir, 1))
+    start = time.time()
+    with pytest.raises(core.LaunchError):
+        core.launch('missing.txt')
+    assert time.time() - start >= 0.5
+
+def test_launch_async_does_not_wait(tmpdir, monkeypatch, starter_env):
+    monkeypatch.setattr(core, 'STARTER', make_starter(tmpdir, 1))
+    errors = []
+    failed = threading.Event()
+    def on_error(error):
+        errors.append(error)
+        failed.set()
+    start = time.time()
+    core.launch_async('missing.txt', on_error=on_error,
+                      supervisor=core.ProcessSupervisor())
+    assert time.time() - start < 0.5
+    assert failed.wait(5)
+    assert isinstance(errors[0], core.LaunchError)
+
+def test_launch_async_resolves_in_background(monkeypatch, starter_env):
+    threads = []
+    def get_default_app_command(path):
+        threads.append(threading.current_thread())
+        return None
+    monkeypatch.setattr(core, 'get_default_app_command',
+                        get_default_app_command)
+    monkeypatch.setattr(core, 'STARTER', 'missing-starter')
+    errors = []
+    failed = threading.Event()
+    def on_error(error):
+        threads.append(threading.current_thread())
+        errors.append(error)
+        failed.set()
+    core.launch_async('missing.txt', on_error=on_error,
+                      supervisor=core.ProcessSupervisor())
+    assert failed.wait(5)
+    assert isinstance(errors[0], core.LaunchError)
+    assert threading.current_thread() not in threads
+
+def test_builtin_open_method_is_opt_in(tmpdir, config):
+    path = tmpdir.join('notes.txt')
+    path.write('')
+    assert config['open-method'] == 'starter'
+    assert core.get_default_app_command(str(path)) is None
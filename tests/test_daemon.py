@@ -0,0 +1,71 @@
+import os
+import socket
+import threading
+
+import pytest
+
+pytest.importorskip('xdg')
+pytest.importorskip('PySide')
+
+from launchit import gui
+
+@pytest.fixture(scope='module')
+def launcher(app):
+    launcher = gui.createLauncher()
+    yield launcher
+    # Usually done when the application quits
+    for caller in launcher.findChildren(gui.BackgroundCaller):
+        caller.stop()
+
+@pytest.fixture
+def server(launcher, tmpdir):
+    server = gui.LaunchServer(launcher, str(tmpdir.join('sock')))
+    yield server
+    server.close()
+
+def send_command(app, path, command):
+    """
+    Send `command` from another thread (while processing the events of the
+    server) and return the answer.
+    """
+    answers = []
+    def send():
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.settimeout(5)
+        try:
+            client.connect(path)
+            client.sendall(command + b'\n')
+            answers.append(client.recv(16))
+        finally:
+            client.close()
+    thread = threading.Thread(target=send)
+    thread.start()
+    while thread.is_alive():
+        app.processEvents()
+        thread.join(0.01)
+    return answers[0]
+
+def test_commands(app, server):
+    assert server.listen()
+    assert send_command(app, server.path, b'ping') == b'ok\n'
+    assert send_command(app, server.path, b'bogus') == b'error\n'
+    assert send_command(app, server.path, b'show') == b'ok\n'
+    assert server.launcher.isVisible()
+    server.hideLauncher()
+    assert not server.launcher.isVisible()
+
+def test_running_server_is_not_replaced(app, server, tmpdir):
+    assert server.listen()
+    other = gui.LaunchServer(server.launcher, server.path)
+    assert other.isRunning()
+    assert not other.listen()
+    assert send_command(app, server.path, b'ping') == b'ok\n'
+
+def test_stale_socket_is_replaced(app, server):
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(server.path)
+    stale.close()
+    assert os.path.exists(server.path)
+    assert not server.isRunning()
+    assert server.listen()
+    assert send_command(app, server.path, b'ping') == b'ok\n'
@@ -0,0 +1,179 @@
+import pytest
+
+pytest.importorskip('xdg')
+pytest.importorskip('PySide')
+
+from launchit import gui
+
+class CountingRenderer(gui.MarkedCompletionRenderer):
+    def __init__(self, *args, **kwargs):
+        gui.MarkedCompletionRenderer.__init__(self, *args, **kwargs)
+        self.calls = 0
+
+    def setHtml(self, html):
+        self.calls += 1
+        gui.MarkedCompletionRenderer.setHtml(self, html)
+
+def test_markup(app):
+    renderer = gui.MarkedCompletionRenderer('ed')
+    renderer.makeCompletionMarkup('gedit')
+    html = renderer.currentDocument().toHtml()
+    assert '<u>ed</u>' in html or 'text-decoration: underline' in html
+
+def test_cache_hit_needs_no_layout(app):
+    renderer = CountingRenderer('g')
+    size = renderer.makeCompletionMarkup('gedit')
+    document = renderer.currentDocument()
+    renderer.makeCompletionMarkup('gimp')
+    calls = renderer.calls
+    assert renderer.makeCompletionMarkup('gedit') == size
+    assert renderer.currentDocument() is document
+    assert renderer.calls == calls
+
+def test_elided_markup(app):
+    renderer = gui.MarkedCompletionRenderer('x')
+    text = 'x' * 200
+    full_size = renderer.makeCompletionMarkup(text)
+    size = renderer.makeCompletionMarkup(text, full_size.width() // 2)
+    assert size.width() <= full_size.width() // 2
+    assert renderer.currentDocument().toPlainText().endswith('...')
+
+def test_size_hint_is_painted_size(app):
+    delegate = gui.MarkedCompletionDelegate()
+    model = gui.QtGui.QStringListModel(['x' * 200])
+    index = model.index(0)
+    option = gui.QtGui.QStyleOptionViewItem()
+    full_size = delegate.sizeHint(option, index)
+    image = gui.QtGui.QImage(400, 50, gui.QtGui.QImage.Format_ARGB32)
+    painter = gui.QtGui.QPainter(image)
+    rect = gui.QtCore.QRect(0, 0, full_size.width() // 2, 50)
+    delegate.drawDisplay(painter, option, rect, index.data())
+    painter.end()
+    assert delegate.sizeHint(option, index).width() <= rect.width()
+
+NAMES = ['name{0:03d}'.format(number) for number in range(150)]
+
+def test_model_exposes_chunks(app):
+    model = gui.CompletionModel(chunkSize=64)
+    model.setCompletions(NAMES)
+    assert model.rowCount() == 64 and model.canFetchMore()
+    model.fetchMore()
+    assert model.rowCount() == 128
+    model.fetchMore()
+    assert model.rowCount() == 150 and not model.canFetchMore()
+    assert model.data(model.index(149)) == NAMES[149]
+
+def test_model_requests_more_at_the_end(app):
+    model = gui.CompletionModel(chunkSize=64)
+    requests = []
+    model.moreRequested.connect(lambda: requests.append(model.rowCount()))
+    model.setCompletions(NAMES[:64], len(NAMES))
+    assert model.canFetchMore()
+    model.fetchMore()
+    model.fetchMore()
+    # Only requested once until the sequence is extended
+    assert requests == [64]
+    model.extendCompletions(NAMES[:128], len(NAMES))
+    assert model.rowCount() == 128
+    model.fetchMore()
+    assert requests == [64, 128]
+
+def test_model_is_reset_by_new_completions(app):
+    model = gui.CompletionModel(chunkSize=64)
+    model.setCompletions(NAMES)
+    model.fetchMore()
+    model.setCompletions(NAMES[:10])
+    assert model.rowCount() == 10 and not model.canFetchMore()
+
+class RecordingCaller(object):
+    """
+    Replace the `BackgroundCaller` of `completer` by recording its requests
+    and delivering them synchronously on demand.
+    """
+    def __init__(self, completer):
+        completer.caller.stop()
+        completer.caller = self
+        self.completer = completer
+        self.requests = []
+
+    def request(self, argument):
+        self.requests.append(argument)
+
+    def deliver(self):
+        request = self.requests[-1]
+        result = self.completer._getCompletions(request)
+        self.completer._applyCompletions(request, result)
+
+def test_completer_requests_more(app):
+    def get_completions(fragment, limit):
+        names = [name for name in NAMES if fragment in name]
+        return (names[:limit], len(names))
+    completer = gui.CommandlineCompleter(get_completions, markFragment=False,
+                                         delay=0, chunked=True)
+    caller = RecordingCaller(completer)
+    model = completer.model()
+    completer.update('name')
+    caller.deliver()
+    assert model.rowCount() == 64
+    model.fetchMore()
+    assert caller.requests[-1] == ('name', 128, True)
+    caller.deliver()
+    assert model.rowCount() == 128
+    # Nothing more is requested for the old fragment
+    completer.update('name1')
+    model.fetchMore()
+    assert caller.requests[-1] == ('name1', 64, False)
+    caller.deliver()
+    assert model.rowCount() == 50 and not model.canFetchMore()
+
+@pytest.fixture
+def icon_caches(monkeypatch):
+    """
+    Give `gui.Icon` small, empty caches and make icons without looking into
+    the icon theme. Return the list of the names of the made icons.
+    """
+    monkeypatch.setattr(gui.Icon, '_iconCache', gui._cacheutils.LRUCache(2))
+    monkeypatch.setattr(gui.Icon, '_pixmapCache',
+                        gui._cacheutils.LRUCache(2))
+    made = []
+    def make_from_theme(cls, name, fallback):
+        made.append(name)
+        return cls(fallback)
+    monkeypatch.setattr(gui.Icon, '_makeFromTheme',
+                        classmethod(make_from_theme))
+    return made
+
+def make_pixmap(color):
+    pixmap = gui.QtGui.QPixmap(32, 32)
+    pixmap.fill(gui.QtGui.QColor(color))
+    return pixmap
+
+def test_icon_cache(app, icon_caches):
+    icon = gui.Icon.fromTheme('gedit')
+    assert gui.Icon.fromTheme('gedit') is icon
+    gui.Icon.fromTheme('gimp')
+    gui.Icon.fromTheme('vim')
+    assert icon_caches == ['gedit', 'gimp', 'vim']
+    # The least recently used icon was evicted
+    assert gui.Icon.fromTheme('gedit') is not icon
+    assert gui.Icon._iconCache.get_stats()['evictions'] == 2
+
+def test_icon_cache_is_keyed_by_fallback(app, icon_caches):
+    red = gui.QtGui.QIcon(make_pixmap('red'))
+    blue = gui.QtGui.QIcon(make_pixmap('blue'))
+    icon = gui.Icon.fromTheme('missing', red)
+    assert gui.Icon.fromTheme('missing', red) is icon
+    assert gui.Icon.fromTheme('missing', blue) is not icon
+    assert icon_caches == ['missing', 'missing']
+
+def test_pixmap_cache(app, icon_caches):
+    icon = gui.Icon(make_pixmap('red'))
+    size = gui.QtCore.QSize(16, 16)
+    pixmap = icon.cachedPixmap(size)
+    assert icon.cachedPixmap(size) is pixmap
+    assert pixmap.width() == 16
+    assert icon.cachedPixmap(size, 2) is not pixmap
+    icon.cachedPixmap(gui.QtCore.QSize(24, 24))
+    stats = gui.Icon._pixmapCache.get_stats()
+    assert (stats['hits'], stats['evictions']) == (1, 1)
+    assert icon.cachedPixmap(size) is not pixmap
@@ -0,0 +1,130 @@
+import threading
+
+import pytest
+
+pytest.importorskip('xdg')
+
+from launchit import icongetter
+
+@pytest.fixture(params=['memory', 'mmap'])
+def entries(request, monkeypatch, config, cache_dir):
+    """
+    Return a list of `(path, command, icon)`-tuples, which is used instead
+    of the user's desktop files when the icon cache is initialized.
+    """
+    config['cache-method'] = request.param
+    entries = []
+    monkeypatch.setattr(icongetter, 'iter_icon_cache_sources', lambda: [])
+    monkeypatch.setattr(icongetter, 'iter_desktop_file_icons',
+                        lambda backend=None: list(entries))
+    icongetter.invalidate_icon_cache()
+    yield entries
+    icongetter.invalidate_icon_cache()
+
+def count_calls(monkeypatch, module, name):
+    calls = []
+    function = getattr(module, name)
+    def wrapper(*args, **kwargs):
+        calls.append(args)
+        return function(*args, **kwargs)
+    monkeypatch.setattr(module, name, wrapper)
+    return calls
+
+def write_desktop_file(tmpdir, name, exec_, icon):
+    path = tmpdir.join(name)
+    path.write('[Desktop Entry]\nExec={0}\nIcon={1}\n'.format(exec_, icon))
+    return str(path)
+
+def test_starter_icon(entries):
+    entries.append(('/apps/gedit.desktop', 'gedit', 'text-editor'))
+    assert icongetter.guess_starter_icon('gedit') == 'text-editor'
+    assert icongetter.guess_starter_icon('vim') is None
+
+def test_empty_cache_is_initialized_once(entries, monkeypatch):
+    calls = count_calls(monkeypatch, icongetter, 'init_icon_cache')
+    for _ in range(3):
+        assert icongetter.guess_starter_icon('gedit') is None
+    assert len(calls) == 1
+    icongetter.invalidate_icon_cache()
+    icongetter.guess_starter_icon('gedit')
+    assert len(calls) == 2
+
+def test_add_and_remove_desktop_file(entries, tmpdir):
+    path = write_desktop_file(tmpdir, 'gimp.desktop', 'gimp %U', 'gimp')
+    # Ignored, since the cache will be filled on its first use anyway
+    icongetter.add_desktop_file(path)
+    assert icongetter.guess_starter_icon('gimp') is None
+    icongetter.add_desktop_file(path)
+    assert icongetter.guess_starter_icon('gimp') == 'gimp'
+    icongetter.remove_desktop_file(path)
+    assert icongetter.guess_starter_icon('gimp') is None
+
+def test_read_command_icon(tmpdir):
+    path = write_desktop_file(tmpdir, 'editor.desktop',
+                              'gedit %F', 'text\\seditor')
+    assert icongetter.read_command_icon(path) == ('gedit', 'text editor')
+    assert icongetter.read_command_icon(str(tmpdir.join('missing'))) is None
+
+def test_read_hidden_desktop_file(tmpdir):
+    path = tmpdir.join('hidden.desktop')
+    path.write('[Desktop Entry]\nExec=gedit\nHidden=true\n')
+    assert icongetter.read_command_icon(str(path)) is None
+
+def test_disk_cache_depends_on_path(entries, monkeypatch, tmpdir):
+    calls = count_calls(monkeypatch, icongetter, 'iter_desktop_file_icons')
+    monkeypatch.setenv('PATH', str(tmpdir.mkdir('bin')))
+    icongetter.init_icon_cache()
+    icongetter.init_icon_cache()
+    assert len(calls) == 1
+    monkeypatch.setenv('PATH', str(tmpdir.mkdir('other-bin')))
+    icongetter.init_icon_cache()
+    assert len(calls) == 2
+
+def test_guess_icon_names(entries, monkeypatch, tmpdir):
+    entries.append(('/apps/gedit.desktop', 'gedit', 'text-editor'))
+    bin_dir = tmpdir.mkdir('bin')
+    for name in ('gedit', 'vim'):
+        bin_dir.join(name).write('')
+        bin_dir.join(name).chmod(0o700)
+    monkeypatch.setenv('PATH', str(bin_dir))
+    def get_icon_path(name, size=48, theme=None):
+        return name == 'text-editor'
+    monkeypatch.setattr(icongetter, 'get_icon_path', get_icon_path)
+    monkeypatch.setattr(icongetter.icontheme, 'get_theme_index',
+                        lambda theme: None)
+    threads = threading.active_count()
+    names = icongetter.guess_icon_names(['gedit', 'vim -R', 'gedit', ''],
+                                        processes=2)
+    assert names[0] == names[2] == 'text-editor'
+    assert names[1] == names[3] == icongetter.ICON_RUN
+    # The worker threads are joined before returning
+    assert threading.active_count() == threads
+
+def test_scan_desktop_files(monkeypatch, tmpdir):
+    paths = [write_desktop_file(tmpdir, 'gimp.desktop', 'gimp %U', 'gimp'),
+             write_desktop_file(tmpdir, 'vim.desktop', 'vim', '')]
+    tmpdir.join('broken.desktop').write('Exec=broken')
+    paths.append(str(tmpdir.join('broken.desktop')))
+    monkeypatch.setattr(icongetter, 'iter_desktop_files', lambda: paths)
+    threads = threading.active_count()
+    assert icongetter.scan_desktop_files(processes=2) == [
+        (paths[0], 'gimp', 'gimp'), (paths[1], 'vim', '')]
+    assert threading.active_count() == threads
+
+def test_reloaded_theme_index_is_noticed(entries, monkeypatch):
+    entries.append(('/apps/tool.desktop', 'tool', 'tool-icon'))
+    icons = set()
+    def get_icon_path(name, size=48, theme=None):
+        return name in icons
+    monkeypatch.setattr(icongetter, 'get_icon_path', get_icon_path)
+    monkeypatch.setattr(icongetter.icontheme.ThemeIndex, 'load',
+                        classmethod(lambda cls, theme: object()))
+    icongetter.icontheme.invalidate()
+    assert icongetter.guess_icon_name('tool') == icongetter.ICON_RUN
+    icons.add('tool-icon')
+    assert icongetter.guess_icon_name('tool') == icongetter.ICON_RUN
+    # Happens when the index was found to be outdated
+    icongetter.icontheme.invalidate()
+    assert icongetter.guess_icon_name('tool') == 'tool-icon'
+    assert icongetter.guess_icon_names(['tool']) == ['tool-icon']
+    icongetter.icontheme.invalidate()
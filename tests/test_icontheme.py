@@ -0,0 +1,75 @@
+import pytest
+
+pytest.importorskip('xdg')
+
+from launchit import icontheme
+
+INDEX_THEME = """\
+[Icon Theme]
+Name={0}
+Inherits={1}
+Directories=48x48/apps,scalable/apps
+
+[48x48/apps]
+Size=48
+Type=Fixed
+
+[scalable/apps]
+Size=48
+MinSize=16
+MaxSize=256
+Type=Scalable
+"""
+
+@pytest.fixture
+def icons_dir(tmpdir, monkeypatch, cache_dir):
+    """
+    Return the only directory, which is searched for icon themes.
+    """
+    data_dir = tmpdir.mkdir('share')
+    monkeypatch.setattr(icontheme, 'xdg_data_dirs', [str(data_dir)])
+    monkeypatch.setenv('HOME', str(tmpdir.mkdir('home')))
+    icontheme.invalidate()
+    yield data_dir.mkdir('icons')
+    icontheme.invalidate()
+
+def make_theme(icons_dir, theme, inherits=''):
+    theme_dir = icons_dir.mkdir(theme)
+    theme_dir.join('index.theme').write(INDEX_THEME.format(theme, inherits))
+    return theme_dir
+
+def add_icon(theme_dir, subdir, filename):
+    path = theme_dir.ensure(subdir, filename)
+    return str(path)
+
+def test_lookup(icons_dir):
+    theme_dir = make_theme(icons_dir, 'Test', 'hicolor')
+    hicolor_dir = make_theme(icons_dir, 'hicolor')
+    png = add_icon(theme_dir, '48x48/apps', 'gedit.png')
+    svg = add_icon(theme_dir, 'scalable/apps', 'gedit.svg')
+    gimp = add_icon(hicolor_dir, '48x48/apps', 'gimp.png')
+    assert icontheme.lookup_icon('gedit', 48, 'Test') == png
+    assert icontheme.lookup_icon('gedit', 128, 'Test') == svg
+    assert icontheme.lookup_icon('gimp', 48, 'Test') == gimp
+    assert icontheme.lookup_icon('vim', 48, 'Test') is None
+
+def test_index_is_loaded_from_disk_cache(icons_dir):
+    theme_dir = make_theme(icons_dir, 'Test')
+    path = add_icon(theme_dir, '48x48/apps', 'gedit.png')
+    icontheme.get_theme_index('Test')
+    icontheme.invalidate()
+    index = icontheme.ThemeIndex.load('Test')
+    assert index.lookup('gedit', 48) == path
+    assert not index.is_outdated()
+
+def test_new_icons_are_noticed(icons_dir, monkeypatch):
+    theme_dir = make_theme(icons_dir, 'Test')
+    icontheme.get_theme_index('Test')
+    path = add_icon(theme_dir, '48x48/apps', 'gedit.png')
+    subdir = theme_dir.join('48x48/apps')
+    # Make sure that the directory's modification time differs
+    subdir.setmtime(subdir.mtime() + 10)
+    # Not checked again within the interval
+    assert icontheme.lookup_icon('gedit', 48, 'Test') is None
+    monkeypatch.setattr(icontheme, 'CHECK_INTERVAL', 0)
+    assert icontheme.lookup_icon('gedit', 48, 'Test') == path
@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+
+from launchit import logger
+
+@pytest.fixture
+def timings():
+    logger.enable_timing()
+    yield logger.TIMINGS
+    logger.disable_timing()
+
+def test_percentiles():
+    histogram = logger.Histogram()
+    assert histogram.get_percentile(50) is None
+    assert histogram.get_summary() == 'no calls'
+    for number in range(1, 101):
+        histogram.add(number / 1000.0)
+    assert histogram.get_percentile(50) == pytest.approx(50)
+    assert histogram.get_percentile(99) == pytest.approx(99)
+    assert histogram.get_summary().startswith('100 calls, p50 50.000 ms')
+
+def test_rolling_window():
+    histogram = logger.Histogram(size=10)
+    for number in range(100):
+        histogram.add(number / 1000.0)
+    assert histogram.count == 100
+    assert len(histogram.durations) == 10
+    assert histogram.get_percentile(0) == pytest.approx(90)
+
+def test_buckets():
+    histogram = logger.Histogram()
+    for duration in (0.00005, 0.003, 0.003, 2):
+        histogram.add(duration)
+    buckets = dict(histogram.get_buckets())
+    assert buckets[0.1] == 1 and buckets[5] == 2 and buckets[None] == 1
+    assert sum(buckets.values()) == 4
+
+def test_concurrent_adds():
+    histogram = logger.Histogram(size=100)
+    def add():
+        for _ in range(10000):
+            histogram.add(0.001)
+    threads = [threading.Thread(target=add) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        histogram.get_summary()
+    assert histogram.count == 40000
+
+def test_timed(timings):
+    @logger.timed('test')
+    def func(value):
+        return value
+    assert func(42) == 42
+    with logger.span('test'):
+        pass
+    assert timings['test'].count == 2
+    assert [name for name, _ in logger.get_timing_summaries()] == ['test']
+
+def test_timing_disabled():
+    calls = []
+    @logger.timed('test')
+    def func():
+        calls.append(None)
+    func()
+    assert calls and logger.TIMINGS is None
+    assert logger.get_timing_summaries() == []
@@ -0,0 +1,119 @@
+import pytest
+
+pytest.importorskip('xdg')
+
+from launchit import icongetter, mimeapps
+
+@pytest.fixture
+def dirs(tmpdir, monkeypatch):
+    """
+    Return a `(config_dir, app_dir)`-tuple of the only directories, which
+    are searched for associations and desktop files.
+    """
+    config_dir = tmpdir.mkdir('config')
+    data_dir = tmpdir.mkdir('share')
+    app_dir = data_dir.mkdir('applications')
+    for name in ('gedit', 'vim', 'kate'):
+        app_dir.join(name + '.desktop').write(
+            '[Desktop Entry]\nName={0}\nExec={0} %F\n'.format(name))
+    monkeypatch.setattr(mimeapps, 'xdg_config_dirs', [str(config_dir)])
+    monkeypatch.setattr(mimeapps, 'xdg_data_dirs', [str(data_dir)])
+    monkeypatch.setattr(icongetter, 'xdg_data_dirs', [str(data_dir)])
+    monkeypatch.delenv('XDG_CURRENT_DESKTOP', raising=False)
+    monkeypatch.setattr(mimeapps, '_table', None)
+    return config_dir, app_dir
+
+def write_list(directory, filename='mimeapps.list', **groups):
+    lines = []
+    for group, associations in groups.items():
+        lines.append('[{0}]'.format(group.replace('_', ' ')))
+        lines.extend('{0}={1}'.format(mimetype, ';'.join(desktop_ids))
+                     for mimetype, desktop_ids in associations)
+    directory.join(filename).write('\n'.join(lines) + '\n')
+
+def get_candidates(mimetype):
+    return mimeapps.AssociationTable().get_candidates(mimetype)
+
+def test_mimeapps_precedence(dirs, monkeypatch):
+    config_dir, app_dir = dirs
+    write_list(app_dir,
+               Default_Applications=[('text/plain', ['gedit.desktop'])])
+    write_list(config_dir,
+               Default_Applications=[('text/plain', ['vim.desktop'])])
+    assert get_candidates('text/plain') == ['vim.desktop', 'gedit.desktop']
+    assert mimeapps.get_default_app('text/plain') == str(
+        app_dir.join('vim.desktop'))
+    monkeypatch.setenv('XDG_CURRENT_DESKTOP', 'KDE')
+    write_list(config_dir, 'kde-mimeapps.list',
+               Default_Applications=[('text/plain', ['kate.desktop'])])
+    assert get_candidates('text/plain') == [
+        'kate.desktop', 'vim.desktop', 'gedit.desktop']
+
+def test_removed_associations(dirs):
+    config_dir, app_dir = dirs
+    write_list(config_dir,
+               Removed_Associations=[('text/plain', ['gedit.desktop'])])
+    write_list(app_dir,
+               Default_Applications=[('text/plain', ['kate.desktop'])],
+               Added_Associations=[('text/plain', ['gedit.desktop'])])
+    app_dir.join('mimeinfo.cache').write(
+        '[MIME Cache]\ntext/plain=gedit.desktop;vim.desktop;kate.desktop;\n')
+    # Default applications are not affected
+    assert get_candidates('text/plain') == [
+        'kate.desktop', 'vim.desktop', 'kate.desktop']
+
+def test_mimeinfo_cache_fallback(dirs):
+    config_dir, app_dir = dirs
+    app_dir.join('mimeinfo.cache').write(
+        '[MIME Cache]\ntext/plain=missing.desktop;gedit.desktop;\n')
+    gedit = str(app_dir.join('gedit.desktop'))
+    assert mimeapps.get_default_app('text/plain') == gedit
+    assert mimeapps.get_default_app('text/x-python') == gedit
+    assert mimeapps.get_default_app('image/png') is None
+
+def test_table_is_rebuilt_on_changes(dirs):
+    config_dir, app_dir = dirs
+    assert mimeapps.get_default_app('image/png') is None
+    write_list(config_dir,
+               Default_Applications=[('image/png', ['vim.desktop'])])
+    assert mimeapps.get_default_app('image/png') == str(
+        app_dir.join('vim.desktop'))
+
+@pytest.mark.parametrize('exec_, expected', [
+    ('gedit %U', ['gedit', '/tmp/a b.txt']),
+    ('gedit', ['gedit', '/tmp/a b.txt']),
+    ('gedit --name=%c %k %f', [
+        'gedit', '--name=Editor', '/apps/gedit.desktop', '/tmp/a b.txt']),
+    ('gedit %i %d %f', [
+        'gedit', '--icon', 'text-editor', '/tmp/a b.txt']),
+    ('"gedit" 100%% %F', ['gedit', '100%', '/tmp/a b.txt']),
+])
+def test_expand_exec(exec_, expected):
+    args = mimeapps.expand_exec(exec_, '/tmp/a b.txt', 'Editor',
+                                'text-editor', '/apps/gedit.desktop')
+    assert args == expected
+
+@pytest.mark.parametrize('exec_', [
+    'sh -c "cat %f"', "sh -c 'cat %u'", 'gedit "--file=%F"', 'gedit "%f',
+])
+def test_expand_exec_refuses_quoted_file_codes(exec_):
+    with pytest.raises(ValueError):
+        mimeapps.expand_exec(exec_, '/tmp/$(reboot).txt')
+
+def test_quoted_percent_sign_is_allowed():
+    assert mimeapps.expand_exec('printf "%%f" %f', '/tmp/a') == [
+        'printf', '%f', '/tmp/a']
+
+def test_get_open_command(dirs, monkeypatch, tmpdir):
+    config_dir, app_dir = dirs
+    path = tmpdir.join('notes.txt')
+    path.write('')
+    monkeypatch.setattr(mimeapps.mimecache, 'get_type',
+                        lambda path: 'text/plain')
+    write_list(config_dir,
+               Default_Applications=[('text/plain', ['vim.desktop'])])
+    assert mimeapps.get_open_command(str(path)) == ['vim', str(path)]
+    app_dir.join('vim.desktop').write(
+        '[Desktop Entry]\nExec=sh -c "vim %f"\n')
+    assert mimeapps.get_open_command(str(path)) is None
+    assert mimeapps.get_open_command(str(tmpdir.join('missing'))) is None
@@ -0,0 +1,74 @@
+import os
+import shutil
+
+import pytest
+
+pytest.importorskip('xdg')
+
+from launchit import mimecache
+
+SYSTEM_CACHE = '/usr/share/mime/mime.cache'
+
+PNG_HEADER = b'\x89PNG\r\n\x1a\n\0\0\0\rIHDR'
+
+@pytest.fixture
+def database():
+    if not os.path.exists(SYSTEM_CACHE):
+        pytest.skip('shared-mime-info is not installed')
+    database = mimecache.MimeDatabase([SYSTEM_CACHE])
+    yield database
+    database.close()
+
+@pytest.mark.parametrize('name, expected', [
+    ('image.png', 'image/png'),
+    ('IMAGE.PNG', 'image/png'),
+    ('notes.txt', 'text/plain'),
+    ('Makefile', 'text/x-makefile'),
+    ('archive.tar.gz', 'application/x-compressed-tar'),
+    ('file.unknown-extension', None),
+])
+def test_type_by_name(database, name, expected):
+    assert database.get_type_by_name(name) == expected
+
+def write_file(tmpdir, name, data):
+    path = tmpdir.join(name)
+    path.write(data, mode='wb')
+    return str(path)
+
+def test_type_by_data(database, tmpdir):
+    assert database.get_type(write_file(tmpdir, 'image', PNG_HEADER)) \
+           == 'image/png'
+    assert database.get_type(write_file(tmpdir, 'notes', b'Some text\n')) \
+           == 'text/plain'
+    assert database.get_type(write_file(tmpdir, 'data', b'\0\1\2\3')) \
+           == mimecache.OCTET_STREAM
+
+def test_special_files(database, tmpdir):
+    assert database.get_type(str(tmpdir)) == 'inode/directory'
+    missing = str(tmpdir.join('missing.png'))
+    assert database.get_type(missing) == 'image/png'
+
+def test_results_are_memoized(database, tmpdir):
+    path = write_file(tmpdir, 'image', PNG_HEADER)
+    database.get_type(path)
+    database.get_type(path)
+    assert database.memo.get_stats()['hits'] >= 1
+
+def test_stale_database(tmpdir):
+    if not os.path.exists(SYSTEM_CACHE):
+        pytest.skip('shared-mime-info is not installed')
+    path = str(tmpdir.join('mime.cache'))
+    shutil.copy(SYSTEM_CACHE, path)
+    database = mimecache.MimeDatabase([path])
+    assert not database.is_stale()
+    os.utime(path, (0, 0))
+    assert database.is_stale()
+    database.close()
+
+def test_without_caches(tmpdir):
+    database = mimecache.MimeDatabase([str(tmpdir.join('missing'))])
+    assert database.get_type(str(tmpdir)) is None
+
+def test_is_text():
+    assert mimecache.is_text(b'text\twith\nwhitespace')
+    assert not mimecache.is_text(b'\0binary')
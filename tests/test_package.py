@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+
+PARENT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def get_imported_modules(statement):
+    code = ('import sys; sys.path.insert(0, {0!r}); {1}; '
+            'print(" ".join(sys.modules))'.format(PARENT, statement))
+    output = subprocess.check_output([sys.executable, '-c', code])
+    return output.decode('ascii').split()
+
+def test_core_does_not_import_gui():
+    modules = get_imported_modules('import launchit.core')
+    assert 'launchit.gui' not in modules
+    assert not any(name.startswith('PySide') for name in modules)
+
+def test_settings_does_not_import_gui():
+    modules = get_imported_modules('from launchit import settings')
+    assert 'launchit.gui' not in modules
+    assert 'launchit.icongetter' not in modules
+
+def test_submodules_are_imported_on_access():
+    modules = get_imported_modules('import launchit; launchit.core')
+    assert 'launchit.core' in modules
+    assert 'launchit.gui' not in modules
+
+def test_all_lists_the_public_modules():
+    import launchit
+    names = [name[:-3] for name in os.listdir(launchit.__path__[0])
+             if name.endswith('.py') and not name.startswith('_')]
+    assert sorted(names) == launchit.__all__
@@ -0,0 +1,41 @@
+import os
+import stat
+
+import pytest
+
+from launchit import settings
+
+@pytest.fixture
+def temp_dir(tmpdir, monkeypatch):
+    """
+    Return the directory used instead of the temporary directory, while the
+    user's runtime directory is not defined.
+    """
+    monkeypatch.delenv('XDG_RUNTIME_DIR', raising=False)
+    monkeypatch.setattr(settings.tempfile, 'gettempdir', lambda: str(tmpdir))
+    return tmpdir
+
+def test_socket_in_runtime_dir(tmpdir, monkeypatch):
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(tmpdir))
+    assert settings.get_socket_path() == str(tmpdir.join('launchit.sock'))
+
+def test_socket_in_private_dir(temp_dir):
+    path = settings.get_socket_path()
+    dirname = temp_dir.join('launchit-{0}'.format(os.getuid()))
+    assert path == str(dirname.join('launchit.sock'))
+    assert stat.S_IMODE(os.stat(str(dirname)).st_mode) == 0o700
+    # The existing directory is used again
+    assert settings.get_socket_path() == path
+
+def test_accessible_dir_is_refused(temp_dir):
+    dirname = temp_dir.mkdir('launchit-{0}'.format(os.getuid()))
+    dirname.chmod(0o777)
+    with pytest.raises(OSError):
+        settings.get_socket_path()
+
+def test_symlink_is_refused(temp_dir):
+    target = temp_dir.mkdir('target')
+    target.chmod(0o700)
+    temp_dir.join('launchit-{0}'.format(os.getuid())).mksymlinkto(target)
+    with pytest.raises(OSError):
+        settings.get_socket_path()
@@ -0,0 +1,108 @@
+import pytest
+
+from launchit import stringtable
+
+def make_table(tmpdir, items, name='test.table', meta=b'meta'):
+    path = str(tmpdir.join(name))
+    stringtable.write_table(path, items, meta)
+    return stringtable.StringTable(path)
+
+@pytest.fixture
+def table(tmpdir):
+    items = [(b'gedit', b'1'), (b'firefox', b'2'), (b'gimp', b'3'),
+             (b'gedit', b'4'), (b'xterm', b'')]
+    table = make_table(tmpdir, items)
+    yield table
+    table.close()
+
+def test_keys_are_sorted(table):
+    assert list(table) == [b'firefox', b'gedit', b'gimp', b'xterm']
+    assert len(table) == 4
+
+def test_last_value_wins(table):
+    assert table.get(b'gedit') == b'4'
+    assert table.get(b'xterm') == b''
+    assert table.get(b'missing') is None
+    assert b'gimp' in table and b'gim' not in table
+
+def test_meta(table):
+    assert table.get_meta() == b'meta'
+
+def test_iter_prefixed(table):
+    assert list(table.iter_prefixed(b'g')) == [b'gedit', b'gimp']
+    assert list(table.iter_prefixed(b'z')) == []
+
+@pytest.mark.parametrize('fragment, expected', [
+    (b'', [b'firefox', b'gedit', b'gimp', b'xterm']),
+    (b'i', [b'firefox', b'gedit', b'gimp']),
+    (b'fox', [b'firefox']),
+    (b'tg', []),
+])
+def test_iter_matches(table, fragment, expected):
+    assert list(table.iter_matches(fragment)) == expected
+
+def test_iter_matches_skips_length_prefixes(tmpdir):
+    # The length prefix of a 97 byte key contains b'a'
+    keys = [b'x' * 97, b'y' * 5]
+    table = make_table(tmpdir, [(key, b'') for key in keys])
+    assert list(table.iter_matches(b'a')) == []
+    assert list(table.iter_matches(b'xy')) == []
+
+def test_iter_matches_far_apart(tmpdir):
+    keys = [b'name%04d' % number for number in range(1000)]
+    table = make_table(tmpdir, [(key, b'') for key in keys])
+    expected = [key for key in keys if b'99' in key]
+    assert list(table.iter_matches(b'99')) == expected
+
+def test_empty_table(tmpdir):
+    table = make_table(tmpdir, [])
+    assert list(table) == [] and len(table) == 0
+    assert list(table.iter_matches(b'a')) == []
+    assert table.get(b'a') is None
+
+def test_invalid_file(tmpdir):
+    path = tmpdir.join('invalid.table')
+    path.write(b'LTAB' + b'\0' * 64, mode='wb')
+    with pytest.raises(ValueError):
+        stringtable.StringTable(str(path))
+
+def test_encode():
+    assert stringtable.encode('gedit') == b'gedit'
+    assert stringtable.encode(b'gedit') == b'gedit'
+    assert stringtable.decode(b'gedit') == 'gedit'
+
+@pytest.mark.skipif(not stringtable.on_py3k, reason='Python 3 only')
+def test_undecodable_names_are_preserved():
+    name = b'caf\xff'.decode('utf-8', 'surrogateescape')
+    assert stringtable.decode(stringtable.encode(name)) == name
+
+def test_table_set(tmpdir):
+    table = make_table(tmpdir, [(b'gedit', b''), (b'gimp', b'')])
+    names = stringtable.TableSet(table)
+    assert sorted(names) == ['gedit', 'gimp']
+    assert 'gedit' in names and 'vim' not in names
+    assert list(names.iter_matches('ged')) == ['gedit']
+
+def test_union_set_merges_duplicates(tmpdir):
+    first = make_table(tmpdir, [(b'gedit', b''), (b'vim', b'')], 'first')
+    second = make_table(tmpdir, [(b'gimp', b''), (b'vim', b'')], 'second')
+    names = stringtable.UnionSet([
+        stringtable.TableSet(first), stringtable.TableSet(second),
+        frozenset(['emacs', 'vim'])])
+    assert list(names) == ['emacs', 'gedit', 'gimp', 'vim']
+    assert len(names) == 4
+    assert list(names.iter_matches('im')) == ['gimp', 'vim']
+    assert 'emacs' in names and 'nano' not in names
+
+def test_table_mapping(tmpdir):
+    table = make_table(tmpdir, [(b'gedit', b'accessories-text-editor')])
+    mapping = stringtable.TableMapping(table)
+    assert mapping['gedit'] == 'accessories-text-editor'
+    mapping['gimp'] = 'gimp'
+    assert len(mapping) == 2 and mapping
+    assert mapping.pop('gedit') == 'accessories-text-editor'
+    assert 'gedit' not in mapping and len(mapping) == 1
+    with pytest.raises(KeyError):
+        mapping['gedit']
+    mapping.clear()
+    assert not mapping
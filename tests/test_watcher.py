@@ -0,0 +1,94 @@
+import os
+
+import pytest
+
+pytest.importorskip('xdg')
+
+from launchit import watcher
+
+def make_watcher(use_inotify):
+    if use_inotify:
+        try:
+            watcher.InotifyBackend().close()
+        except watcher.InotifyError:
+            pytest.skip('inotify is not available')
+    return watcher.Watcher(use_inotify, interval=0.1)
+
+@pytest.fixture(params=[True, False], ids=['inotify', 'polling'])
+def use_inotify(request):
+    return request.param
+
+def test_added_and_removed_files(tmpdir, use_inotify):
+    dirname = str(tmpdir)
+    events = []
+    dir_watcher = make_watcher(use_inotify)
+    assert dir_watcher.watch(dirname, lambda *event: events.append(event)) \
+           == use_inotify
+    tmpdir.join('gedit').write('')
+    dir_watcher.process_events()
+    tmpdir.join('gedit').remove()
+    dir_watcher.process_events()
+    dir_watcher.stop()
+    # Inotify also reports that the file was closed after writing
+    assert sorted(set(events)) == [(dirname, 'gedit', False),
+                                   (dirname, 'gedit', True)]
+    assert events[-1] == (dirname, 'gedit', False)
+
+def test_aliased_directories(tmpdir):
+    dir_watcher = make_watcher(True)
+    dirname = str(tmpdir.mkdir('usr-bin'))
+    alias = str(tmpdir.join('bin'))
+    os.symlink(dirname, alias)
+    events = []
+    for path in (dirname, alias):
+        dir_watcher.watch(path, lambda *event: events.append(event))
+    tmpdir.join('usr-bin', 'vim').write('')
+    dir_watcher.process_events()
+    assert set(events) == set([(dirname, 'vim', True), (alias, 'vim', True)])
+    del events[:]
+    tmpdir.join('usr-bin').remove()
+    dir_watcher.process_events()
+    dir_watcher.stop()
+    assert (dirname, None, False) in events
+    assert (alias, None, False) in events
+
+def test_missing_directory(tmpdir):
+    dir_watcher = make_watcher(False)
+    assert not dir_watcher.watch(str(tmpdir.join('missing')), None)
+    dir_watcher.process_events()
+    dir_watcher.stop()
+
+def test_tree_with_subdirectories(tmpdir, use_inotify):
+    tmpdir.ensure('apps', 'kde4', dir=True)
+    events = []
+    dir_watcher = make_watcher(use_inotify)
+    dir_watcher.watch_tree(str(tmpdir.join('apps')),
+                           lambda *event: events.append(event))
+    tmpdir.join('apps', 'kde4', 'kate.desktop').write('')
+    dir_watcher.process_events()
+    assert (str(tmpdir.join('apps', 'kde4')), 'kate.desktop', True) in events
+    del events[:]
+    tmpdir.ensure('apps', 'new', dir=True)
+    dir_watcher.process_events()
+    assert events == [(str(tmpdir.join('apps', 'new')), None, True)]
+    tmpdir.join('apps', 'new', 'vim.desktop').write('')
+    dir_watcher.process_events()
+    dir_watcher.stop()
+    assert (str(tmpdir.join('apps', 'new')), 'vim.desktop', True) in events
+
+def test_tree_is_watched_when_created(tmpdir, use_inotify):
+    dirname = str(tmpdir.join('share', 'applications'))
+    events = []
+    dir_watcher = make_watcher(use_inotify)
+    dir_watcher.watch_tree(dirname, lambda *event: events.append(event))
+    tmpdir.mkdir('other')
+    tmpdir.mkdir('share')
+    dir_watcher.process_events()
+    assert events == []
+    tmpdir.join('share').mkdir('applications')
+    dir_watcher.process_events()
+    assert events == [(dirname, None, True)]
+    tmpdir.join('share', 'applications', 'gimp.desktop').write('')
+    dir_watcher.process_events()
+    dir_watcher.stop()
+    assert (dirname, 'gimp.desktop', True) in events